@@ -4,9 +4,11 @@ from channels.routing import URLRouter
 # Import consumers
 from raffle.consumers import RaffleConsumer
 from sports.consumers import SportsConsumer
+from core.consumers import ImportJobConsumer
 
 websocket_urlpatterns = [
     re_path(r'ws/raffle/(?P<raffle_id>\w+)/$', RaffleConsumer.as_asgi()),
     re_path(r'ws/sports/(?P<tournament_id>\w+)/$', SportsConsumer.as_asgi()),
+    re_path(r'ws/imports/(?P<job_id>[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})/$', ImportJobConsumer.as_asgi()),
 ]
 
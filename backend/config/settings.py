@@ -149,6 +149,15 @@ CACHES = {
     }
 }
 
+# Raffle eligibility index in Redis (sorted sets per raffle event); falls back to SQL when unavailable
+RAFFLE_ELIGIBILITY_INDEX = env.bool("RAFFLE_ELIGIBILITY_INDEX", default=False)
+
+# Send raffle WebSocket broadcasts from a background thread after commit (False = send inline after commit)
+RAFFLE_BROADCAST_ASYNC = env.bool("RAFFLE_BROADCAST_ASYNC", default=True)
+
+# Background import jobs: "redis" = queue for `manage.py run_import_worker`, "local" = run in-process after commit
+IMPORT_JOBS_BACKEND = env("IMPORT_JOBS_BACKEND", default="redis")
+
 # Channels Configuration
 CHANNEL_LAYERS = {
     "default": {
@@ -229,6 +238,7 @@ CORS_ALLOW_HEADERS = [
     "x-csrftoken",
     "x-requested-with",
     "x-org-id",
+    "idempotency-key",
 ]
 
 CORS_PREFLIGHT_MAX_AGE = 86400
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Organization, Department, Event, ModuleRegistry, AuditLog, LoginPageSettings
+from .models import Organization, Department, Event, ModuleRegistry, AuditLog, LoginPageSettings, ImportJob
 
 
 @admin.register(Organization)
@@ -76,3 +76,10 @@ class LoginPageSettingsAdmin(admin.ModelAdmin):
         }),
     )
 
+
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = ['file_name', 'kind', 'org', 'status', 'step', 'rows_written', 'total_rows', 'created_at']
+    list_filter = ['kind', 'status', 'org']
+    search_fields = ['file_name']
+    readonly_fields = ['id', 'created_at', 'updated_at', 'started_at', 'finished_at']
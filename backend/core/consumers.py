@@ -0,0 +1,79 @@
+import json
+import logging
+from urllib.parse import parse_qs
+from channels.generic.websocket import AsyncWebsocketConsumer
+from channels.db import database_sync_to_async
+from . import import_jobs
+from .models import ImportJob
+
+logger = logging.getLogger(__name__)
+
+
+class ImportJobConsumer(AsyncWebsocketConsumer):
+    """
+    WebSocket consumer for background import job progress
+
+    ต้องเข้าสู่ระบบ (session หรือ JWT access token ใน query string: ?token=...)
+    และเป็นผู้ใช้ของหน่วยงานเดียวกับ job (หรือผู้สร้าง job / super admin) เหมือน GET jobs/<id>/
+    """
+    
+    async def connect(self):
+        self.job_id = self.scope['url_route']['kwargs']['job_id']
+        self.group_name = import_jobs.group_name(self.job_id)
+        
+        # Reject the handshake before accept(): the state includes row data from the file
+        state = await self.get_job_state()
+        if state is None:
+            await self.close()
+            return
+        
+        await self.accept()
+        if self.channel_layer:
+            await self.channel_layer.group_add(self.group_name, self.channel_name)
+        
+        # First frame: current progress, so clients that connect late don't miss finished steps
+        await self.send(text_data=json.dumps({'type': 'import_progress', 'job': state}))
+    
+    async def disconnect(self, close_code):
+        if self.channel_layer and hasattr(self, 'group_name'):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+    
+    def get_user(self):
+        """ผู้ใช้จาก session (AuthMiddlewareStack) หรือจาก JWT ใน query string"""
+        user = self.scope.get('user')
+        if user is not None and user.is_authenticated:
+            return user
+        
+        token = parse_qs(self.scope.get('query_string', b'').decode()).get('token')
+        if not token:
+            return None
+        from rest_framework_simplejwt.authentication import JWTAuthentication
+        from rest_framework_simplejwt.exceptions import InvalidToken, AuthenticationFailed
+        authentication = JWTAuthentication()
+        try:
+            return authentication.get_user(authentication.get_validated_token(token[0]))
+        except (InvalidToken, AuthenticationFailed):
+            return None
+    
+    @database_sync_to_async
+    def get_job_state(self):
+        """สถานะของ job ถ้าผู้ใช้มีสิทธิ์ดู (None ถ้าไม่พบหรือไม่มีสิทธิ์)"""
+        user = self.get_user()
+        if user is None or not user.is_active:
+            return None
+        try:
+            job = ImportJob.objects.get(id=self.job_id)
+        except ImportJob.DoesNotExist:
+            return None
+        if not (user.is_superadmin() or job.org_id == user.org_id or job.user_id == user.id):
+            logger.warning(f'Import job {job.id}: WebSocket rejected for user {user.id}')
+            return None
+        return import_jobs.job_state(job)
+    
+    # Receive message from job group
+    async def import_progress(self, event):
+        """Send job progress to WebSocket"""
+        await self.send(text_data=json.dumps({
+            'type': 'import_progress',
+            'job': event['job']
+        }))
@@ -0,0 +1,214 @@
+import csv
+import json
+import re
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence
+from openpyxl import Workbook, load_workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill, Alignment
+from openpyxl.utils import get_column_letter
+from rest_framework.renderers import JSONRenderer
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+CSV_CONTENT_TYPE = 'text/csv; charset=utf-8'
+NDJSON_CONTENT_TYPE = 'application/x-ndjson; charset=utf-8'
+CHUNK_SIZE = 64 * 1024
+ROWS_PER_CHUNK = 500
+
+re_accepts_gzip = re.compile(r'\bgzip\b')
+
+
+class XlsxFormatRenderer(JSONRenderer):
+    """
+    ให้ ?format=xlsx ผ่าน content negotiation ของ DRF
+    ไฟล์ส่งเป็น StreamingHttpResponse เอง ส่วน error response ยังเป็น JSON ตามปกติ
+    """
+    format = 'xlsx'
+
+
+class CsvFormatRenderer(JSONRenderer):
+    """?format=csv (ไฟล์ส่งเป็น StreamingHttpResponse, error เป็น JSON)"""
+    format = 'csv'
+
+
+class NdjsonFormatRenderer(JSONRenderer):
+    """?format=ndjson (ไฟล์ส่งเป็น StreamingHttpResponse, error เป็น JSON)"""
+    format = 'ndjson'
+
+
+class ExcelExporter:
+    """
+    Export ข้อมูลเป็น Excel แบบ write-only (ใช้ memory คงที่ไม่ขึ้นกับจำนวนแถว)
+
+    แถวถูกเขียนลงไฟล์ชั่วคราวทีละแถวขณะวน iterator แล้วส่งเป็น chunk ด้วย StreamingHttpResponse
+    ใช้ร่วมกันใน export-excel ของผู้ชนะ/ผู้เข้าร่วม และ export รายงานการจับสลาก
+
+    ตัวอย่าง:
+        exporter = ExcelExporter(['ชื่อ', 'หน่วยงาน'], sheet_title='รายชื่อ', column_widths=[35, 20])
+        return exporter.response(queryset.values_list('name', 'department__name').iterator(), 'participants.xlsx')
+    """
+
+    HEADER_FONT = Font(bold=True)
+    HEADER_FILL = PatternFill(start_color="E8E8E8", end_color="E8E8E8", fill_type="solid")
+    HEADER_ALIGNMENT = Alignment(horizontal="center", vertical="center")
+
+    def __init__(
+        self,
+        headers: Sequence[str],
+        sheet_title: Optional[str] = None,
+        column_widths: Optional[Sequence[float]] = None,
+    ):
+        self.headers = list(headers)
+        self.sheet_title = sheet_title
+        self.column_widths = list(column_widths or [])
+
+    @classmethod
+    def from_template(
+        cls,
+        template_path: Path,
+        extra_headers: Sequence[str] = (),
+        default_headers: Sequence[str] = ()
+    ) -> 'ExcelExporter':
+        """
+        ใช้หัวตารางและความกว้างคอลัมน์จากไฟล์ template (แถวที่ 1)
+        extra_headers ที่ยังไม่มีใน template จะถูกต่อท้าย
+        ถ้า template ไม่มีหัวตาราง ใช้ default_headers ทั้งชุดแทน (ไม่ต่อ extra_headers)
+        """
+        wb = load_workbook(template_path)
+        ws = wb.active
+
+        headers = []
+        for col in range(1, 10):  # Check up to 10 columns
+            header_value = ws.cell(row=1, column=col).value
+            if not header_value:
+                break
+            headers.append(str(header_value))
+        if not headers:
+            headers = list(default_headers)
+        else:
+            for header in extra_headers:
+                if not any(header in existing for existing in headers):
+                    headers.append(header)
+
+        column_widths = []
+        for col_idx in range(1, len(headers) + 1):
+            dimension = ws.column_dimensions.get(get_column_letter(col_idx))
+            column_widths.append(dimension.width if dimension and dimension.width else None)
+
+        return cls(headers, sheet_title=ws.title, column_widths=column_widths)
+
+    def _header_row(self, ws) -> List[WriteOnlyCell]:
+        row = []
+        for header in self.headers:
+            cell = WriteOnlyCell(ws, value=header)
+            cell.font = self.HEADER_FONT
+            cell.fill = self.HEADER_FILL
+            cell.alignment = self.HEADER_ALIGNMENT
+            row.append(cell)
+        return row
+
+    def write(self, rows: Iterable[Sequence[Any]], fileobj) -> None:
+        """เขียน workbook ลง fileobj (rows เป็น iterable ของ tuple/list ตามลำดับหัวตาราง)"""
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet(title=self.sheet_title)
+
+        # Column widths must be set before the first row in write-only mode
+        for col_idx, width in enumerate(self.column_widths, start=1):
+            if width:
+                ws.column_dimensions[get_column_letter(col_idx)].width = width
+
+        ws.append(self._header_row(ws))
+        for row in rows:
+            ws.append(['' if value is None else value for value in row])
+
+        wb.save(fileobj)
+
+    def response(self, rows: Iterable[Sequence[Any]], filename: str) -> StreamingHttpResponse:
+        """สร้างไฟล์ (ในไฟล์ชั่วคราว) แล้วส่งกลับเป็น StreamingHttpResponse ทีละ chunk"""
+        tmp = tempfile.TemporaryFile()
+        try:
+            self.write(rows, tmp)
+            size = tmp.tell()
+            tmp.seek(0)
+        except Exception:
+            tmp.close()
+            raise
+
+        response = StreamingHttpResponse(_iter_file(tmp), content_type=XLSX_CONTENT_TYPE)
+        response['Content-Length'] = str(size)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+
+def _iter_file(fileobj, chunk_size: int = CHUNK_SIZE):
+    try:
+        while True:
+            chunk = fileobj.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        fileobj.close()
+
+
+
+class _Echo:
+    """file-like object สำหรับ csv.writer: คืนค่าบรรทัดที่เขียนแทนการเก็บไว้"""
+
+    def write(self, value):
+        return value
+
+
+def _batched(lines: Iterable[str], rows_per_chunk: int = ROWS_PER_CHUNK) -> Iterator[bytes]:
+    # One chunk per few hundred rows instead of one write per row
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= rows_per_chunk:
+            yield ''.join(batch).encode('utf-8')
+            batch = []
+    if batch:
+        yield ''.join(batch).encode('utf-8')
+
+
+def streaming_response(chunks: Iterable[bytes], content_type: str, filename: str, request=None) -> StreamingHttpResponse:
+    """
+    StreamingHttpResponse พร้อม Content-Disposition
+    ถ้า client ส่ง Accept-Encoding: gzip จะบีบอัดแบบ stream (ไม่ต้องรอข้อมูลทั้งหมด)
+    """
+    use_gzip = request is not None and re_accepts_gzip.search(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    response = StreamingHttpResponse(
+        compress_sequence(chunks) if use_gzip else chunks,
+        content_type=content_type
+    )
+    if use_gzip:
+        response['Content-Encoding'] = 'gzip'
+    patch_vary_headers(response, ('Accept-Encoding',))
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def stream_csv(rows: Iterable[Sequence[Any]], headers: Sequence[str], filename: str, request=None) -> StreamingHttpResponse:
+    """ส่ง CSV ทีละ chunk (มี BOM เพื่อให้ Excel อ่านภาษาไทยได้ถูกต้อง)"""
+    writer = csv.writer(_Echo())
+
+    def lines():
+        yield '\ufeff' + writer.writerow(headers)
+        for row in rows:
+            yield writer.writerow(['' if value is None else value for value in row])
+
+    return streaming_response(_batched(lines()), CSV_CONTENT_TYPE, filename, request)
+
+
+def stream_ndjson(records: Iterable[Dict[str, Any]], filename: str, request=None) -> StreamingHttpResponse:
+    """ส่ง NDJSON (JSON หนึ่ง object ต่อบรรทัด) ทีละ chunk"""
+    lines = (
+        json.dumps(record, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+        for record in records
+    )
+    return streaming_response(_batched(lines), NDJSON_CONTENT_TYPE, filename, request)
@@ -0,0 +1,262 @@
+import logging
+from datetime import timedelta
+from typing import Any, Dict, Optional
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from .models import ImportJob, Organization
+from .utils import ImportProcessor, create_audit_log
+
+logger = logging.getLogger(__name__)
+
+QUEUE_KEY = 'nrsport:import_jobs'
+WRITE_CHUNK_ROWS = 5000
+# A running job whose progress has not moved for this long is assumed to have lost its worker
+STALE_AFTER = timedelta(minutes=10)
+
+# kind -> importer class; the class provides from_job(job), normalize(frame), save(frame),
+# diff_summary(), model_name and default_column_mapping (see teams.importers.ParticipantImporter)
+IMPORTERS = {
+    'participants': 'teams.importers.ParticipantImporter',
+}
+
+
+def get_importer_class(kind: str):
+    return import_string(IMPORTERS[kind])
+
+
+def is_local() -> bool:
+    """
+    settings.IMPORT_JOBS_BACKEND:
+      'redis' (ค่าเริ่มต้น) ส่ง job เข้าคิวใน Redis ให้ manage.py run_import_worker ทำ
+      'local' ทำใน process เดียวกันทันทีหลัง commit (สำหรับ test / dev ที่ไม่มี worker)
+    """
+    return getattr(settings, 'IMPORT_JOBS_BACKEND', 'redis') == 'local'
+
+
+def get_connection():
+    from django_redis import get_redis_connection
+    return get_redis_connection('default')
+
+
+def group_name(job_id: Any) -> str:
+    return f'import_job_{job_id}'
+
+
+def job_state(job: ImportJob) -> Dict[str, Any]:
+    from .serializers import ImportJobSerializer
+    return dict(ImportJobSerializer(job).data)
+
+
+def publish(job: ImportJob) -> None:
+    """ส่งความคืบหน้าไปยัง WebSocket group ของ job (ข้อผิดพลาดของ channel layer ไม่ทำให้ job ล้ม)"""
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    try:
+        async_to_sync(channel_layer.group_send)(
+            group_name(job.id),
+            {'type': 'import_progress', 'job': job_state(job)}
+        )
+    except Exception as e:
+        logger.warning(f'Import job progress broadcast failed: {e}')
+
+
+def enqueue(job_id: Any) -> None:
+    """ส่ง job เข้าคิวหลัง transaction commit"""
+
+    def run():
+        if is_local():
+            run_job(job_id)
+            return
+        try:
+            get_connection().rpush(QUEUE_KEY, str(job_id))
+        except Exception as e:
+            # The job stays pending; requeue_stale_jobs picks it up when the worker starts
+            logger.error(f'Import job enqueue failed: {e}')
+
+    transaction.on_commit(run)
+
+
+def create_job(
+    request,
+    kind: str,
+    file,
+    column_mapping: Dict[str, str],
+    event=None,
+    mode: str = 'full'
+) -> ImportJob:
+    """บันทึกไฟล์ที่อัปโหลดและสร้าง ImportJob (status=pending) แล้วส่งเข้าคิว"""
+    job = ImportJob.objects.create(
+        org_id=request.org_id,
+        user=request.user if request.user.is_authenticated else None,
+        event=event,
+        kind=kind,
+        file=file,
+        file_name=file.name,
+        column_mapping=column_mapping,
+        mode=mode,
+    )
+    enqueue(job.id)
+    return job
+
+
+def claim(job_id: Any) -> Optional[ImportJob]:
+    """เปลี่ยน pending -> running แบบ atomic (worker หลายตัวจะไม่ทำ job เดียวกัน)"""
+    claimed = ImportJob.objects.filter(id=job_id, status='pending').update(
+        status='running',
+        started_at=timezone.now(),
+        updated_at=timezone.now()
+    )
+    if not claimed:
+        return None
+    return ImportJob.objects.select_related('org', 'event', 'user').get(id=job_id)
+
+
+def requeue_stale_jobs() -> int:
+    """
+    ส่ง job ที่ค้างกลับเข้าคิว: running ที่ไม่มีความคืบหน้าเกิน STALE_AFTER (worker ตาย)
+    และ pending ที่อาจหลุดจากคิว job จะทำต่อจากขั้นตอน/แถวที่บันทึกไว้
+
+    Returns: จำนวน job ที่ส่งเข้าคิว
+    """
+    cutoff = timezone.now() - STALE_AFTER
+    ImportJob.objects.filter(status='running', updated_at__lt=cutoff).update(status='pending')
+    job_ids = list(
+        ImportJob.objects.filter(status='pending', updated_at__lt=cutoff).values_list('id', flat=True)
+    )
+    for job_id in job_ids:
+        enqueue(job_id)
+    return len(job_ids)
+
+
+def run_job(job_id: Any) -> Optional[ImportJob]:
+    """ทำ job หนึ่งงาน (ไม่ทำถ้า job ถูก worker อื่นรับไปแล้วหรือจบไปแล้ว)"""
+    job = claim(job_id)
+    if job is None:
+        return None
+
+    try:
+        ImportJobRunner(job).run()
+    except Exception as e:
+        logger.error(f'Import job {job.id} failed: {e}', exc_info=True)
+        job.status = 'failed'
+        job.result = {**job.result, 'error': str(e)}
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'result', 'finished_at', 'updated_at'])
+        publish(job)
+    return job
+
+
+class ImportJobRunner:
+    """
+    ทำ import เป็นขั้นตอน read -> validate -> write (ใช้ ImportProcessor และ importer ตาม kind)
+
+    ความคืบหน้า (rows_parsed / rows_validated / rows_written / errors) บันทึกใน ImportJob
+    และส่งไปยัง WebSocket group ของ job ทุกขั้นตอนและทุก chunk ที่เขียน
+
+    ไฟล์ถูกอ่านทีละ batch (WRITE_CHUNK_ROWS แถว) สองรอบ: รอบ validate และรอบ write จึงไม่เก็บทั้งไฟล์ใน memory
+    ขั้นตอน write บันทึกแต่ละ batch พร้อมกับ rows_written ใน transaction เดียวกัน
+    ถ้า worker ตายกลางทาง job ที่ถูกส่งกลับเข้าคิวจะอ่านไฟล์ใหม่แล้วเขียนต่อจากแถวที่ rows_written
+    """
+
+    def __init__(self, job: ImportJob):
+        self.job = job
+        self.importer = get_importer_class(job.kind).from_job(job)
+
+    def _update(self, **fields) -> None:
+        for name, value in fields.items():
+            setattr(self.job, name, value)
+        self.job.save(update_fields=[*fields, 'updated_at'])
+        publish(self.job)
+
+    def _fail(self, errors, **fields) -> None:
+        self._update(
+            status='failed',
+            errors=errors,
+            finished_at=timezone.now(),
+            **fields
+        )
+
+    def _save_chunk(self, frame) -> Dict[str, int]:
+        # The chunk and the progress that records it commit together, so a resumed job skips exactly these rows
+        job = self.job
+        with transaction.atomic():
+            counts = self.importer.save(frame)
+            for key, value in counts.items():
+                job.result[key] = job.result.get(key, 0) + value
+            job.rows_written += len(frame)
+            job.save(update_fields=['rows_written', 'result', 'updated_at'])
+        publish(job)
+        return counts
+
+    def _validated(self, summary: Dict[str, Any]) -> None:
+        self._update(
+            rows_parsed=summary['total_rows'],
+            rows_validated=summary['total_rows'],
+            error_rows=summary['error_rows'],
+            errors=summary['errors']
+        )
+
+    def run(self) -> None:
+        job = self.job
+        column_mapping = job.column_mapping or self.importer.default_column_mapping
+
+        with job.file.open('rb') as file:
+            processor = ImportProcessor(file)
+
+            # Step 1: read the header and check the mapping
+            self._update(step='read')
+            read_result = processor.read_header()
+            if not read_result.get('success', False):
+                self._fail([{'row': None, 'errors': read_result.get('errors', [])}])
+                return
+            validation = processor.validate_mapping(column_mapping)
+            if not validation['success']:
+                self._fail([{'row': None, 'errors': validation.get('errors', [])}])
+                return
+            # Estimated until the validate step has counted every row
+            self._update(total_rows=read_result.get('total_rows') or 0)
+
+            # Step 2: validate every batch (nothing is written when any row is invalid, as in the synchronous import)
+            self._update(step='validate')
+            summary = processor.validate_rows(
+                column_mapping, self.importer.normalize, on_batch=self._validated, batch_size=WRITE_CHUNK_ROWS
+            )
+            if summary['error_rows']:
+                self._fail(summary['errors'], total_rows=summary['total_rows'])
+                return
+            self._update(total_rows=summary['total_rows'])
+
+            # Step 3: read the file again and write batch by batch, resuming after the rows already written
+            self._update(step='write')
+            job.result = {'created_count': 0, 'updated_count': 0, **job.result}
+            processor.write_rows(
+                column_mapping,
+                self.importer.normalize,
+                self._save_chunk,
+                skip_rows=job.rows_written,
+                batch_size=WRITE_CHUNK_ROWS
+            )
+        self._update(result={**job.result, **self.importer.diff_summary()})
+
+        org = Organization.objects.filter(id=job.org_id).first()
+        create_audit_log(
+            user=job.user,
+            org=org,
+            action='import',
+            model=self.importer.model_name,
+            changes={
+                'event_id': job.event_id,
+                'import_job_id': str(job.id),
+                'total_rows': job.total_rows,
+                **job.result
+            }
+        )
+
+        # The upload is only needed to resume; drop it once the job is done
+        job.file.delete(save=False)
+        self._update(step='done', status='completed', finished_at=timezone.now(), file=job.file)
@@ -0,0 +1,88 @@
+import json
+import os
+import subprocess
+import sys
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter so ru_maxrss only reflects one export
+CHILD_SCRIPT = '''
+import io, json, resource, sys, time
+import django
+django.setup()
+from core.exports import ExcelExporter
+
+rows_count, mode = int(sys.argv[1]), sys.argv[2]
+headers = ['ลำดับรางวัล', 'ID โรงพยาบาล', 'ชื่อผู้ได้รับรางวัล', 'รางวัล', 'หน่วยงาน', 'ลงชื่อ']
+rows = ((i, 100000 + i, f'ผู้เข้าร่วม ทดสอบ {i}', f'รางวัล {i % 50}', f'หน่วยงาน {i % 400}', '') for i in range(1, rows_count + 1))
+
+def peak_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+baseline = peak_mb()
+started = time.perf_counter()
+size = 0
+if mode == 'streaming':
+    response = ExcelExporter(headers, sheet_title='benchmark').response(rows, 'benchmark.xlsx')
+    for chunk in response.streaming_content:
+        size += len(chunk)
+else:
+    from openpyxl import Workbook
+    wb = Workbook()
+    ws = wb.active
+    ws.append(headers)
+    for row in rows:
+        ws.append(list(row))
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    size = buffer.tell()
+
+print(json.dumps({
+    'seconds': time.perf_counter() - started,
+    'baseline_mb': baseline,
+    'peak_mb': peak_mb(),
+    'size_mb': size / 1024 / 1024,
+}))
+'''
+
+
+class Command(BaseCommand):
+    help = 'Measure peak RSS and time of the streaming Excel export for different row counts'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            nargs='+',
+            default=[1000, 10000, 100000],
+            help='Row counts to export (default: 1000 10000 100000)'
+        )
+        parser.add_argument(
+            '--compare',
+            action='store_true',
+            help='Also run the previous in-memory Workbook export for comparison'
+        )
+
+    def run_child(self, rows_count, mode):
+        result = subprocess.run(
+            [sys.executable, '-c', CHILD_SCRIPT, str(rows_count), mode],
+            cwd=settings.BASE_DIR,
+            env=os.environ.copy(),
+            capture_output=True,
+            text=True
+        )
+        if result.returncode != 0:
+            raise CommandError(result.stderr.strip())
+        return json.loads(result.stdout.strip().splitlines()[-1])
+
+    def handle(self, *args, **options):
+        modes = ['streaming', 'in-memory'] if options['compare'] else ['streaming']
+
+        self.stdout.write(f"{'mode':<10} {'rows':>8} {'seconds':>8} {'peak MB':>8} {'+MB':>7} {'file MB':>8}")
+        for mode in modes:
+            for rows_count in options['rows']:
+                stats = self.run_child(rows_count, mode)
+                self.stdout.write(
+                    f"{mode:<10} {rows_count:>8} {stats['seconds']:>8.2f} {stats['peak_mb']:>8.1f} "
+                    f"{stats['peak_mb'] - stats['baseline_mb']:>7.1f} {stats['size_mb']:>8.2f}"
+                )
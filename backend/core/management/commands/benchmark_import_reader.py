@@ -0,0 +1,123 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter so ru_maxrss only reflects one read
+CHILD_SCRIPT = '''
+import json, resource, sys, time
+import django
+django.setup()
+import pandas as pd
+from django.core.files import File
+from core.utils import ImportProcessor
+
+path, mode = sys.argv[1], sys.argv[2]
+
+def peak_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+baseline = peak_mb()
+started = time.perf_counter()
+rows = 0
+with open(path, 'rb') as fileobj:
+    if mode == 'streaming':
+        processor = ImportProcessor(File(fileobj, name=path))
+        for batch in processor.iter_batches():
+            rows += len(batch)
+    else:
+        # Previous reader: whole file into a DataFrame, then a list of dicts
+        if path.endswith('.xlsx'):
+            df = pd.read_excel(fileobj, engine='openpyxl')
+        else:
+            df = pd.read_csv(fileobj, encoding='utf-8')
+        data = df.to_dict('records')
+        rows = len(data)
+
+print(json.dumps({
+    'rows': rows,
+    'seconds': time.perf_counter() - started,
+    'baseline_mb': baseline,
+    'peak_mb': peak_mb(),
+}))
+'''
+
+
+class Command(BaseCommand):
+    help = 'Measure peak RSS and time of reading an import file in batches (and, with --compare, all at once)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            nargs='+',
+            default=[10000, 100000],
+            help='Row counts of the generated files (default: 10000 100000)'
+        )
+        parser.add_argument(
+            '--format',
+            choices=['csv', 'xlsx'],
+            default='csv',
+            help='Generated file format (default: csv)'
+        )
+        parser.add_argument(
+            '--compare',
+            action='store_true',
+            help='Also run the previous whole-file reader for comparison'
+        )
+
+    def make_file(self, rows_count, file_format):
+        headers = ['ID', 'ชื่อ', 'นามสกุล', 'หน่วยงาน', 'ตำแหน่ง']
+        rows = (
+            (100000 + i, f'ผู้เข้าร่วม{i}', 'ทดสอบ', f'หน่วยงาน {i % 400}', 'พยาบาลวิชาชีพ')
+            for i in range(rows_count)
+        )
+        fd, path = tempfile.mkstemp(suffix=f'.{file_format}')
+        os.close(fd)
+        if file_format == 'xlsx':
+            from openpyxl import Workbook
+            wb = Workbook(write_only=True)
+            ws = wb.create_sheet()
+            ws.append(headers)
+            for row in rows:
+                ws.append(row)
+            wb.save(path)
+        else:
+            import csv
+            with open(path, 'w', encoding='utf-8', newline='') as fileobj:
+                writer = csv.writer(fileobj)
+                writer.writerow(headers)
+                writer.writerows(rows)
+        return path
+
+    def run_child(self, path, mode):
+        result = subprocess.run(
+            [sys.executable, '-c', CHILD_SCRIPT, path, mode],
+            cwd=settings.BASE_DIR,
+            env=os.environ.copy(),
+            capture_output=True,
+            text=True
+        )
+        if result.returncode != 0:
+            raise CommandError(result.stderr.strip())
+        return json.loads(result.stdout.strip().splitlines()[-1])
+
+    def handle(self, *args, **options):
+        modes = ['streaming', 'whole'] if options['compare'] else ['streaming']
+
+        self.stdout.write(f"{'mode':<10} {'rows':>8} {'file MB':>8} {'seconds':>8} {'peak MB':>8} {'+MB':>7}")
+        for rows_count in options['rows']:
+            path = self.make_file(rows_count, options['format'])
+            try:
+                size_mb = os.path.getsize(path) / 1024 / 1024
+                for mode in modes:
+                    stats = self.run_child(path, mode)
+                    self.stdout.write(
+                        f"{mode:<10} {stats['rows']:>8} {size_mb:>8.1f} {stats['seconds']:>8.2f} "
+                        f"{stats['peak_mb']:>8.1f} {stats['peak_mb'] - stats['baseline_mb']:>7.1f}"
+                    )
+            finally:
+                os.remove(path)
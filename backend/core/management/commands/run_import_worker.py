@@ -0,0 +1,51 @@
+import logging
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from core import import_jobs
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Run background import jobs from the Redis queue'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit when the queue is empty instead of waiting for new jobs'
+        )
+        parser.add_argument(
+            '--timeout',
+            type=int,
+            default=5,
+            help='Seconds to block waiting for a job before checking for stale jobs (default: 5)'
+        )
+
+    def handle(self, *args, **options):
+        requeued = import_jobs.requeue_stale_jobs()
+        if requeued:
+            self.stdout.write(f'Requeued {requeued} stale import job(s)')
+
+        connection = import_jobs.get_connection()
+        last_stale_check = time.monotonic()
+        self.stdout.write('Waiting for import jobs...')
+        while True:
+            item = connection.blpop([import_jobs.QUEUE_KEY], timeout=options['timeout'])
+            if item is None:
+                if options['once']:
+                    return
+                if time.monotonic() - last_stale_check > import_jobs.STALE_AFTER.total_seconds():
+                    import_jobs.requeue_stale_jobs()
+                    last_stale_check = time.monotonic()
+                continue
+
+            job_id = item[1].decode()
+            close_old_connections()
+            job = import_jobs.run_job(job_id)
+            close_old_connections()
+            if job is None:
+                logger.info(f'Import job {job_id} skipped (already taken or finished)')
+            else:
+                self.stdout.write(f'Import job {job_id}: {job.status}')
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:05
+
+import django.core.serializers.json
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_alter_department_code'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('participants', 'ผู้เข้าร่วม')], max_length=30, verbose_name='ประเภท')),
+                ('file', models.FileField(blank=True, upload_to='imports/%Y/%m/', verbose_name='ไฟล์')),
+                ('file_name', models.CharField(blank=True, max_length=255, verbose_name='ชื่อไฟล์')),
+                ('column_mapping', models.JSONField(blank=True, default=dict, verbose_name='Column mapping')),
+                ('status', models.CharField(choices=[('pending', 'รอดำเนินการ'), ('running', 'กำลังดำเนินการ'), ('completed', 'เสร็จสิ้น'), ('failed', 'ล้มเหลว')], default='pending', max_length=20, verbose_name='สถานะ')),
+                ('step', models.CharField(choices=[('read', 'อ่านไฟล์'), ('validate', 'ตรวจสอบข้อมูล'), ('write', 'บันทึกข้อมูล'), ('done', 'เสร็จสิ้น')], default='read', max_length=20, verbose_name='ขั้นตอน')),
+                ('total_rows', models.PositiveIntegerField(default=0, verbose_name='จำนวนแถวทั้งหมด')),
+                ('rows_parsed', models.PositiveIntegerField(default=0, verbose_name='แถวที่อ่านแล้ว')),
+                ('rows_validated', models.PositiveIntegerField(default=0, verbose_name='แถวที่ตรวจสอบแล้ว')),
+                ('rows_written', models.PositiveIntegerField(default=0, verbose_name='แถวที่บันทึกแล้ว')),
+                ('error_rows', models.PositiveIntegerField(default=0, verbose_name='แถวที่ผิดพลาด')),
+                ('errors', models.JSONField(blank=True, default=list, encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='รายการข้อผิดพลาด')),
+                ('result', models.JSONField(blank=True, default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='ผลลัพธ์')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('event', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='import_jobs', to='core.event', verbose_name='กิจกรรม')),
+                ('org', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='import_jobs', to='core.organization', verbose_name='หน่วยงาน')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='import_jobs', to=settings.AUTH_USER_MODEL, verbose_name='ผู้ใช้')),
+            ],
+            options={
+                'verbose_name': 'งาน Import',
+                'verbose_name_plural': 'งาน Import',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'updated_at'], name='core_import_status_13eb46_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_importjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='mode',
+            field=models.CharField(choices=[('full', 'บันทึกทุกแถว'), ('incremental', 'บันทึกเฉพาะแถวที่ใหม่หรือเปลี่ยนแปลง')], default='full', max_length=20, verbose_name='โหมด'),
+        ),
+    ]
@@ -1,7 +1,9 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser, BaseUserManager
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import RegexValidator
 import json
+import uuid
 
 
 class Organization(models.Model):
@@ -263,3 +265,80 @@ class LoginPageSettings(models.Model):
             return f"Login Settings - {self.org.name}"
         return "Login Settings (Global)"
 
+
+
+class ImportJob(models.Model):
+    """งาน import ไฟล์ที่ทำงานเบื้องหลัง (ดู core.import_jobs)"""
+    KIND_CHOICES = [
+        ('participants', 'ผู้เข้าร่วม'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'รอดำเนินการ'),
+        ('running', 'กำลังดำเนินการ'),
+        ('completed', 'เสร็จสิ้น'),
+        ('failed', 'ล้มเหลว'),
+    ]
+    STEP_CHOICES = [
+        ('read', 'อ่านไฟล์'),
+        ('validate', 'ตรวจสอบข้อมูล'),
+        ('write', 'บันทึกข้อมูล'),
+        ('done', 'เสร็จสิ้น'),
+    ]
+    MODE_CHOICES = [
+        ('full', 'บันทึกทุกแถว'),
+        ('incremental', 'บันทึกเฉพาะแถวที่ใหม่หรือเปลี่ยนแปลง'),
+    ]
+
+    # Unguessable id: also used as the WebSocket group name for progress
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    org = models.ForeignKey(
+        Organization,
+        on_delete=models.CASCADE,
+        related_name='import_jobs',
+        verbose_name="หน่วยงาน"
+    )
+    user = models.ForeignKey(
+        'accounts.User',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='import_jobs',
+        verbose_name="ผู้ใช้"
+    )
+    event = models.ForeignKey(
+        Event,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='import_jobs',
+        verbose_name="กิจกรรม"
+    )
+    kind = models.CharField(max_length=30, choices=KIND_CHOICES, verbose_name="ประเภท")
+    file = models.FileField(upload_to='imports/%Y/%m/', blank=True, verbose_name="ไฟล์")
+    file_name = models.CharField(max_length=255, blank=True, verbose_name="ชื่อไฟล์")
+    column_mapping = models.JSONField(default=dict, blank=True, verbose_name="Column mapping")
+    mode = models.CharField(max_length=20, choices=MODE_CHOICES, default='full', verbose_name="โหมด")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', verbose_name="สถานะ")
+    step = models.CharField(max_length=20, choices=STEP_CHOICES, default='read', verbose_name="ขั้นตอน")
+    total_rows = models.PositiveIntegerField(default=0, verbose_name="จำนวนแถวทั้งหมด")
+    rows_parsed = models.PositiveIntegerField(default=0, verbose_name="แถวที่อ่านแล้ว")
+    rows_validated = models.PositiveIntegerField(default=0, verbose_name="แถวที่ตรวจสอบแล้ว")
+    rows_written = models.PositiveIntegerField(default=0, verbose_name="แถวที่บันทึกแล้ว")
+    error_rows = models.PositiveIntegerField(default=0, verbose_name="แถวที่ผิดพลาด")
+    errors = models.JSONField(default=list, blank=True, encoder=DjangoJSONEncoder, verbose_name="รายการข้อผิดพลาด")
+    result = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder, verbose_name="ผลลัพธ์")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "งาน Import"
+        verbose_name_plural = "งาน Import"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'updated_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} - {self.file_name} ({self.get_status_display()})"
@@ -0,0 +1,154 @@
+import hashlib
+import logging
+import re
+import uuid
+import zlib
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+from django.utils.cache import patch_vary_headers
+from django.utils.safestring import mark_safe
+from django.utils.text import compress_string
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'data_version'
+ROWS_KEY = 'print_rows'
+CACHE_TTL = 60 * 60
+CHUNK_ROWS = 500
+
+# Row templates start every row with ROW_MARKER and put RANK_MARKER where the rank goes.
+# Both are HTML comments, so they cannot appear inside auto-escaped values.
+ROW_MARKER = '<!--row-->'
+RANK_MARKER = '<!--rank-->'
+
+re_accepts_gzip = re.compile(r'\bgzip\b')
+
+
+def _version_key(namespace: str, scope_id: Any) -> str:
+    return f'{VERSION_KEY}:{namespace}:{scope_id}'
+
+
+def get_version(namespace: str, scope_id: Any) -> str:
+    """
+    version ของข้อมูลชุดหนึ่ง (เช่น 'participants' ต่อ event, 'raffle_winners' ต่อ RaffleEvent)
+    ใช้เป็นส่วนหนึ่งของ cache key / ETag: เมื่อ bump_version แล้ว ผลลัพธ์ของ version เก่าจะไม่ถูกใช้อีก
+    """
+    key = _version_key(namespace, scope_id)
+    try:
+        version = cache.get(key)
+        if version is None:
+            version = uuid.uuid4().hex[:12]
+            # add() keeps a version another request set first
+            if not cache.add(key, version, None):
+                version = cache.get(key) or version
+        return version
+    except Exception as e:
+        logger.warning(f'Data version read failed ({namespace}): {e}')
+        # Unique per request: never serves a stale entry, never matches an ETag
+        return uuid.uuid4().hex[:12]
+
+
+def bump_version(namespace: str, *scope_ids: Any) -> None:
+    """เปลี่ยน version ของ scope ที่ระบุ (ได้หลายตัว) หลัง transaction commit"""
+    keys = [_version_key(namespace, scope_id) for scope_id in scope_ids]
+    if not keys:
+        return
+
+    def run():
+        try:
+            cache.set_many({key: uuid.uuid4().hex[:12] for key in keys}, None)
+        except Exception as e:
+            logger.warning(f'Data version bump failed ({namespace}): {e}')
+            try:
+                cache.delete_many(keys)
+            except Exception:
+                pass
+
+    transaction.on_commit(run)
+
+
+def _hash(params: Sequence[Any]) -> str:
+    return hashlib.sha1(repr(list(params)).encode()).hexdigest()
+
+
+class PrintSheetCache:
+    """
+    Cache แถวของหน้า HTML สำหรับพิมพ์ (รายชื่อผู้ชนะ / ผู้เข้าร่วม)
+
+    - แถวของตารางเก็บเป็น chunk ละ CHUNK_ROWS แถว ต่อ version + ตัวกรอง (ไม่รวมช่วง start/end)
+      ช่วง start_index/end_index ที่ต่างกันจึงใช้ chunk เดียวกันได้ ลำดับ (rank) ใส่ตอนประกอบหน้า
+    - หน้าเต็ม (หัวกระดาษ, วันที่พิมพ์) render ใหม่ทุก request จาก rows_html จึงไม่ cache ทั้งหน้า
+
+    ตัวอย่าง:
+        sheet = PrintSheetCache(request, 'winners', version, filters)
+        rows_html, count = sheet.render_rows('raffle/winners_print_rows.html', 'winners', fetch_rows, start, end)
+        return sheet.response(render_to_string(..., {'rows_html': rows_html, 'print_date': ..., ...}))
+    """
+
+    def __init__(self, request, kind: str, version: str, filters: Sequence[Any]):
+        self.request = request
+        self.kind = kind
+        self.version = version
+        self.rows_hash = _hash([kind, getattr(request, 'org_id', None), *filters])
+
+    def response(self, html: str) -> HttpResponse:
+        """ส่งแบบ gzip ถ้า client รองรับ"""
+        content = html.encode('utf-8')
+        if re_accepts_gzip.search(self.request.META.get('HTTP_ACCEPT_ENCODING', '')):
+            response = HttpResponse(compress_string(content), content_type='text/html; charset=utf-8')
+            response['Content-Encoding'] = 'gzip'
+        else:
+            response = HttpResponse(content, content_type='text/html; charset=utf-8')
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
+
+    def _chunk_key(self, index: int) -> str:
+        return f'{ROWS_KEY}:{self.version}:{self.rows_hash}:{index}'
+
+    def _load_chunk(self, index: int, template_name: str, context_name: str,
+                    fetch_rows: Callable[[int, int], List[Dict[str, Any]]]) -> List[str]:
+        try:
+            cached = cache.get(self._chunk_key(index))
+        except Exception as e:
+            logger.warning(f'Print rows cache read failed: {e}')
+            cached = None
+        if cached is not None:
+            return zlib.decompress(cached).decode('utf-8').split(ROW_MARKER)[1:]
+
+        rows = fetch_rows(index * CHUNK_ROWS, (index + 1) * CHUNK_ROWS)
+        html = render_to_string(template_name, {context_name: rows})
+        try:
+            cache.set(self._chunk_key(index), zlib.compress(html.encode('utf-8')), CACHE_TTL)
+        except Exception as e:
+            logger.warning(f'Print rows cache write failed: {e}')
+        return html.split(ROW_MARKER)[1:]
+
+    def render_rows(self, template_name: str, context_name: str,
+                    fetch_rows: Callable[[int, int], List[Dict[str, Any]]],
+                    start: int = 0, end: Optional[int] = None):
+        """
+        HTML ของแถวในช่วง [start, end) ประกอบจาก chunk ใน cache (render เฉพาะ chunk ที่ยังไม่มี)
+        fetch_rows(offset, limit_end) คืนรายการ dict ของแถวในช่วงนั้นตามลำดับเต็ม
+
+        Returns: (rows_html, จำนวนแถว)
+        """
+        fragments: List[str] = []
+        index = start // CHUNK_ROWS
+        while end is None or index * CHUNK_ROWS < end:
+            chunk = self._load_chunk(index, template_name, context_name, fetch_rows)
+            chunk_start = index * CHUNK_ROWS
+            fragments.extend(chunk[max(start - chunk_start, 0):(end - chunk_start) if end is not None else None])
+            if len(chunk) < CHUNK_ROWS:
+                break
+            index += 1
+
+        rows_html = mark_safe(''.join(_with_ranks(fragments)))
+        return rows_html, len(fragments)
+
+
+def _with_ranks(fragments: Iterable[str]):
+    for rank, fragment in enumerate(fragments, start=1):
+        yield fragment.replace(RANK_MARKER, str(rank), 1)
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Organization, Department, Event, ModuleRegistry, AuditLog, LoginPageSettings
+from .models import Organization, Department, Event, ModuleRegistry, AuditLog, LoginPageSettings, ImportJob
 
 
 class OrganizationSerializer(serializers.ModelSerializer):
@@ -113,3 +113,21 @@ class LoginPageSettingsSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'timestamp']
 
+
+
+class ImportJobSerializer(serializers.ModelSerializer):
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    step_display = serializers.CharField(source='get_step_display', read_only=True)
+    ws_path = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ImportJob
+        fields = [
+            'id', 'kind', 'mode', 'event', 'file_name', 'status', 'status_display', 'step', 'step_display',
+            'total_rows', 'rows_parsed', 'rows_validated', 'rows_written', 'error_rows',
+            'errors', 'result', 'ws_path', 'created_at', 'updated_at', 'started_at', 'finished_at'
+        ]
+        read_only_fields = fields
+
+    def get_ws_path(self, obj):
+        return f'/ws/imports/{obj.id}/'
@@ -0,0 +1,235 @@
+import codecs
+import io
+import os
+import shutil
+import tempfile
+from unittest import mock
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from openpyxl import Workbook
+from teams.models import Participant
+from . import import_jobs
+from .exports import ExcelExporter
+from .models import Event, ImportJob, Organization
+from .utils import ImportProcessor, sniff_encoding, _xlsx_columns
+
+HEADER = ['ID', 'ชื่อ', 'นามสกุล', 'หน่วยงาน']
+MAPPING = {'hospital_id': 'ID', 'first_name': 'ชื่อ', 'last_name': 'นามสกุล', 'department': 'หน่วยงาน'}
+
+
+def csv_upload(rows, encoding='utf-8', name='roster.csv'):
+    lines = [','.join(HEADER)] + [','.join(map(str, row)) for row in rows]
+    return SimpleUploadedFile(name, ('\n'.join(lines) + '\n').encode(encoding))
+
+
+def xlsx_upload(rows, name='roster.xlsx'):
+    wb = Workbook()
+    ws = wb.active
+    for row in rows:
+        ws.append(row)
+    content = io.BytesIO()
+    wb.save(content)
+    return SimpleUploadedFile(name, content.getvalue())
+
+
+def roster(count):
+    return [(1000 + i, f'ชื่อ{i}', 'ทดสอบ', f'หน่วยงาน {i % 3}') for i in range(count)]
+
+
+def keep_named_rows(frame):
+    """normalize สำหรับทดสอบ: แถวที่ไม่มีชื่อเป็น error"""
+    invalid = frame['first_name'].isna()
+    errors = [{'row': idx + 1, 'errors': ['missing name'], 'data': {}} for idx in frame.index[invalid]]
+    return frame[~invalid], errors
+
+
+class SniffEncodingTests(SimpleTestCase):
+
+    def test_bom_is_utf8_sig(self):
+        self.assertEqual(sniff_encoding(io.BytesIO(codecs.BOM_UTF8 + 'ชื่อ'.encode('utf-8'))), 'utf-8-sig')
+
+    def test_thai_utf8_and_tis620(self):
+        text = 'ID,ชื่อ\n1,สมชาย\n'
+        self.assertEqual(sniff_encoding(io.BytesIO(text.encode('utf-8'))), 'utf-8')
+        self.assertEqual(sniff_encoding(io.BytesIO(text.encode('tis-620'))), 'tis-620')
+
+    def test_first_non_ascii_block_decides(self):
+        content = b'a' * 100 + 'ไทย'.encode('tis-620')
+        self.assertEqual(sniff_encoding(io.BytesIO(content), block_size=16), 'tis-620')
+        self.assertEqual(sniff_encoding(io.BytesIO(b'ID,name\n1,a\n')), 'utf-8')
+
+    def test_restores_the_file_position(self):
+        fileobj = io.BytesIO(b'xxID,name\n')
+        fileobj.seek(2)
+        sniff_encoding(fileobj)
+        self.assertEqual(fileobj.tell(), 2)
+
+
+class XlsxColumnsTests(SimpleTestCase):
+
+    def test_same_names_as_pandas(self):
+        self.assertEqual(
+            _xlsx_columns(['ID', None, 'ชื่อ', ' ', 'ชื่อ', 'ชื่อ', 7]),
+            ['ID', 'Unnamed: 1', 'ชื่อ', 'Unnamed: 3', 'ชื่อ.1', 'ชื่อ.2', '7']
+        )
+
+
+class ExcelExporterTemplateTests(SimpleTestCase):
+
+    def template(self, header_row):
+        wb = Workbook()
+        if header_row:
+            wb.active.append(header_row)
+        path = tempfile.NamedTemporaryFile(suffix='.xlsx', delete=False).name
+        self.addCleanup(os.remove, path)
+        wb.save(path)
+        return path
+
+    def test_appends_extra_headers_to_template_headers(self):
+        exporter = ExcelExporter.from_template(
+            self.template(['ID', 'ชื่อ']), extra_headers=['ลงชื่อ'], default_headers=['A', 'B', 'ลงชื่อ']
+        )
+        self.assertEqual(exporter.headers, ['ID', 'ชื่อ', 'ลงชื่อ'])
+
+    def test_template_without_headers_uses_the_defaults(self):
+        exporter = ExcelExporter.from_template(
+            self.template(None), extra_headers=['ลงชื่อ'], default_headers=['A', 'B', 'ลงชื่อ']
+        )
+        self.assertEqual(exporter.headers, ['A', 'B', 'ลงชื่อ'])
+
+    def test_csv_batches_keep_file_row_positions(self):
+        processor = ImportProcessor(csv_upload(roster(12), encoding='tis-620'))
+
+        batches = list(processor.iter_batches(batch_size=5, column_mapping=MAPPING))
+
+        self.assertEqual([len(batch) for batch in batches], [5, 5, 2])
+        self.assertEqual(list(batches[1].index), [5, 6, 7, 8, 9])
+        self.assertEqual(list(batches[0].columns), list(MAPPING))
+        self.assertEqual(batches[2]['first_name'].tolist(), ['ชื่อ10', 'ชื่อ11'])
+
+    def test_xlsx_batches_skip_empty_rows(self):
+        rows = [HEADER, *roster(3)[:2], (None, None, None, None), roster(3)[2]]
+        processor = ImportProcessor(xlsx_upload(rows))
+
+        batches = list(processor.iter_batches(batch_size=2))
+
+        self.assertEqual([len(batch) for batch in batches], [2, 1])
+        self.assertEqual(list(batches[1].index), [3])
+
+    def test_validate_rows_counts_every_batch(self):
+        rows = roster(9)
+        rows[4] = (1004, '', 'ทดสอบ', 'หน่วยงาน 1')
+        processor = ImportProcessor(csv_upload(rows))
+        progress = []
+
+        summary = processor.validate_rows(
+            MAPPING, keep_named_rows, on_batch=lambda s: progress.append(s['total_rows']), batch_size=4
+        )
+
+        self.assertEqual(summary['total_rows'], 9)
+        self.assertEqual(summary['valid_rows'], 8)
+        self.assertEqual(summary['error_rows'], 1)
+        self.assertEqual(summary['errors'][0]['row'], 5)
+        self.assertEqual(progress, [4, 8, 9])
+
+    def test_write_rows_resumes_after_skip_rows(self):
+        saved = []
+
+        def save(frame):
+            saved.extend(frame['hospital_id'].tolist())
+            return {'created_count': len(frame)}
+
+        processor = ImportProcessor(csv_upload(roster(12)))
+        counts = processor.write_rows(MAPPING, keep_named_rows, save, skip_rows=7, batch_size=5)
+
+        # Rows 0-6 were written before the interruption; the rest of batch 2 and all of batch 3 are saved
+        self.assertEqual(saved, [1000 + i for i in range(7, 12)])
+        self.assertEqual(counts, {'created_count': 5})
+
+    def test_write_rows_skip_counts_valid_rows_only(self):
+        rows = roster(6)
+        rows[1] = (1001, '', 'ทดสอบ', 'หน่วยงาน 1')
+        saved = []
+
+        def save(frame):
+            saved.extend(frame['hospital_id'].tolist())
+            return {}
+
+        ImportProcessor(csv_upload(rows)).write_rows(MAPPING, keep_named_rows, save, skip_rows=2, batch_size=3)
+
+        self.assertEqual(saved, [1003, 1004, 1005])
+
+
+class ImportJobRunnerTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.media_root = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, cls.media_root, ignore_errors=True)
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        cls.org = Organization.objects.create(name='โรงพยาบาลทดสอบ', code='test')
+        cls.event = Event.objects.create(org=cls.org, name='กีฬาสี', start_date=now, end_date=now)
+
+    def run_job(self, rows, **fields):
+        with override_settings(MEDIA_ROOT=self.media_root), \
+                mock.patch.object(import_jobs, 'WRITE_CHUNK_ROWS', 4), \
+                mock.patch.object(import_jobs, 'publish'):
+            job = ImportJob.objects.create(
+                org=self.org,
+                event=self.event,
+                kind='participants',
+                file=csv_upload(rows),
+                file_name='roster.csv',
+                column_mapping=MAPPING,
+                status='running',
+                **fields
+            )
+            with self.captureOnCommitCallbacks(execute=True):
+                import_jobs.ImportJobRunner(job).run()
+        job.refresh_from_db()
+        return job
+
+    def test_runs_every_step(self):
+        job = self.run_job(roster(10))
+
+        self.assertEqual((job.status, job.step), ('completed', 'done'))
+        self.assertEqual(job.rows_written, 10)
+        self.assertEqual(job.result['created_count'], 10)
+        self.assertEqual(Participant.objects.filter(event=self.event).count(), 10)
+        self.assertFalse(job.file)
+
+    def test_resumes_after_rows_already_written(self):
+        # A worker died after writing the first 6 rows (one chunk and a half) of the file
+        rows = roster(10)
+        for hospital_id, first_name, last_name, _ in rows[:6]:
+            Participant.objects.create(
+                org=self.org, event=self.event, name=f'{first_name} {last_name}', hospital_id=hospital_id
+            )
+
+        job = self.run_job(rows, rows_written=6, result={'created_count': 6, 'updated_count': 0})
+
+        self.assertEqual(job.status, 'completed')
+        self.assertEqual(job.rows_written, 10)
+        self.assertEqual(job.result['created_count'], 10)
+        self.assertEqual(
+            sorted(Participant.objects.filter(event=self.event).values_list('hospital_id', flat=True)),
+            [1000 + i for i in range(10)]
+        )
+        # Rows written before the interruption are not read back into the upsert
+        self.assertEqual(Participant.objects.filter(event=self.event, import_hash='').count(), 6)
+
+    def test_invalid_rows_fail_before_writing(self):
+        rows = roster(5)
+        rows[2] = (1002, '', '', 'หน่วยงาน 2')
+
+        job = self.run_job(rows)
+
+        self.assertEqual(job.status, 'failed')
+        self.assertEqual(job.error_rows, 1)
+        self.assertEqual(job.rows_written, 0)
+        self.assertFalse(Participant.objects.filter(event=self.event).exists())
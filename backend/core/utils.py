@@ -1,72 +1,281 @@
+import codecs
+import hashlib
+import logging
 import pandas as pd
 import io
-from typing import Dict, List, Any, Optional
+from typing import Callable, Dict, Iterable, Iterator, List, Any, Optional, Tuple
+from django.core.cache import cache
 from django.core.files.uploadedfile import InMemoryUploadedFile
+from openpyxl import load_workbook
 import json
 
+logger = logging.getLogger(__name__)
+
+READ_BATCH_ROWS = 5000
+ENCODING_SAMPLE_BYTES = 64 * 1024
+MAX_ERRORS = 1000
+MAX_PREVIEW_ROWS = 1000
+# Parsed header / preview of an upload, keyed by a hash of its content (users re-upload the same file while mapping)
+HEADER_CACHE_KEY = 'import_header'
+PREVIEW_CACHE_KEY = 'import_preview'
+HEADER_CACHE_TTL = 60 * 60
+
+
+def sniff_encoding(fileobj, block_size: int = ENCODING_SAMPLE_BYTES) -> str:
+    """
+    เดา encoding ของไฟล์ CSV (utf-8-sig / utf-8 / tis-620) จากช่วงต้นของไฟล์
+    อ่านทีละ block จนเจอ block แรกที่มีอักขระที่ไม่ใช่ ASCII (ปกติคือหัวตารางภาษาไทย) แล้วคืนตำแหน่งไฟล์เดิม
+    """
+    start = fileobj.tell()
+    try:
+        block = fileobj.read(block_size)
+        if block.startswith(codecs.BOM_UTF8):
+            return 'utf-8-sig'
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        while block:
+            try:
+                decoder.decode(block, final=False)
+            except UnicodeDecodeError:
+                return 'tis-620'
+            if not block.isascii():
+                return 'utf-8'
+            block = fileobj.read(block_size)
+        return 'utf-8'
+    finally:
+        fileobj.seek(start)
+
+
+def _binary_file(fileobj):
+    # Django File wrappers have no binary mode, so pandas would read them as text and ignore the encoding
+    while not isinstance(fileobj, io.IOBase) and hasattr(fileobj, 'file'):
+        fileobj = fileobj.file
+    return fileobj
+
+
+def _xlsx_columns(header: Iterable[Any]) -> List[str]:
+    # Same names pandas.read_excel gives: 'Unnamed: n' for blank headers, 'name.1' for repeats
+    columns = []
+    seen = {}
+    for index, value in enumerate(header):
+        name = f'Unnamed: {index}' if value is None or str(value).strip() == '' else str(value)
+        if name in seen:
+            seen[name] += 1
+            name = f'{name}.{seen[name]}'
+        else:
+            seen[name] = 0
+        columns.append(name)
+    return columns
+
 
 class ImportProcessor:
-    """Class สำหรับประมวลผลไฟล์ import (xlsx/csv)"""
+    """
+    Class สำหรับประมวลผลไฟล์ import (xlsx/csv)
+
+    ไฟล์ใหญ่อ่านเป็น batch ด้วย iter_batches (read_csv chunksize / openpyxl read_only)
+    เพื่อให้ memory ขึ้นกับขนาด batch ไม่ใช่ขนาดไฟล์:
+        processor = ImportProcessor(file)
+        header = processor.read_header()
+        validation = processor.validate_mapping(column_mapping)
+        summary = processor.validate_rows(column_mapping, importer.normalize)
+        if not summary['error_rows']:
+            counts = processor.write_rows(column_mapping, importer.normalize, importer.save)
+    """
     
     def __init__(self, file: InMemoryUploadedFile):
         self.file = file
-        self.df = None
+        self.columns = None
+        self.encoding = None
+        self.total_rows_estimate = None
+        self._content_hash = None
+        self._line_count = 0
         self.errors = []
         self.warnings = []
     
-    def read_file(self) -> Dict[str, Any]:
-        """อ่านไฟล์และแปลงเป็น DataFrame"""
+    @property
+    def file_extension(self) -> str:
+        return self.file.name.split('.')[-1].lower()
+    
+    def _csv_encoding(self) -> str:
+        if self.encoding is None:
+            self.file.seek(0)
+            self.encoding = sniff_encoding(self.file)
+        return self.encoding
+    
+    def _check_extension(self) -> bool:
+        if self.file_extension in ('xlsx', 'csv'):
+            return True
+        self.errors.append(f"Unsupported file format: {self.file_extension}")
+        return False
+    
+    def content_hash(self) -> str:
+        """sha1 ของเนื้อไฟล์ (อ่านทีละ chunk และนับจำนวนบรรทัดไปพร้อมกันสำหรับประมาณจำนวนแถวของ CSV)"""
+        if self._content_hash is None:
+            digest = hashlib.sha1()
+            line_count = 0
+            last = b''
+            self.file.seek(0)
+            for chunk in self.file.chunks():
+                digest.update(chunk)
+                line_count += chunk.count(b'\n')
+                last = chunk[-1:]
+            if last and last != b'\n':
+                line_count += 1
+            self.file.seek(0)
+            self._content_hash = digest.hexdigest()
+            self._line_count = line_count
+        return self._content_hash
+    
+    def _cache_key(self, prefix: str, *parts: Any) -> str:
+        return ':'.join([prefix, self.file_extension, self.content_hash(), *map(str, parts)])
+    
+    def _header_result(self) -> Dict[str, Any]:
+        return {
+            'success': True,
+            'columns': self.columns,
+            'total_rows': self.total_rows_estimate,
+            'total_rows_estimated': True
+        }
+    
+    def read_header(self) -> Dict[str, Any]:
+        """
+        อ่านเฉพาะหัวตาราง (แถวแรก) และประมาณจำนวนแถว
+        (xlsx: จาก dimension ของ sheet, csv: จากจำนวนบรรทัด) ผลถูก cache ตาม hash ของไฟล์
+        """
+        if not self._check_extension():
+            return {'success': False, 'errors': self.errors}
         try:
-            file_extension = self.file.name.split('.')[-1].lower()
+            key = self._cache_key(HEADER_CACHE_KEY)
+            try:
+                cached = cache.get(key)
+            except Exception as e:
+                logger.warning(f'Import header cache read failed: {e}')
+                cached = None
+            if cached is not None:
+                self.columns = cached['columns']
+                self.encoding = cached['encoding']
+                self.total_rows_estimate = cached['total_rows']
+                return self._header_result()
             
-            if file_extension == 'xlsx':
-                self.df = pd.read_excel(self.file, engine='openpyxl')
-            elif file_extension == 'csv':
-                # Try different encodings
+            self.file.seek(0)
+            if self.file_extension == 'xlsx':
+                wb = load_workbook(_binary_file(self.file), read_only=True, data_only=True)
                 try:
-                    self.df = pd.read_csv(self.file, encoding='utf-8')
-                except UnicodeDecodeError:
-                    self.df = pd.read_csv(self.file, encoding='tis-620')
+                    ws = wb.active
+                    header = next(ws.iter_rows(max_row=1, values_only=True), ())
+                    # Read from the sheet's dimension tag; None when the writer left it out
+                    self.total_rows_estimate = max(ws.max_row - 1, 0) if ws.max_row else None
+                finally:
+                    wb.close()
+                self.columns = _xlsx_columns(header)
             else:
-                self.errors.append(f"Unsupported file format: {file_extension}")
-                return {'success': False, 'errors': self.errors}
+                self.columns = list(pd.read_csv(_binary_file(self.file), encoding=self._csv_encoding(), nrows=0).columns)
+                self.total_rows_estimate = max(self._line_count - 1, 0)
             
-            # Convert to dict format
-            data = self.df.to_dict('records')
-            
-            return {
-                'success': True,
-                'data': data,
-                'columns': list(self.df.columns),
-                'row_count': len(self.df)
-            }
+            try:
+                cache.set(key, {
+                    'columns': self.columns,
+                    'encoding': self.encoding,
+                    'total_rows': self.total_rows_estimate,
+                }, HEADER_CACHE_TTL)
+            except Exception as e:
+                logger.warning(f'Import header cache write failed: {e}')
+            return self._header_result()
         except Exception as e:
             self.errors.append(f"Error reading file: {str(e)}")
             return {'success': False, 'errors': self.errors}
     
+    def _iter_xlsx(self, batch_size: int) -> Iterator[pd.DataFrame]:
+        wb = load_workbook(_binary_file(self.file), read_only=True, data_only=True)
+        try:
+            rows = wb.active.iter_rows(values_only=True)
+            columns = _xlsx_columns(next(rows, ()))
+            self.columns = columns
+            width = len(columns)
+            batch, index = [], []
+            for position, row in enumerate(rows):
+                if all(value is None for value in row):
+                    continue  # Empty rows are skipped, as read_csv does for blank lines
+                row = tuple(row[:width])
+                batch.append(row + (None,) * (width - len(row)))
+                index.append(position)
+                if len(batch) >= batch_size:
+                    yield pd.DataFrame.from_records(batch, columns=columns, index=index)
+                    batch, index = [], []
+            if batch:
+                yield pd.DataFrame.from_records(batch, columns=columns, index=index)
+        finally:
+            wb.close()
+    
+    def _iter_csv(self, batch_size: int) -> Iterator[pd.DataFrame]:
+        encoding = self._csv_encoding()
+        self.file.seek(0)
+        with pd.read_csv(_binary_file(self.file), encoding=encoding, chunksize=batch_size) as reader:
+            for chunk in reader:
+                self.columns = list(chunk.columns)
+                yield chunk
+    
+    def iter_batches(
+        self,
+        batch_size: int = READ_BATCH_ROWS,
+        column_mapping: Optional[Dict[str, str]] = None
+    ) -> Iterator[pd.DataFrame]:
+        """
+        อ่านไฟล์ทีละ batch (DataFrame ไม่เกิน batch_size แถว, index คือลำดับแถวข้อมูลในไฟล์เริ่มที่ 0)
+        ถ้าระบุ column_mapping จะเปลี่ยนชื่อคอลัมน์เป็นชื่อ field (คอลัมน์ที่ไม่มีในไฟล์ถูกข้าม)
+        """
+        if not self._check_extension():
+            return
+        self.file.seek(0)
+        batches = self._iter_xlsx(batch_size) if self.file_extension == 'xlsx' else self._iter_csv(batch_size)
+        for batch in batches:
+            yield batch if column_mapping is None else self._map(batch, column_mapping)
+    
     def preview(self, limit: int = 10) -> Dict[str, Any]:
-        """Preview ข้อมูล (แสดงแค่บางแถว)"""
-        result = self.read_file()
+        """
+        Preview ข้อมูล: อ่านเฉพาะหัวตารางและ limit แถวแรก (ไม่อ่านทั้งไฟล์)
+        total_rows เป็นค่าประมาณจาก read_header; แถว preview ถูก cache ตาม hash ของไฟล์
+        """
+        result = self.read_header()
         if not result['success']:
             return result
         
-        preview_data = result['data'][:limit]
+        limit = max(1, min(limit, MAX_PREVIEW_ROWS))
+        key = self._cache_key(PREVIEW_CACHE_KEY, limit)
+        try:
+            preview_data = cache.get(key)
+        except Exception as e:
+            logger.warning(f'Import preview cache read failed: {e}')
+            preview_data = None
+        
+        if preview_data is None:
+            try:
+                batches = self.iter_batches(batch_size=limit)
+                head = next(batches, None)
+                batches.close()
+            except Exception as e:
+                self.errors.append(f"Error reading file: {str(e)}")
+                return {'success': False, 'errors': self.errors}
+            preview_data = [] if head is None else head.astype(object).where(head.notna(), None).to_dict('records')
+            try:
+                cache.set(key, preview_data, HEADER_CACHE_TTL)
+            except Exception as e:
+                logger.warning(f'Import preview cache write failed: {e}')
         
         return {
             'success': True,
             'preview': preview_data,
             'columns': result['columns'],
-            'total_rows': result['row_count'],
+            'total_rows': result['total_rows'],
+            'total_rows_estimated': True,
             'preview_rows': len(preview_data)
         }
     
     def validate_mapping(self, column_mapping: Dict[str, str]) -> Dict[str, Any]:
         """
-        Validate column mapping
+        Validate column mapping (ใช้แค่หัวตาราง ไม่อ่านทั้งไฟล์)
         column_mapping: {'field_name': 'column_name', ...}
         """
         # Ensure column_mapping is a dict
-        import json
         if isinstance(column_mapping, str):
             try:
                 column_mapping = json.loads(column_mapping)
@@ -76,10 +285,10 @@ class ImportProcessor:
         if not isinstance(column_mapping, dict):
             return {'success': False, 'errors': ['column_mapping must be a dictionary']}
         
-        if self.df is None:
-            self.read_file()
+        if self.columns is None:
+            self.read_header()
         
-        if self.df is None:
+        if self.columns is None:
             return {'success': False, 'errors': ['File not read yet']}
         
         validation_result = {
@@ -91,7 +300,7 @@ class ImportProcessor:
         }
         
         # ตรวจสอบว่า column ที่ map มีอยู่ในไฟล์หรือไม่
-        available_columns = list(self.df.columns)
+        available_columns = list(self.columns)
         
         for field_name, column_name in column_mapping.items():
             if column_name in available_columns:
@@ -112,62 +321,77 @@ class ImportProcessor:
         
         return validation_result
     
-    def process_data(
+    @staticmethod
+    def _map(frame: pd.DataFrame, column_mapping: Dict[str, str]) -> pd.DataFrame:
+        mapped = {
+            field_name: frame[column_name]
+            for field_name, column_name in column_mapping.items()
+            if column_name in frame.columns
+        }
+        return pd.DataFrame(mapped, index=frame.index)
+    
+    def validate_rows(
         self,
         column_mapping: Dict[str, str],
-        validator_func: Optional[callable] = None
+        normalize: Callable[[pd.DataFrame], Tuple[pd.DataFrame, List[Dict[str, Any]]]],
+        on_batch: Optional[Callable[[Dict[str, Any]], None]] = None,
+        batch_size: int = READ_BATCH_ROWS
     ) -> Dict[str, Any]:
         """
-        Process ข้อมูลตาม column mapping
-        validator_func: function(row_data) -> (is_valid, errors)
+        รอบแรก: ตรวจทุก batch ด้วย normalize(frame) -> (แถวที่ถูกต้อง, errors) โดยไม่เก็บแถวไว้
+        on_batch(summary) ถูกเรียกหลังแต่ละ batch (สำหรับรายงานความคืบหน้า)
+        errors เก็บไม่เกิน MAX_ERRORS รายการ (error_rows นับทั้งหมด)
+
+        Returns: {'total_rows', 'valid_rows', 'error_rows', 'errors'}
         """
-        if self.df is None:
-            self.read_file()
-        
-        if self.df is None:
-            return {'success': False, 'errors': ['File not read yet']}
-        
-        processed_data = []
-        errors = []
-        
-        for idx, row in self.df.iterrows():
-            row_data = {}
-            row_errors = []
-            
-            # Map columns
-            for field_name, column_name in column_mapping.items():
-                if column_name in row:
-                    value = row[column_name]
-                    # Handle NaN values
-                    if pd.isna(value):
-                        value = None
-                    row_data[field_name] = value
-                else:
-                    row_errors.append(f"Column '{column_name}' not found")
-            
-            # Validate row
-            if validator_func:
-                is_valid, validation_errors = validator_func(row_data)
-                if not is_valid:
-                    row_errors.extend(validation_errors)
-            
-            if row_errors:
-                errors.append({
-                    'row': idx + 1,  # 1-based index
-                    'errors': row_errors,
-                    'data': row_data
-                })
-            else:
-                processed_data.append(row_data)
-        
-        return {
-            'success': len(errors) == 0,
-            'data': processed_data,
-            'errors': errors,
-            'total_rows': len(self.df),
-            'valid_rows': len(processed_data),
-            'error_rows': len(errors)
-        }
+        summary = {'total_rows': 0, 'valid_rows': 0, 'error_rows': 0, 'errors': []}
+        for batch in self.iter_batches(batch_size, column_mapping):
+            frame, errors = normalize(batch)
+            summary['total_rows'] += len(batch)
+            summary['valid_rows'] += len(frame)
+            summary['error_rows'] += len(errors)
+            summary['errors'].extend(errors[:MAX_ERRORS - len(summary['errors'])])
+            if on_batch:
+                on_batch(summary)
+        return summary
+    
+    def write_rows(
+        self,
+        column_mapping: Dict[str, str],
+        normalize: Callable[[pd.DataFrame], Tuple[pd.DataFrame, List[Dict[str, Any]]]],
+        save: Callable[[pd.DataFrame], Dict[str, int]],
+        skip_rows: int = 0,
+        batch_size: int = READ_BATCH_ROWS
+    ) -> Dict[str, int]:
+        """
+        รอบที่สอง: อ่านไฟล์อีกครั้งแล้ว save(แถวที่ normalize แล้ว) ทีละ batch
+        skip_rows: จำนวนแถว (ที่ถูกต้อง) แรกที่บันทึกไปแล้ว ใช้ทำต่อจากเดิม
+
+        Returns: ผลรวมของค่าที่ save คืนมา
+        """
+        totals: Dict[str, int] = {}
+        written = 0
+        for batch in self.iter_batches(batch_size, column_mapping):
+            frame, _ = normalize(batch)
+            skip = min(max(skip_rows - written, 0), len(frame))
+            written += len(frame)
+            if skip == len(frame):
+                continue
+            for key, value in save(frame.iloc[skip:]).items():
+                totals[key] = totals.get(key, 0) + value
+        return totals
+
+
+def parse_column_mapping(raw: Any, default: Dict[str, str]) -> Dict[str, str]:
+    """column_mapping จาก request (JSON string หรือ dict) ใช้ default ถ้าไม่ได้ส่งมาหรือรูปแบบไม่ถูกต้อง"""
+    if isinstance(raw, str):
+        try:
+            raw = json.loads(raw)
+        except (json.JSONDecodeError, TypeError):
+            return default
+    if isinstance(raw, dict):
+        return raw
+    return default
 
 
 def create_audit_log(
@@ -201,6 +425,61 @@ def create_audit_log(
     )
 
 
+def create_audit_logs(
+    user,
+    org,
+    action: str,
+    model: str,
+    entries: Iterable[Tuple[Optional[int], Dict]] = (),
+    summary: Optional[Dict] = None,
+    request=None,
+    batch_size: int = 500
+) -> int:
+    """
+    Bulk version ของ create_audit_log: เขียนหลายรายการด้วย bulk_create
+    entries: (object_id, changes) หนึ่งแถวต่อ object
+    summary: ถ้าระบุ เพิ่มแถวสรุปอีกหนึ่งแถว (ไม่มี object_id)
+    org, IP และ user agent หาครั้งเดียวใช้กับทุกแถว
+
+    Returns: จำนวนแถวที่เขียน
+    """
+    from core.models import AuditLog
+    
+    ip_address = None
+    user_agent = ''
+    
+    if request:
+        ip_address = get_client_ip(request)
+        user_agent = request.META.get('HTTP_USER_AGENT', '')
+    
+    logs = [
+        AuditLog(
+            org=org,
+            user=user,
+            action=action,
+            model=model,
+            object_id=object_id,
+            changes=changes or {},
+            ip_address=ip_address,
+            user_agent=user_agent
+        )
+        for object_id, changes in entries
+    ]
+    if summary is not None:
+        logs.append(AuditLog(
+            org=org,
+            user=user,
+            action=action,
+            model=model,
+            changes=summary,
+            ip_address=ip_address,
+            user_agent=user_agent
+        ))
+    
+    AuditLog.objects.bulk_create(logs, batch_size=batch_size)
+    return len(logs)
+
+
 def get_client_ip(request):
     """Get client IP address from request"""
     x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
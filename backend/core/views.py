@@ -3,13 +3,14 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from django.db import models
-from .models import Organization, Department, Event, ModuleRegistry, AuditLog, LoginPageSettings
+from .models import Organization, Department, Event, ModuleRegistry, AuditLog, LoginPageSettings, ImportJob
 from .serializers import (
     OrganizationSerializer, DepartmentSerializer, EventSerializer,
-    ModuleRegistrySerializer, AuditLogSerializer, LoginPageSettingsSerializer
+    ModuleRegistrySerializer, AuditLogSerializer, LoginPageSettingsSerializer, ImportJobSerializer
 )
 from .permissions import IsSuperAdmin, IsOrgAdminOrReadOnly, IsOrgMemberOrReadOnly
-from .utils import ImportProcessor, create_audit_log
+from .utils import ImportProcessor, create_audit_log, parse_column_mapping
+from . import import_jobs
 from rest_framework.permissions import IsAuthenticated
 
 
@@ -371,10 +372,85 @@ class ImportViewSet(viewsets.ViewSet):
             )
         
         processor = ImportProcessor(file)
-        processor.read_file()
         result = processor.validate_mapping(column_mapping)
         
         return Response(result, status=status.HTTP_200_OK)
+    
+    @action(detail=False, methods=['get', 'post'], url_path='jobs')
+    def jobs(self, request):
+        """
+        GET: งาน import ล่าสุดของหน่วยงาน
+        POST: อัปโหลดไฟล์เพื่อ import เบื้องหลัง (file, kind, event_id, column_mapping, mode)
+        ติดตามความคืบหน้าได้ที่ GET jobs/<id>/ หรือ WebSocket ws_path ของ job
+        """
+        org_id = getattr(request, 'org_id', None)
+        if not org_id:
+            return Response(
+                {'error': 'Organization context required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if request.method == 'GET':
+            jobs = ImportJob.objects.filter(org_id=org_id)[:20]
+            return Response(ImportJobSerializer(jobs, many=True).data)
+        
+        if 'file' not in request.FILES:
+            return Response(
+                {'error': 'No file provided'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        file = request.FILES['file']
+        if file.name.split('.')[-1].lower() not in ('xlsx', 'csv'):
+            return Response(
+                {'error': 'Unsupported file format (xlsx, csv only)'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        kind = request.data.get('kind', 'participants')
+        if kind not in import_jobs.IMPORTERS:
+            return Response(
+                {'error': f'Unknown import kind: {kind}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        event_id = request.data.get('event_id')
+        if not event_id:
+            return Response(
+                {'error': 'event_id is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        event = Event.objects.filter(id=event_id, org_id=org_id).first()
+        if event is None:
+            return Response(
+                {'error': 'Event not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        mode = request.data.get('mode') or 'full'
+        if mode not in dict(ImportJob.MODE_CHOICES):
+            return Response(
+                {'error': f'Unknown import mode: {mode}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        column_mapping = parse_column_mapping(
+            request.data.get('column_mapping'),
+            import_jobs.get_importer_class(kind).default_column_mapping
+        )
+        job = import_jobs.create_job(request, kind, file, column_mapping, event=event, mode=mode)
+        return Response(ImportJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+    
+    @action(detail=False, methods=['get'], url_path=r'jobs/(?P<job_id>[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})')
+    def job_status(self, request, job_id=None):
+        """สถานะและความคืบหน้าของงาน import"""
+        job = ImportJob.objects.filter(id=job_id, org_id=getattr(request, 'org_id', None)).first()
+        if job is None:
+            return Response(
+                {'error': 'Import job not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return Response(ImportJobSerializer(job).data)
 
 
 class LoginPageSettingsViewSet(viewsets.ModelViewSet):
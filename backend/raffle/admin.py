@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import RaffleEvent, Prize, RaffleParticipant, RaffleLog
+from .models import RaffleEvent, Prize, RaffleParticipant, RaffleLog, RaffleDrawPlan, RaffleEligibleParticipant
 
 
 @admin.register(RaffleEvent)
@@ -33,3 +33,18 @@ class RaffleLogAdmin(admin.ModelAdmin):
     readonly_fields = ['timestamp']
     date_hierarchy = 'timestamp'
 
+
+
+@admin.register(RaffleDrawPlan)
+class RaffleDrawPlanAdmin(admin.ModelAdmin):
+    list_display = ['raffle_event', 'pool_size', 'permutation_hash', 'created_at']
+    list_filter = ['raffle_event']
+    readonly_fields = ['seed', 'permutation_hash', 'entries', 'pool_size', 'created_at']
+
+
+@admin.register(RaffleEligibleParticipant)
+class RaffleEligibleParticipantAdmin(admin.ModelAdmin):
+    list_display = ['participant', 'raffle_event', 'is_opted_out', 'opt_out_reason', 'created_at']
+    list_filter = ['raffle_event', 'is_opted_out', 'created_at']
+    search_fields = ['participant__name']
+    readonly_fields = ['created_at']
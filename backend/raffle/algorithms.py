@@ -1,10 +1,467 @@
 import random
 import hashlib
 import json
+import logging
+from itertools import groupby
 from typing import List, Dict, Any, Optional
 from datetime import datetime
-from .models import Prize, RaffleParticipant, RaffleLog
-from teams.models import Participant, Team
+from .models import Prize, RaffleEvent, RaffleLog, RaffleDrawPlan
+from teams.models import Participant, Team, TeamMember
+from django.db import transaction
+from django.db.models import QuerySet, Count
+from django.db.models.fields.json import KeyTextTransform
+from .eligibility import EligibilityQueryBuilder
+from . import eligibility_index
+
+logger = logging.getLogger(__name__)
+
+
+class RaffleSampler:
+    """
+    สุ่มผู้ชนะ k คนจาก pool ในฐานข้อมูลโดยไม่ต้องโหลด pool ทั้งหมด
+
+    สุ่มตำแหน่งด้วย random.Random(seed).sample(range(n), k) ซึ่งได้ตำแหน่งเดียวกับ
+    random.sample(list_of_n, k) ทุกประการ แล้วดึงเฉพาะ id ที่ตำแหน่งนั้นด้วย OFFSET
+    ผลลัพธ์จึงตรงกับการสุ่มแบบเดิมเมื่อใช้ seed เดียวกัน (ตรวจสอบย้อนหลังจาก RaffleLog ได้)
+    """
+    
+    # pool ที่เล็กกว่านี้ ดึง id ทั้งหมดครั้งเดียวถูกกว่าการยิง OFFSET ทีละตำแหน่ง
+    MIN_POOL_FOR_OFFSET = 2000
+    # ถ้าต้องสุ่มเกินสัดส่วนนี้ของ pool ก็ดึง id ทั้งหมดเช่นกัน
+    MAX_OFFSET_RATIO = 0.05
+    
+    def __init__(self, ordered_ids: QuerySet, seed: str):
+        """ordered_ids: values_list('id', flat=True) ที่มีลำดับคงที่"""
+        self.ordered_ids = ordered_ids
+        self.seed = seed
+        self.mode = None
+    
+    def _use_offset(self, pool_size: int, quantity: int) -> bool:
+        return (
+            pool_size >= self.MIN_POOL_FOR_OFFSET
+            and quantity <= pool_size * self.MAX_OFFSET_RATIO
+        )
+    
+    def sample(self, quantity: int) -> Dict[str, Any]:
+        """
+        Returns: {'success': bool, 'ids': [int], 'pool_size': int}
+        """
+        # Count and fetch inside one transaction so offsets refer to the same snapshot
+        with transaction.atomic():
+            pool_size = self.ordered_ids.count()
+            if pool_size < quantity:
+                return {'success': False, 'ids': [], 'pool_size': pool_size}
+            
+            ranks = random.Random(self.seed).sample(range(pool_size), quantity)
+            
+            if self._use_offset(pool_size, quantity):
+                self.mode = 'offset'
+                ids = [self.ordered_ids[rank] for rank in ranks]
+            else:
+                self.mode = 'full'
+                pool = list(self.ordered_ids)
+                ids = [pool[rank] for rank in ranks]
+        
+        return {'success': True, 'ids': ids, 'pool_size': pool_size}
+
+
+def parse_weight(value: Any, default: float) -> float:
+    """แปลงค่าจาก Participant.metadata เป็นน้ำหนัก (ค่าติดลบ/ไม่ใช่ตัวเลข ใช้ค่า default)"""
+    try:
+        weight = float(value)
+    except (TypeError, ValueError):
+        return default
+    if weight != weight or weight < 0 or weight == float('inf'):
+        return default
+    return weight
+
+
+class WeightedSampler:
+    """
+    สุ่มแบบถ่วงน้ำหนักด้วย Walker alias method (Vose) interface เดียวกับ RaffleSampler
+
+    สร้าง alias table ครั้งเดียวต่อ pool แล้วสุ่มแต่ละครั้งได้ใน O(1)
+    การสุ่มแบบไม่ใส่คืนใช้ rejection: ถ้าได้คนที่ถูกเลือกแล้วก็สุ่มใหม่ และสร้าง table ใหม่
+    จากคนที่เหลือเมื่อน้ำหนักที่ถูกเลือกไปแล้วเกิน REBUILD_RATIO ของน้ำหนักใน table
+    (ได้การแจกแจงเดียวกับการสุ่มทีละคนตามสัดส่วนน้ำหนักของคนที่เหลือ)
+
+    entries: [(participant_id, weight)] ตามลำดับ pool ที่คงที่ ผลจึงทำซ้ำได้ด้วย seed เดียวกัน
+    """
+    
+    REBUILD_RATIO = 0.5
+    
+    def __init__(self, entries: List[tuple], seed: str):
+        self.entries = [(pid, weight) for pid, weight in entries if weight > 0]
+        self.pool_size = len(entries)
+        self.seed = seed
+        self.mode = 'weighted_alias'
+    
+    @staticmethod
+    def build_alias_table(weights: List[float]) -> tuple:
+        """Vose's alias method: คืน (prob, alias) ขนาด n"""
+        n = len(weights)
+        total = sum(weights)
+        scaled = [w * n / total for w in weights]
+        prob = [0.0] * n
+        alias = [0] * n
+        small = [i for i, w in enumerate(scaled) if w < 1.0]
+        large = [i for i, w in enumerate(scaled) if w >= 1.0]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            prob[s] = scaled[s]
+            alias[s] = l
+            scaled[l] = scaled[l] + scaled[s] - 1.0
+            (small if scaled[l] < 1.0 else large).append(l)
+        # Leftovers are 1 up to float rounding
+        for i in large + small:
+            prob[i] = 1.0
+        return prob, alias
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """ข้อมูลสำหรับตรวจสอบย้อนหลัง: hash ของ [(id, weight)] ตามลำดับ pool"""
+        payload = json.dumps(self.entries, separators=(',', ':'))
+        return {
+            'algorithm': 'alias_rejection',
+            'pool_size': self.pool_size,
+            'weighted_pool_size': len(self.entries),
+            'total_weight': sum(weight for _, weight in self.entries),
+            'weights_hash': hashlib.sha256(payload.encode()).hexdigest(),
+        }
+    
+    def sample(self, quantity: int) -> Dict[str, Any]:
+        """
+        Returns: {'success': bool, 'ids': [int], 'pool_size': int}
+        """
+        if len(self.entries) < quantity:
+            return {'success': False, 'ids': [], 'pool_size': len(self.entries)}
+        
+        rng = random.Random(self.seed)
+        remaining = list(self.entries)
+        chosen = []
+        while len(chosen) < quantity:
+            prob, alias = self.build_alias_table([weight for _, weight in remaining])
+            table_weight = sum(weight for _, weight in remaining)
+            taken = set()
+            taken_weight = 0.0
+            while len(chosen) < quantity and taken_weight <= table_weight * self.REBUILD_RATIO:
+                i = rng.randrange(len(remaining))
+                if rng.random() >= prob[i]:
+                    i = alias[i]
+                if i in taken:
+                    continue
+                taken.add(i)
+                taken_weight += remaining[i][1]
+                chosen.append(remaining[i][0])
+            remaining = [entry for i, entry in enumerate(remaining) if i not in taken]
+        
+        return {'success': True, 'ids': chosen, 'pool_size': len(self.entries)}
+
+
+def load_weights(participants: QuerySet, rules: Dict[str, Any]) -> Dict[int, float]:
+    """
+    {participant_id: weight} โดยอ่านเฉพาะ key เดียวจาก Participant.metadata
+    rules: weight_by (key ใน metadata), default_weight (ค่าเมื่อไม่มี/ไม่ถูกต้อง, ค่าเริ่มต้น 1)
+    """
+    default = parse_weight(rules.get('default_weight', 1), 1.0)
+    rows = participants.annotate(
+        weight_value=KeyTextTransform(rules['weight_by'], 'metadata')
+    ).values_list('id', 'weight_value')
+    return {pid: parse_weight(value, default) for pid, value in rows}
+
+
+class StratifiedSampler:
+    """
+    สุ่มแบบแบ่งชั้นตามหน่วยงาน (stratified) interface เดียวกับ RaffleSampler
+
+    จัดสรรโควตาให้แต่ละหน่วยงานก่อน แล้วสุ่มภายในแต่ละหน่วยงาน จึงไม่ต้องสุ่มซ้ำ
+    เมื่อกติกาการตัดหน่วยงานทำให้ผู้มีสิทธิ์เหลือน้อย
+    rules:
+      stratify: 'proportional'       โควตาตามสัดส่วนจำนวนคน (largest remainder)
+                'max_per_department' สุ่มจากทุกคน แต่ไม่เกิน max_per_department คนต่อหน่วยงาน
+      max_per_department: เพดานต่อหน่วยงาน (ใช้ได้ทั้งสองโหมด, โหมด max ค่าเริ่มต้น 1)
+
+    strata: {department_id: [participant_id]} ตามลำดับ pool (None = ไม่มีหน่วยงาน)
+    """
+    
+    def __init__(self, strata: Dict[Optional[int], List[int]], rules: Dict[str, Any], seed: str):
+        # None first, then by department id, so allocation is reproducible
+        self.strata = {key: strata[key] for key in sorted(strata, key=lambda d: (d is not None, d or 0))}
+        self.quota_mode = rules.get('stratify')
+        cap = rules.get('max_per_department')
+        if cap is None and self.quota_mode == 'max_per_department':
+            cap = 1
+        self.cap = int(cap) if cap is not None else None
+        self.seed = seed
+        self.mode = 'stratified'
+        self.allocation = {}
+    
+    @classmethod
+    def group(cls, rows) -> Dict[Optional[int], List[int]]:
+        """[(department_id, participant_id)] เรียงตาม department -> {department_id: [participant_id]}"""
+        return {
+            department_id: [pid for _, pid in members]
+            for department_id, members in groupby(rows, key=lambda row: row[0])
+        }
+    
+    def _capacity(self) -> Dict[Optional[int], int]:
+        return {
+            key: min(len(ids), self.cap) if self.cap is not None else len(ids)
+            for key, ids in self.strata.items()
+        }
+    
+    def _allocate_proportional(self, quantity: int, capacity: Dict[Optional[int], int]) -> Dict[Optional[int], int]:
+        quotas = {key: 0 for key in self.strata}
+        remaining = quantity
+        while remaining > 0:
+            active = [key for key in self.strata if quotas[key] < capacity[key]]
+            total = sum(len(self.strata[key]) for key in active)
+            exact = {key: remaining * len(self.strata[key]) / total for key in active}
+            given = 0
+            for key in active:
+                share = min(int(exact[key]), capacity[key] - quotas[key])
+                quotas[key] += share
+                given += share
+            # Hand out the rest one by one by largest remainder; loop again only if caps were hit
+            for key in sorted(active, key=lambda k: exact[k] - int(exact[k]), reverse=True):
+                if given == remaining:
+                    break
+                if quotas[key] < capacity[key]:
+                    quotas[key] += 1
+                    given += 1
+            remaining -= given
+        return quotas
+    
+    def _allocate_capped(self, quantity: int, capacity: Dict[Optional[int], int], rng: random.Random) -> Dict[Optional[int], int]:
+        # Pick a stratum in proportion to its members still available: same as a uniform draw
+        # over everyone, skipping departments that reached the cap
+        quotas = {key: 0 for key in self.strata}
+        keys = list(self.strata)
+        for _ in range(quantity):
+            weights = [
+                len(self.strata[key]) - quotas[key] if quotas[key] < capacity[key] else 0
+                for key in keys
+            ]
+            key = rng.choices(keys, weights=weights)[0]
+            quotas[key] += 1
+        return quotas
+    
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'stratify': self.quota_mode,
+            'max_per_department': self.cap,
+            'allocation': {
+                ('none' if key is None else str(key)): quota
+                for key, quota in self.allocation.items() if quota
+            },
+        }
+    
+    def sample(self, quantity: int) -> Dict[str, Any]:
+        """
+        Returns: {'success': bool, 'ids': [int], 'pool_size': int}
+        """
+        pool_size = sum(len(ids) for ids in self.strata.values())
+        capacity = self._capacity()
+        available = sum(capacity.values())
+        if available < quantity:
+            return {'success': False, 'ids': [], 'pool_size': available}
+        
+        rng = random.Random(self.seed)
+        if self.quota_mode == 'proportional':
+            self.allocation = self._allocate_proportional(quantity, capacity)
+        else:
+            self.allocation = self._allocate_capped(quantity, capacity, rng)
+        
+        ids = []
+        for key, quota in self.allocation.items():
+            if quota:
+                ids.extend(rng.sample(self.strata[key], quota))
+        return {'success': True, 'ids': ids, 'pool_size': pool_size}
+
+
+def create_draw_plan(raffle_event: RaffleEvent, seed: Optional[str] = None) -> RaffleDrawPlan:
+    """
+    สร้าง (หรือสร้างใหม่) ลำดับการจับสลากล่วงหน้าของ RaffleEvent
+    สุ่ม permutation ของผู้มีสิทธิ์ทั้งหมดครั้งเดียวด้วย seed แล้วเก็บไว้ในตาราง
+    """
+    if not seed:
+        combined = f"{datetime.now().isoformat()}_{random.random()}_{raffle_event.id}_plan"
+        seed = hashlib.sha256(combined.encode()).hexdigest()
+    
+    # Read before the pool: a change made while the plan is built leaves the plan on an older version
+    eligibility_version = eligibility_index.get_version(raffle_event.id)
+    event = raffle_event.event
+    rows = EligibilityQueryBuilder(raffle_event, {}).queryset().order_by('name', 'id').values_list(
+        'id', 'department_id'
+    )
+    team_by_participant = dict(
+        TeamMember.objects.filter(event_id=event.id).values_list('participant_id', 'team_id')
+    )
+    entries = [[pid, dept_id, team_by_participant.get(pid)] for pid, dept_id in rows]
+    random.Random(seed).shuffle(entries)
+    
+    permutation = json.dumps([entry[0] for entry in entries], separators=(',', ':'))
+    plan, _ = RaffleDrawPlan.objects.update_or_create(
+        raffle_event=raffle_event,
+        defaults={
+            'seed': seed,
+            'permutation_hash': hashlib.sha256(permutation.encode()).hexdigest(),
+            'entries': entries,
+            'pool_size': len(entries),
+            'eligibility_version': eligibility_version,
+        }
+    )
+    return plan
+
+
+class DrawPlanStale(Exception):
+    """มีผู้มีสิทธิ์ที่ไม่อยู่ใน draw plan (เพิ่ม/เปิดสิทธิ์หลังสร้างแผน) ต้องสร้างแผนใหม่"""
+    
+    def __init__(self, missing_count: int):
+        self.missing_count = missing_count
+        super().__init__(
+            f'Draw plan is out of date: {missing_count} eligible participants are not in the plan. '
+            f'Regenerate the draw plan or delete it to draw without a plan.'
+        )
+    
+    def as_result(self) -> Dict[str, Any]:
+        return {
+            'success': False,
+            'error': str(self),
+            'draw_plan_stale': True,
+            'missing_count': self.missing_count
+        }
+
+
+def check_draw_plan(plan: RaffleDrawPlan, eligible_ids: Optional[List[int]] = None) -> None:
+    """
+    ตรวจว่า draw plan ยังครอบคลุมผู้มีสิทธิ์ปัจจุบันทุกคน (raise DrawPlanStale ถ้าไม่)
+    
+    version ของผู้มีสิทธิ์ตรงกับที่บันทึกในแผน: ใช้ได้ทันที (ไม่มี query)
+    ไม่ตรง: เทียบ id ผู้มีสิทธิ์ (ไม่มีกติการางวัล) กับลำดับในแผน ถ้าไม่มีใครตกหล่น
+    (เช่น version เปลี่ยนเพราะบันทึกผู้ชนะหรือปิดสิทธิ์) บันทึก version ใหม่ในแผน
+    eligible_ids: id ผู้มีสิทธิ์ที่ผู้เรียกโหลดไว้แล้ว (ตรวจเสมอ)
+    """
+    version = eligibility_index.get_version(plan.raffle_event_id)
+    if eligible_ids is None:
+        if plan.eligibility_version == version:
+            return
+        eligible_ids = EligibilityQueryBuilder(plan.raffle_event, {}).ordered_ids()
+    
+    planned = {entry[0] for entry in plan.entries}
+    missing_count = sum(1 for pid in eligible_ids if pid not in planned)
+    if missing_count:
+        raise DrawPlanStale(missing_count)
+    if plan.eligibility_version != version:
+        RaffleDrawPlan.objects.filter(id=plan.id).update(eligibility_version=version)
+        plan.eligibility_version = version
+
+
+class DrawPlanSampler:
+    """
+    ดึงผู้ชนะตามลำดับใน RaffleDrawPlan แทนการสุ่มใหม่ทุกครั้ง
+    
+    ไล่ลำดับที่สุ่มไว้แล้วในหน่วยความจำ ข้ามคนที่ไม่ผ่านกติกาของรางวัลนี้
+    (ทีม/หน่วยงาน/ได้รางวัลแล้ว) และตรวจสิทธิ์ปัจจุบันใน DB เฉพาะคนที่ถูกเลือกเท่านั้น
+    interface เดียวกับ RaffleSampler; raise DrawPlanStale ถ้ามีผู้มีสิทธิ์ที่ไม่อยู่ในแผน
+    pool_size คือจำนวนผู้มีสิทธิ์ปัจจุบันตามกติกาของรางวัล (ไม่ใช่จำนวนในแผน)
+    """
+    
+    def __init__(self, plan: RaffleDrawPlan, builder: EligibilityQueryBuilder, prize: Prize):
+        self.plan = plan
+        self.builder = builder
+        self.prize = prize
+        self.seed = plan.seed
+        self.mode = 'draw_plan'
+    
+    def _candidates(self) -> List[int]:
+        return self.builder.filter_entries(
+            self.plan.entries,
+            self.builder.selected_rows(),
+            prize_id=self.prize.id
+        )
+    
+    def sample(self, quantity: int) -> Dict[str, Any]:
+        check_draw_plan(self.plan)
+        candidates = self._candidates()
+        ids = []
+        position = 0
+        # Verify live eligibility (toggles, deletions) for the next batch only
+        while len(ids) < quantity and position < len(candidates):
+            batch = candidates[position:position + (quantity - len(ids)) * 2]
+            position += len(batch)
+            still_eligible = set(
+                self.builder.queryset().filter(id__in=batch).values_list('id', flat=True)
+            )
+            ids.extend(pid for pid in batch if pid in still_eligible)
+        
+        ids = ids[:quantity]
+        pool_size = self.builder.queryset().count()
+        if len(ids) < quantity:
+            return {'success': False, 'ids': [], 'pool_size': pool_size}
+        return {'success': True, 'ids': ids, 'pool_size': pool_size}
+
+
+def generate_seed(prize_id: int) -> str:
+    """Generate seed value"""
+    timestamp = datetime.now().isoformat()
+    random_str = str(random.random())
+    combined = f"{timestamp}_{random_str}_{prize_id}"
+    return hashlib.sha256(combined.encode()).hexdigest()
+
+
+def build_rule_snapshot(
+    rules: Dict[str, Any],
+    draw_plan: Optional[RaffleDrawPlan] = None,
+    weighting: Optional[Dict[str, Any]] = None,
+    stratification: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """Snapshot ของกติกาที่ใช้จับ เก็บไว้ใน RaffleLog"""
+    rule_snapshot = {
+        'no_duplicate_participant': rules.get('no_duplicate_participant', False),
+        'no_duplicate_department': rules.get('no_duplicate_department', False),
+        'filter_by_team': rules.get('filter_by_team', False),
+        'filter_by_department': rules.get('filter_by_department', False),
+    }
+    if draw_plan:
+        rule_snapshot['draw_plan'] = {
+            'seed': draw_plan.seed,
+            'permutation_hash': draw_plan.permutation_hash,
+            'pool_size': draw_plan.pool_size,
+        }
+    if weighting:
+        rule_snapshot['weighting'] = {
+            'weight_by': rules.get('weight_by'),
+            'default_weight': rules.get('default_weight', 1),
+            **weighting,
+        }
+    if stratification:
+        rule_snapshot['stratification'] = stratification
+    return rule_snapshot
+
+
+class EligibilityIndexSampler:
+    """
+    สุ่มจากดัชนีผู้มีสิทธิ์ใน Redis (raffle/eligibility_index.py) interface เดียวกับ RaffleSampler
+    pool ในโหมดนี้เรียงตาม participant id (บันทึก sampling_mode='redis_index' ใน RaffleLog)
+    """
+    
+    def __init__(self, builder: EligibilityQueryBuilder, seed: str):
+        self.builder = builder
+        self.seed = seed
+        self.mode = 'redis_index'
+    
+    def sample(self, quantity: int) -> Dict[str, Any]:
+        index = eligibility_index.EligibilityIndex(self.builder.raffle_event.id)
+        if not index.is_built():
+            index.rebuild()
+        
+        sample = index.sample(self.builder.rules, self.builder.excludes_previous_winners, quantity, self.seed)
+        
+        # Guard against a stale index: drawn ids must still pass the SQL rules
+        if sample['success'] and self.builder.queryset().filter(id__in=sample['ids']).count() != len(sample['ids']):
+            index.invalidate()
+            raise ValueError('Eligibility index is stale')
+        return sample
 
 
 class RaffleSelector:
@@ -13,45 +470,24 @@ class RaffleSelector:
     def __init__(self, prize: Prize, rules: Dict[str, Any]):
         self.prize = prize
         self.rules = rules
-        self.seed = self._generate_seed()
+        self.draw_plan = None
+        # Weighted and stratified draws have their own sampling, so a uniform draw plan does not apply
+        if not rules.get('ignore_draw_plan', False) and not rules.get('weight_by') and not rules.get('stratify'):
+            self.draw_plan = RaffleDrawPlan.objects.filter(raffle_event_id=prize.raffle_event_id).first()
+        self.seed = self.draw_plan.seed if self.draw_plan else self._generate_seed()
     
     def _generate_seed(self) -> str:
         """Generate seed value"""
-        timestamp = datetime.now().isoformat()
-        random_str = str(random.random())
-        combined = f"{timestamp}_{random_str}_{self.prize.id}"
-        return hashlib.sha256(combined.encode()).hexdigest()
-    
-    def get_eligible_participants(self) -> List[Participant]:
-        """Get eligible participants based on rules"""
-        raffle_event = self.prize.raffle_event
-        event = raffle_event.event
-        
-        # Base queryset - all participants in the event
-        participants = Participant.objects.filter(
-            org_id=event.org_id,
-            event_id=event.id,
-            is_raffle_eligible=True  # Only participants with raffle eligibility
-        )
-        
-        # Filter by team (if specified)
-        if self.rules.get('filter_by_team'):
-            team_ids = self.rules.get('team_ids', [])
-            if team_ids:
-                from teams.models import TeamMember
-                participant_ids = TeamMember.objects.filter(
-                    team_id__in=team_ids,
-                    event_id=event.id  # Ensure team membership is for the correct event
-                ).values_list('participant_id', flat=True)
-                participants = participants.filter(id__in=participant_ids)
-        
-        # Filter by department (if specified)
-        if self.rules.get('filter_by_department'):
-            department_ids = self.rules.get('department_ids', [])
-            if department_ids:
-                participants = participants.filter(department_id__in=department_ids)
-        
-        return list(participants)
+        return generate_seed(self.prize.id)
+    
+    def get_eligible_ids(self) -> List[int]:
+        """Get eligible participant ids based on rules (filtered in SQL)"""
+        return EligibilityQueryBuilder(self.prize.raffle_event, self.rules).ids()
+    
+    def load_winners(self, winner_ids: List[int]) -> List[Participant]:
+        """Load model instances for drawn ids only, keeping draw order"""
+        participants = Participant.objects.select_related('department').in_bulk(winner_ids)
+        return [participants[pid] for pid in winner_ids if pid in participants]
     
     def filter_excluded_participants(
         self,
@@ -77,56 +513,56 @@ class RaffleSelector:
         """
         quantity = quantity or self.prize.quantity
         
-        # Get eligible participants (already excludes opted-out)
-        eligible = self.get_eligible_participants()
-        
-        # Exclude already selected if no_repeat_prize is enabled
-        no_repeat = self.rules.get('no_repeat_prize', False) or self.prize.raffle_event.no_repeat_prize
-        if no_repeat or self.rules.get('no_duplicate_participant', False):
-            already_selected = RaffleParticipant.objects.filter(
-                prize__raffle_event=self.prize.raffle_event
-            ).values_list('participant_id', flat=True)
-            eligible = [p for p in eligible if p.id not in already_selected]
-        
-        # Exclude by department (if rule says so)
-        if self.rules.get('no_duplicate_department', False):
-            already_selected_departments = RaffleParticipant.objects.filter(
-                prize__raffle_event=self.prize.raffle_event
-            ).values_list('participant__department_id', flat=True)
-            already_selected_departments = set(already_selected_departments)
-            
-            # Filter out participants from already selected departments
-            eligible = [
-                p for p in eligible
-                if not p.department_id or p.department_id not in already_selected_departments
-            ]
+        # Eligible pool is one SQL query; only the drawn ranks are fetched
+        builder = EligibilityQueryBuilder(self.prize.raffle_event, self.rules)
+        if self.rules.get('weight_by'):
+            weights = load_weights(builder.queryset().order_by('name', 'id'), self.rules)
+            sampler = WeightedSampler(list(weights.items()), self.seed)
+        elif self.rules.get('stratify'):
+            # One query, ordered by department, grouped into per-department id lists
+            rows = builder.queryset().order_by('department_id', 'name', 'id').values_list('department_id', 'id')
+            sampler = StratifiedSampler(StratifiedSampler.group(rows), self.rules, self.seed)
+        elif self.draw_plan:
+            sampler = DrawPlanSampler(self.draw_plan, builder, self.prize)
+        elif eligibility_index.is_enabled():
+            sampler = EligibilityIndexSampler(builder, self.seed)
+        else:
+            sampler = RaffleSampler(builder.ordered_ids(), self.seed)
+        
+        try:
+            sample = sampler.sample(quantity)
+        except DrawPlanStale as e:
+            return e.as_result()
+        except Exception as e:
+            if not isinstance(sampler, EligibilityIndexSampler):
+                raise
+            # Redis unavailable or index stale: fall back to sampling in SQL
+            logger.warning(f'Eligibility index draw failed for prize {self.prize.id}, using SQL: {e}')
+            sampler = RaffleSampler(builder.ordered_ids(), self.seed)
+            sample = sampler.sample(quantity)
         
-        if len(eligible) < quantity:
+        if not sample['success']:
             # Not enough eligible participants
             return {
                 'success': False,
-                'error': f'Not enough eligible participants. Required: {quantity}, Available: {len(eligible)}',
-                'available_count': len(eligible)
+                'error': f'Not enough eligible participants. Required: {quantity}, Available: {sample["pool_size"]}',
+                'available_count': sample['pool_size']
             }
         
-        # Set seed for reproducibility
-        random.seed(self.seed)
+        selected = self.load_winners(sample['ids'])
         
-        # Select winners
-        selected = random.sample(eligible, quantity)
-        
-        # Create rule snapshot
-        rule_snapshot = {
-            'no_duplicate_participant': self.rules.get('no_duplicate_participant', False),
-            'no_duplicate_department': self.rules.get('no_duplicate_department', False),
-            'filter_by_team': self.rules.get('filter_by_team', False),
-            'filter_by_department': self.rules.get('filter_by_department', False),
-        }
+        rule_snapshot = build_rule_snapshot(
+            self.rules,
+            self.draw_plan,
+            weighting=sampler.snapshot() if isinstance(sampler, WeightedSampler) else None,
+            stratification=sampler.snapshot() if isinstance(sampler, StratifiedSampler) else None
+        )
         
         # Create result
         result = {
             'selected_count': len(selected),
-            'eligible_count': len(eligible),
+            'eligible_count': sample['pool_size'],
+            'sampling_mode': sampler.mode,
             'total_participants': Participant.objects.filter(
                 org_id=self.prize.raffle_event.event.org_id,
                 event_id=self.prize.raffle_event.event.id
@@ -141,3 +577,174 @@ class RaffleSelector:
             'result': result
         }
 
+
+
+class RoundSelector:
+    """
+    จับรางวัลทุกรางวัลในรอบเดียว (หรือทั้งการจับสลากถ้าไม่ระบุรอบ) ในครั้งเดียว
+    
+    โหลด pool ครั้งเดียว แล้วใช้กติกาของแต่ละรางวัลกับ pool ในหน่วยความจำ
+    ผู้ที่ถูกจับได้ในรางวัลก่อนหน้าจะถูกตัดออกจาก pool ทันที (เหมือนการจับทีละรางวัล
+    ที่ตัดสิทธิ์ผู้ชนะหลังบันทึก) แต่ละรางวัลจับเฉพาะจำนวนที่ยังเหลือ
+    ถ้ารางวัลใดมีผู้มีสิทธิ์ไม่พอ จะไม่มีการจับรางวัลใดเลย
+    """
+    
+    def __init__(self, raffle_event: RaffleEvent, round_number: Optional[int] = None):
+        self.raffle_event = raffle_event
+        self.round_number = round_number
+        self.draw_plan = RaffleDrawPlan.objects.filter(raffle_event_id=raffle_event.id).first()
+    
+    def get_prizes(self) -> List[Prize]:
+        prizes = Prize.objects.filter(raffle_event_id=self.raffle_event.id)
+        if self.round_number is not None:
+            prizes = prizes.filter(round_number=self.round_number)
+        return list(
+            prizes.annotate(already_selected=Count('selected_participants')).order_by('round_number', 'name')
+        )
+    
+    def _load_pool(self) -> List[List]:
+        """
+        [(participant_id, department_id, team_id)] ตามลำดับ pool (หรือตามลำดับใน draw plan)
+        
+        หน่วยงาน/ทีมอ่านจาก DB ปัจจุบันเสมอ draw plan ให้แค่ลำดับ
+        (ค่าใน entries ของแผนเป็นของตอนสร้างแผน ผู้ที่ย้ายหน่วยงาน/ทีมภายหลังต้องใช้ค่าใหม่)
+        """
+        builder = EligibilityQueryBuilder(self.raffle_event, {})
+        team_by_participant = dict(
+            TeamMember.objects.filter(event_id=self.raffle_event.event_id).values_list('participant_id', 'team_id')
+        )
+        rows = builder.queryset().order_by('name', 'id').values_list('id', 'department_id')
+        entries = [[pid, dept_id, team_by_participant.get(pid)] for pid, dept_id in rows]
+        if self.draw_plan:
+            check_draw_plan(self.draw_plan, [entry[0] for entry in entries])
+            position = {entry[0]: index for index, entry in enumerate(self.draw_plan.entries)}
+            entries.sort(key=lambda entry: position[entry[0]])
+        return entries
+    
+    def select(self) -> Dict[str, Any]:
+        """
+        Returns: {
+            'success': bool,
+            'draws': [{'prize', 'winners': [Participant], 'seed', 'rule_snapshot', 'result'}],
+            'error': str (เมื่อไม่สำเร็จ)
+        }
+        """
+        prizes = self.get_prizes()
+        try:
+            entries = self._load_pool()
+        except DrawPlanStale as e:
+            return e.as_result()
+        department_of = {entry[0]: entry[1] for entry in entries}
+        selected = EligibilityQueryBuilder(self.raffle_event, {}).selected_rows()
+        total_participants = Participant.objects.filter(
+            org_id=self.raffle_event.event.org_id,
+            event_id=self.raffle_event.event_id
+        ).count()
+        
+        weights_by_rule = {}
+        
+        drawn = set()
+        draws = []
+        for prize in prizes:
+            quantity = prize.quantity - prize.already_selected
+            if quantity <= 0:
+                continue
+            
+            rules = {**prize.rules, 'no_repeat_prize': self.raffle_event.no_repeat_prize}
+            candidates = [
+                pid for pid in EligibilityQueryBuilder(self.raffle_event, rules).filter_entries(
+                    entries, selected, prize_id=prize.id
+                )
+                if pid not in drawn
+            ]
+            if len(candidates) < quantity:
+                return {
+                    'success': False,
+                    'error': (
+                        f'Not enough eligible participants for prize "{prize.name}". '
+                        f'Required: {quantity}, Available: {len(candidates)}'
+                    ),
+                    'prize_id': prize.id,
+                    'available_count': len(candidates)
+                }
+            
+            draw_plan = self.draw_plan
+            weighting = None
+            stratification = None
+            if rules.get('stratify'):
+                strata = {}
+                for pid in candidates:
+                    strata.setdefault(department_of.get(pid), []).append(pid)
+                seed = generate_seed(prize.id)
+                sampler = StratifiedSampler(strata, rules, seed)
+                sample = sampler.sample(quantity)
+                if not sample['success']:
+                    return {
+                        'success': False,
+                        'error': (
+                            f'Department quotas for prize "{prize.name}" allow only '
+                            f'{sample["pool_size"]} winners. Required: {quantity}'
+                        ),
+                        'prize_id': prize.id,
+                        'available_count': sample['pool_size']
+                    }
+                winner_ids = sample['ids']
+                stratification = sampler.snapshot()
+                draw_plan = None
+                sampling_mode = sampler.mode
+            elif rules.get('weight_by'):
+                # Weights for the whole pool are read once per (weight_by, default_weight)
+                weight_key = (rules['weight_by'], rules.get('default_weight', 1))
+                if weight_key not in weights_by_rule:
+                    weights_by_rule[weight_key] = load_weights(
+                        EligibilityQueryBuilder(self.raffle_event, {}).queryset(), rules
+                    )
+                weights = weights_by_rule[weight_key]
+                seed = generate_seed(prize.id)
+                sampler = WeightedSampler([(pid, weights.get(pid, 0)) for pid in candidates], seed)
+                sample = sampler.sample(quantity)
+                if not sample['success']:
+                    return {
+                        'success': False,
+                        'error': (
+                            f'Not enough participants with a positive weight for prize "{prize.name}". '
+                            f'Required: {quantity}, Available: {sample["pool_size"]}'
+                        ),
+                        'prize_id': prize.id,
+                        'available_count': sample['pool_size']
+                    }
+                winner_ids = sample['ids']
+                weighting = sampler.snapshot()
+                draw_plan = None
+                sampling_mode = sampler.mode
+            elif self.draw_plan:
+                seed = self.draw_plan.seed
+                winner_ids = candidates[:quantity]
+                sampling_mode = 'draw_plan'
+            else:
+                seed = generate_seed(prize.id)
+                winner_ids = random.Random(seed).sample(candidates, quantity)
+                sampling_mode = 'round'
+            
+            drawn.update(winner_ids)
+            selected.extend((pid, department_of.get(pid), prize.id) for pid in winner_ids)
+            draws.append({
+                'prize': prize,
+                'winner_ids': winner_ids,
+                'seed': seed,
+                'rule_snapshot': build_rule_snapshot(rules, draw_plan, weighting, stratification),
+                'result': {
+                    'selected_count': len(winner_ids),
+                    'eligible_count': len(candidates),
+                    'sampling_mode': sampling_mode,
+                    'round_number': prize.round_number,
+                    'total_participants': total_participants
+                }
+            })
+        
+        # Load model instances for all winners at once
+        participants = Participant.objects.select_related('department').in_bulk(list(drawn))
+        for draw in draws:
+            draw['winners'] = [participants[pid] for pid in draw.pop('winner_ids') if pid in participants]
+        
+        return {'success': True, 'draws': draws}
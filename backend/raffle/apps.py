@@ -5,3 +5,5 @@ class RaffleConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'raffle'
 
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,107 @@
+import asyncio
+import logging
+import os
+import threading
+from typing import Dict, Any, List
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import transaction
+from . import live_state
+
+logger = logging.getLogger(__name__)
+
+
+class Outbox:
+    """
+    รวมข้อความ WebSocket หลายข้อความของ RaffleEvent เดียวเป็น group message เดียว ({'type': 'batch'})
+    ส่งหลัง transaction commit และไม่บล็อก response (ส่งจาก thread เบื้องหลัง)
+    consumer แตก batch กลับเป็นข้อความเดิมตามลำดับ frontend จึงได้รับ frame แบบเดิม
+
+    ตัวอย่าง:
+        outbox = Outbox(raffle_event_id)
+        outbox.add({'type': 'control_action', 'action': 'spin', ...})
+        outbox.add({'type': 'control_action', 'action': 'spin_state', ...})
+        outbox.send()
+    """
+
+    def __init__(self, raffle_event_id):
+        self.raffle_event_id = raffle_event_id
+        self.messages: List[Dict[str, Any]] = []
+
+    def add(self, message: Dict[str, Any]) -> 'Outbox':
+        self.messages.append(message)
+        return self
+
+    def send(self) -> None:
+        if not self.messages:
+            return
+        raffle_event_id, messages = self.raffle_event_id, list(self.messages)
+        self.messages = []
+        transaction.on_commit(lambda: dispatch(raffle_event_id, messages))
+
+
+def publish(raffle_event_id, message: Dict[str, Any]) -> None:
+    """ส่งข้อความเดียวผ่าน outbox"""
+    Outbox(raffle_event_id).add(message).send()
+
+
+async def _deliver(raffle_event_id, messages: List[Dict[str, Any]]) -> None:
+    # Live state first, so a socket connecting now gets a snapshot that already includes this batch
+    try:
+        live_state.apply_messages(raffle_event_id, messages)
+    except Exception as e:
+        logger.warning(f'Raffle live state update failed: {e}')
+
+    channel_layer = get_channel_layer()
+    if channel_layer:
+        await channel_layer.group_send(
+            f'raffle_{raffle_event_id}',
+            {'type': 'batch', 'messages': messages}
+        )
+
+
+class _BroadcastWorker:
+    """thread เดียวที่มี event loop ของตัวเอง ส่ง batch ตามลำดับที่ได้รับ (เริ่มเมื่อใช้ครั้งแรกในแต่ละ process)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = None
+        self._loop = None
+        self._queue = None
+
+    def _start(self) -> None:
+        self._loop = asyncio.new_event_loop()
+        self._queue = asyncio.Queue()
+        self._pid = os.getpid()
+        threading.Thread(target=self._run, name='raffle-broadcast', daemon=True).start()
+
+    def _run(self) -> None:
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_until_complete(self._consume())
+
+    async def _consume(self) -> None:
+        while True:
+            raffle_event_id, messages = await self._queue.get()
+            try:
+                await _deliver(raffle_event_id, messages)
+            except Exception as e:
+                logger.error(f'Raffle broadcast failed for raffle {raffle_event_id}: {e}', exc_info=True)
+
+    def submit(self, raffle_event_id, messages: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            # Restart after fork (e.g. gunicorn preload): threads are not inherited
+            if self._pid != os.getpid():
+                self._start()
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, (raffle_event_id, messages))
+
+
+_worker = _BroadcastWorker()
+
+
+def dispatch(raffle_event_id, messages: List[Dict[str, Any]]) -> None:
+    """ส่ง batch ทันที: เบื้องหลัง (ค่าเริ่มต้น) หรือแบบ synchronous ถ้า RAFFLE_BROADCAST_ASYNC=False"""
+    if getattr(settings, 'RAFFLE_BROADCAST_ASYNC', True):
+        _worker.submit(raffle_event_id, messages)
+    else:
+        async_to_sync(_deliver)(raffle_event_id, messages)
@@ -2,10 +2,17 @@ import json
 import logging
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
+from asgiref.sync import sync_to_async
 from accounts.models import User
+from . import live_state
 
 logger = logging.getLogger(__name__)
 
+# Message types a 'batch' group message may carry (see raffle.broadcast)
+BATCH_MESSAGE_TYPES = (
+    'raffle_result', 'round_result', 'raffle_update', 'winners_update', 'winners_reset', 'control_action'
+)
+
 
 class RaffleConsumer(AsyncWebsocketConsumer):
     """WebSocket consumer for raffle realtime updates"""
@@ -30,6 +37,9 @@ class RaffleConsumer(AsyncWebsocketConsumer):
                 logger.info(f"Joined room group: {self.room_group_name}")
             else:
                 logger.warning("Channel layer is None!")
+            
+            # First frame: current state, so late joiners don't need to poll REST endpoints
+            await self.send_state_snapshot()
         except Exception as e:
             logger.error(f"Error in WebSocket connect: {e}", exc_info=True)
             # Don't accept if there's an error
@@ -48,6 +58,19 @@ class RaffleConsumer(AsyncWebsocketConsumer):
         except Exception as e:
             logger.error(f"Error in WebSocket disconnect: {e}", exc_info=True)
     
+    async def send_state_snapshot(self):
+        """Send the live state of this raffle (one Redis read)"""
+        try:
+            state = await sync_to_async(live_state.get_snapshot)(self.raffle_id)
+        except Exception as e:
+            logger.warning(f"Could not load live state for raffle {self.raffle_id}: {e}")
+            return
+        await self.send(text_data=json.dumps({
+            'type': 'state_snapshot',
+            'raffle_event_id': self.raffle_id,
+            'state': state
+        }))
+    
     # Receive message from WebSocket
     async def receive(self, text_data):
         text_data_json = json.loads(text_data)
@@ -57,8 +80,19 @@ class RaffleConsumer(AsyncWebsocketConsumer):
             await self.send(text_data=json.dumps({
                 'type': 'pong'
             }))
+        elif message_type == 'get_state':
+            await self.send_state_snapshot()
     
     # Receive message from room group
+    async def batch(self, event):
+        """Unpack a batched group message into the individual frames, in order"""
+        for message in event.get('messages', []):
+            message_type = message.get('type')
+            if message_type not in BATCH_MESSAGE_TYPES:
+                logger.warning(f"Unknown message type in batch: {message_type}")
+                continue
+            await getattr(self, message_type)(message)
+    
     async def raffle_result(self, event):
         """Send raffle result to WebSocket"""
         await self.send(text_data=json.dumps({
@@ -68,6 +102,14 @@ class RaffleConsumer(AsyncWebsocketConsumer):
             'seed': event['seed']
         }))
     
+    async def round_result(self, event):
+        """Send results of a whole round (draw-round) to WebSocket"""
+        await self.send(text_data=json.dumps({
+            'type': 'round_result',
+            'round_number': event.get('round_number'),
+            'results': event.get('results', [])
+        }))
+    
     async def raffle_update(self, event):
         """Send general raffle update to WebSocket"""
         await self.send(text_data=json.dumps({
@@ -84,6 +126,13 @@ class RaffleConsumer(AsyncWebsocketConsumer):
             'timestamp': event.get('timestamp')
         }))
     
+    async def winners_reset(self, event):
+        """Winners of this raffle (or a prize) were reset"""
+        await self.send(text_data=json.dumps({
+            'type': 'winners_reset',
+            'raffle_event_id': event.get('raffle_event_id')
+        }))
+    
     async def control_action(self, event):
         """Send control action to WebSocket"""
         await self.send(text_data=json.dumps({
@@ -0,0 +1,130 @@
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+from django.db.models import QuerySet
+from .models import RaffleEvent, RaffleParticipant, RaffleEligibleParticipant
+from teams.models import Participant, TeamMember
+
+
+class EligibilityQueryBuilder:
+    """
+    สร้าง query หาผู้มีสิทธิ์จับรางวัลตามกติกา
+
+    กติกาทั้งหมดถูกแปลงเป็น SQL query เดียว (ใช้ subquery สำหรับการตัดสิทธิ์)
+    และคืนค่าเฉพาะ id เพื่อไม่ต้องโหลด Participant ทั้ง event เข้าหน่วยความจำ
+    """
+
+    def __init__(self, raffle_event: RaffleEvent, rules: Dict[str, Any]):
+        self.raffle_event = raffle_event
+        self.rules = rules or {}
+
+    @property
+    def excludes_previous_winners(self) -> bool:
+        """ตัดผู้ที่ได้รางวัลแล้วในการจับสลากนี้หรือไม่"""
+        return bool(
+            self.rules.get('no_repeat_prize', False)
+            or self.raffle_event.no_repeat_prize
+            or self.rules.get('no_duplicate_participant', False)
+        )
+
+    def _selected(self) -> QuerySet:
+        return RaffleParticipant.objects.filter(prize__raffle_event_id=self.raffle_event.id)
+
+    def _opted_out(self) -> QuerySet:
+        return RaffleEligibleParticipant.objects.filter(
+            raffle_event_id=self.raffle_event.id,
+            is_opted_out=True
+        )
+
+    def queryset(self) -> QuerySet:
+        """Participant queryset ที่มีสิทธิ์ตามกติกา (ยังไม่ถูก evaluate)"""
+        event = self.raffle_event.event
+        participants = Participant.objects.filter(
+            org_id=event.org_id,
+            event_id=event.id,
+            is_raffle_eligible=True
+        ).exclude(
+            # Opted out of this raffle only (e.g. already won here)
+            id__in=self._opted_out().values('participant_id')
+        )
+
+        # Filter by team (if specified)
+        if self.rules.get('filter_by_team'):
+            team_ids = self.rules.get('team_ids', [])
+            if team_ids:
+                participants = participants.filter(
+                    id__in=TeamMember.objects.filter(
+                        team_id__in=team_ids,
+                        event_id=event.id
+                    ).values('participant_id')
+                )
+
+        # Filter by department (if specified)
+        if self.rules.get('filter_by_department'):
+            department_ids = self.rules.get('department_ids', [])
+            if department_ids:
+                participants = participants.filter(department_id__in=department_ids)
+
+        # Exclude already selected (no_repeat_prize / no_duplicate_participant)
+        if self.excludes_previous_winners:
+            participants = participants.exclude(
+                id__in=self._selected().values('participant_id')
+            )
+
+        # Exclude departments that already have a winner
+        # NULL departments must be dropped from the subquery, otherwise NOT IN matches nothing
+        if self.rules.get('no_duplicate_department', False):
+            participants = participants.exclude(
+                department_id__in=self._selected().filter(
+                    participant__department_id__isnull=False
+                ).values('participant__department_id')
+            )
+
+        return participants
+
+    def ordered_ids(self) -> QuerySet:
+        """
+        id ของผู้มีสิทธิ์ เรียงตาม ordering ของ Participant (name) โดยมี id เป็นตัวตัดสินเสมอ
+        ลำดับนี้ต้องคงที่ เพราะผลการสุ่มด้วย seed เดียวกันขึ้นอยู่กับตำแหน่งใน pool
+        """
+        return self.queryset().order_by('name', 'id').values_list('id', flat=True)
+
+    def ids(self) -> List[int]:
+        return list(self.ordered_ids())
+
+    def count(self) -> int:
+        return self.queryset().count()
+
+    def selected_rows(self) -> List[Tuple[int, Optional[int], int]]:
+        """ผู้ชนะปัจจุบันของการจับสลากนี้: [(participant_id, department_id, prize_id)]"""
+        return list(self._selected().values_list('participant_id', 'participant__department_id', 'prize_id'))
+
+    def filter_entries(
+        self,
+        entries: Sequence[Sequence],
+        selected: Sequence[Tuple[int, Optional[int], int]],
+        prize_id: Optional[int] = None
+    ) -> List[int]:
+        """
+        ใช้กติกาเดียวกับ queryset() กับ pool ที่โหลดไว้แล้วในหน่วยความจำ (คงลำดับของ entries)
+        entries: [(participant_id, department_id, team_id)]
+        selected: ผลจาก selected_rows() (รวมผู้ชนะที่เพิ่งสุ่มได้แต่ยังไม่บันทึก)
+        prize_id: ถ้าไม่ตัดผู้ชนะเดิม ก็ยังตัดคนที่ได้รางวัลนี้ไปแล้ว
+        """
+        if self.excludes_previous_winners:
+            taken = {pid for pid, _, _ in selected}
+        else:
+            taken = {pid for pid, _, won_prize_id in selected if won_prize_id == prize_id}
+
+        taken_departments = set()
+        if self.rules.get('no_duplicate_department', False):
+            taken_departments = {dept_id for _, dept_id, _ in selected if dept_id is not None}
+
+        team_ids = set(self.rules.get('team_ids', [])) if self.rules.get('filter_by_team') else set()
+        department_ids = set(self.rules.get('department_ids', [])) if self.rules.get('filter_by_department') else set()
+
+        return [
+            pid for pid, dept_id, team_id in entries
+            if pid not in taken
+            and (not team_ids or team_id in team_ids)
+            and (not department_ids or dept_id in department_ids)
+            and (dept_id is None or dept_id not in taken_departments)
+        ]
@@ -0,0 +1,323 @@
+import logging
+import random
+import uuid
+from typing import Dict, Any, List, Iterable, Optional
+from django.conf import settings
+from django.db import transaction
+from django.db.models import QuerySet
+from core import render_cache
+from .models import RaffleEvent, RaffleParticipant, RaffleEligibleParticipant
+from teams.models import Participant, TeamMember
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'nrsport:raffle_index'
+CHUNK_SIZE = 5000
+VERSION_NAMESPACE = 'raffle_eligibility'
+
+
+def is_enabled() -> bool:
+    """เปิดใช้ดัชนีผู้มีสิทธิ์ใน Redis หรือไม่ (settings.RAFFLE_ELIGIBILITY_INDEX)"""
+    return getattr(settings, 'RAFFLE_ELIGIBILITY_INDEX', False)
+
+
+def get_connection():
+    from django_redis import get_redis_connection
+    return get_redis_connection('default')
+
+
+class EligibilityIndex:
+    """
+    ดัชนีผู้มีสิทธิ์จับรางวัลใน Redis ต่อ RaffleEvent
+
+    ใช้ sorted set ที่ score = participant id เพื่อให้ลำดับคงที่ และสุ่มตามตำแหน่งด้วย seed ได้
+    (SRANDMEMBER กำหนด seed ไม่ได้ จึงตรวจสอบผลย้อนหลังไม่ได้)
+
+    Keys ({prefix}:{raffle_event_id}:...):
+      eligible        ผู้เข้าร่วมที่ is_raffle_eligible=True และไม่ถูกตัดสิทธิ์ในการจับสลากนี้
+      winners         ผู้ได้รางวัลแล้วในการจับสลากนี้
+      winner_depts    set ของ department_id ที่มีผู้ได้รางวัลแล้ว
+      dept:{id}       สมาชิกหน่วยงาน
+      team:{id}       สมาชิกทีม
+      built           marker ว่าดัชนีพร้อมใช้
+    """
+
+    def __init__(self, raffle_event_id: int, connection=None):
+        self.raffle_event_id = raffle_event_id
+        self.conn = connection or get_connection()
+
+    def key(self, *parts) -> str:
+        return ':'.join([KEY_PREFIX, str(self.raffle_event_id), *[str(p) for p in parts]])
+
+    def _zadd(self, pipe, key: str, ids: Iterable[int]) -> None:
+        ids = list(ids)
+        for start in range(0, len(ids), CHUNK_SIZE):
+            pipe.zadd(key, {str(pid): pid for pid in ids[start:start + CHUNK_SIZE]})
+
+    def is_built(self) -> bool:
+        return bool(self.conn.exists(self.key('built')))
+
+    def invalidate(self) -> None:
+        """ทำให้ดัชนีใช้ไม่ได้ (สร้างใหม่เมื่อจับครั้งถัดไป)"""
+        self.conn.delete(self.key('built'))
+
+    def clear(self) -> None:
+        keys = list(self.conn.scan_iter(match=self.key('*'), count=1000))
+        if keys:
+            self.conn.delete(*keys)
+
+    def _opted_out_ids(self) -> QuerySet:
+        return RaffleEligibleParticipant.objects.filter(
+            raffle_event_id=self.raffle_event_id,
+            is_opted_out=True
+        ).values('participant_id')
+
+    def rebuild(self) -> Dict[str, int]:
+        """สร้างดัชนีใหม่จากฐานข้อมูล"""
+        raffle_event = RaffleEvent.objects.select_related('event').get(id=self.raffle_event_id)
+        event = raffle_event.event
+
+        participants = Participant.objects.filter(org_id=event.org_id, event_id=event.id)
+        eligible_ids = list(
+            participants.filter(is_raffle_eligible=True)
+            .exclude(id__in=self._opted_out_ids())
+            .values_list('id', flat=True)
+        )
+
+        departments: Dict[int, List[int]] = {}
+        for pid, dept_id in participants.filter(department_id__isnull=False).values_list('id', 'department_id'):
+            departments.setdefault(dept_id, []).append(pid)
+
+        teams: Dict[int, List[int]] = {}
+        for pid, team_id in TeamMember.objects.filter(event_id=event.id).values_list('participant_id', 'team_id'):
+            teams.setdefault(team_id, []).append(pid)
+
+        winners = list(
+            RaffleParticipant.objects.filter(prize__raffle_event_id=self.raffle_event_id)
+            .values_list('participant_id', 'participant__department_id')
+        )
+
+        self.clear()
+        pipe = self.conn.pipeline(transaction=True)
+        self._zadd(pipe, self.key('eligible'), eligible_ids)
+        for dept_id, ids in departments.items():
+            self._zadd(pipe, self.key('dept', dept_id), ids)
+        for team_id, ids in teams.items():
+            self._zadd(pipe, self.key('team', team_id), ids)
+        if winners:
+            self._zadd(pipe, self.key('winners'), {pid for pid, _ in winners})
+            winner_depts = {dept_id for _, dept_id in winners if dept_id is not None}
+            if winner_depts:
+                pipe.sadd(self.key('winner_depts'), *winner_depts)
+        pipe.set(self.key('built'), 1)
+        pipe.execute()
+
+        return {
+            'eligible': len(eligible_ids),
+            'departments': len(departments),
+            'teams': len(teams),
+            'winners': len(winners),
+        }
+
+    def add_eligible(self, participant_ids: Iterable[int]) -> None:
+        pipe = self.conn.pipeline()
+        self._zadd(pipe, self.key('eligible'), participant_ids)
+        pipe.execute()
+
+    def remove_eligible(self, participant_ids: Iterable[int]) -> None:
+        participant_ids = [str(pid) for pid in participant_ids]
+        if participant_ids:
+            self.conn.zrem(self.key('eligible'), *participant_ids)
+
+    def add_winners(self, participant_ids: Iterable[int], department_ids: Iterable[int]) -> None:
+        pipe = self.conn.pipeline()
+        self._zadd(pipe, self.key('winners'), participant_ids)
+        department_ids = [d for d in department_ids if d is not None]
+        if department_ids:
+            pipe.sadd(self.key('winner_depts'), *department_ids)
+        pipe.execute()
+
+    def sample(self, rules: Dict[str, Any], excludes_previous_winners: bool, quantity: int, seed: str) -> Dict[str, Any]:
+        """
+        สุ่มผู้ชนะด้วย set operation ใน Redis (ZINTERSTORE / ZDIFFSTORE)
+        pool เรียงตาม participant id แล้วดึงเฉพาะตำแหน่งที่สุ่มได้ด้วย ZRANGE
+        Returns: {'success': bool, 'ids': [int], 'pool_size': int}
+        """
+        token = uuid.uuid4().hex
+        temp_keys = []
+
+        def temp(name):
+            k = self.key('tmp', token, name)
+            temp_keys.append(k)
+            return k
+
+        try:
+            intersect = [self.key('eligible')]
+            if rules.get('filter_by_team') and rules.get('team_ids'):
+                intersect.append(temp('teams'))
+                self.conn.zunionstore(intersect[-1], [self.key('team', t) for t in rules['team_ids']])
+            if rules.get('filter_by_department') and rules.get('department_ids'):
+                intersect.append(temp('departments'))
+                self.conn.zunionstore(intersect[-1], [self.key('dept', d) for d in rules['department_ids']])
+
+            pool_key = self.key('eligible')
+            if len(intersect) > 1:
+                pool_key = temp('filtered')
+                # Weight 0 on filter sets keeps score = participant id
+                self.conn.zinterstore(pool_key, {k: (1 if i == 0 else 0) for i, k in enumerate(intersect)})
+
+            exclude = []
+            if excludes_previous_winners:
+                exclude.append(self.key('winners'))
+            if rules.get('no_duplicate_department', False):
+                winner_depts = self.conn.smembers(self.key('winner_depts'))
+                if winner_depts:
+                    exclude.append(temp('winner_dept_members'))
+                    self.conn.zunionstore(exclude[-1], [self.key('dept', d.decode()) for d in winner_depts])
+            if exclude:
+                diff_key = temp('pool')
+                self.conn.zdiffstore(diff_key, [pool_key, *exclude])
+                pool_key = diff_key
+
+            pool_size = self.conn.zcard(pool_key)
+            if pool_size < quantity:
+                return {'success': False, 'ids': [], 'pool_size': pool_size}
+
+            ranks = random.Random(seed).sample(range(pool_size), quantity)
+            pipe = self.conn.pipeline()
+            for rank in ranks:
+                pipe.zrange(pool_key, rank, rank)
+            ids = [int(members[0]) for members in pipe.execute()]
+            return {'success': True, 'ids': ids, 'pool_size': pool_size}
+        finally:
+            if temp_keys:
+                self.conn.delete(*temp_keys)
+
+    def check(self) -> Dict[str, Any]:
+        """เปรียบเทียบดัชนีกับฐานข้อมูล คืนค่าส่วนที่ไม่ตรงกัน"""
+        raffle_event = RaffleEvent.objects.select_related('event').get(id=self.raffle_event_id)
+        event = raffle_event.event
+
+        db_eligible = set(
+            Participant.objects.filter(org_id=event.org_id, event_id=event.id, is_raffle_eligible=True)
+            .exclude(id__in=self._opted_out_ids())
+            .values_list('id', flat=True)
+        )
+        db_winners = set(
+            RaffleParticipant.objects.filter(prize__raffle_event_id=self.raffle_event_id)
+            .values_list('participant_id', flat=True)
+        )
+        index_eligible = {int(m) for m in self.conn.zrange(self.key('eligible'), 0, -1)}
+        index_winners = {int(m) for m in self.conn.zrange(self.key('winners'), 0, -1)}
+
+        result = {
+            'built': self.is_built(),
+            'missing_eligible': sorted(db_eligible - index_eligible),
+            'extra_eligible': sorted(index_eligible - db_eligible),
+            'missing_winners': sorted(db_winners - index_winners),
+            'extra_winners': sorted(index_winners - db_winners),
+        }
+        result['consistent'] = result['built'] and not any(
+            result[k] for k in ('missing_eligible', 'extra_eligible', 'missing_winners', 'extra_winners')
+        )
+        return result
+
+
+def get_version(raffle_event_id: int) -> str:
+    """
+    version ของชุดผู้มีสิทธิ์ในการจับสลาก (ใช้เป็นส่วนหนึ่งของ cache key)
+    เปลี่ยนทุกครั้งที่ sync/invalidate ด้านล่างถูกเรียก ไม่ว่าจะเปิดใช้ดัชนีใน Redis หรือไม่
+    """
+    return render_cache.get_version(VERSION_NAMESPACE, raffle_event_id)
+
+
+def bump_version(raffle_event_ids: Iterable[int]) -> None:
+    """เปลี่ยน version หลัง transaction commit"""
+    render_cache.bump_version(VERSION_NAMESPACE, *raffle_event_ids)
+
+
+def _raffle_event_ids(event_id: int) -> List[int]:
+    return list(RaffleEvent.objects.filter(event_id=event_id).values_list('id', flat=True))
+
+
+def _run(action: str, fn, event_id: Optional[int] = None) -> None:
+    """รัน sync หลัง transaction commit; ถ้า Redis ผิดพลาดให้ทิ้งดัชนีเพื่อให้สร้างใหม่ภายหลัง"""
+    if not is_enabled():
+        return
+
+    def run():
+        try:
+            fn()
+        except Exception as e:
+            logger.warning(f'Eligibility index {action} failed: {e}')
+            if event_id is not None:
+                try:
+                    for raffle_event_id in _raffle_event_ids(event_id):
+                        EligibilityIndex(raffle_event_id).invalidate()
+                except Exception:
+                    pass
+
+    transaction.on_commit(run)
+
+
+def sync_winners(raffle_event: RaffleEvent, participant_ids: List[int]) -> None:
+    """ผู้ชนะใหม่: ตัดสิทธิ์และเพิ่มในผู้ชนะเฉพาะการจับสลากนี้"""
+    if not participant_ids:
+        return
+    bump_version([raffle_event.id])
+
+    def run():
+        index = EligibilityIndex(raffle_event.id)
+        if not index.is_built():
+            return
+        department_ids = set(
+            Participant.objects.filter(id__in=participant_ids).values_list('department_id', flat=True)
+        )
+        index.remove_eligible(participant_ids)
+        index.add_winners(participant_ids, department_ids)
+
+    _run('sync_winners', run, raffle_event.event_id)
+
+
+def sync_eligibility(event_id: int, participant_ids: List[int], is_eligible: bool) -> None:
+    """เปิด/ปิดสิทธิ์ของผู้เข้าร่วมในทุกการจับสลากของ event"""
+    if not participant_ids:
+        return
+    bump_version(_raffle_event_ids(event_id))
+
+    def run():
+        for raffle_event_id in _raffle_event_ids(event_id):
+            index = EligibilityIndex(raffle_event_id)
+            if not index.is_built():
+                continue
+            if is_eligible:
+                # Participants opted out of this raffle stay out of its index
+                opted_out = set(
+                    RaffleEligibleParticipant.objects.filter(
+                        raffle_event_id=raffle_event_id,
+                        participant_id__in=participant_ids,
+                        is_opted_out=True
+                    ).values_list('participant_id', flat=True)
+                )
+                index.add_eligible([pid for pid in participant_ids if pid not in opted_out])
+            else:
+                index.remove_eligible(participant_ids)
+
+    _run('sync_eligibility', run, event_id)
+
+
+def invalidate_event(event_id: int) -> None:
+    """ทิ้งดัชนีของทุกการจับสลากใน event (สร้างใหม่เมื่อจับครั้งถัดไป)"""
+    bump_version(_raffle_event_ids(event_id))
+
+    def run():
+        for raffle_event_id in _raffle_event_ids(event_id):
+            EligibilityIndex(raffle_event_id).invalidate()
+
+    _run('invalidate', run)
+
+
+def invalidate_raffle_event(raffle_event_id: int) -> None:
+    """ทิ้งดัชนีของการจับสลากเดียว"""
+    bump_version([raffle_event_id])
+    _run('invalidate', lambda: EligibilityIndex(raffle_event_id).invalidate())
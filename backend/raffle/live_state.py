@@ -0,0 +1,103 @@
+import json
+import logging
+from datetime import datetime
+from typing import Dict, Any, List
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'nrsport:raffle_live'
+RECENT_WINNERS_LIMIT = 50
+STATE_TTL = 60 * 60 * 24
+
+
+def get_connection():
+    from django_redis import get_redis_connection
+    return get_redis_connection('default')
+
+
+def _key(raffle_event_id, name: str) -> str:
+    return f'{KEY_PREFIX}:{raffle_event_id}:{name}'
+
+
+def _queue_message(pipe, raffle_event_id, message: Dict[str, Any]) -> None:
+    fields = {}
+    message_type = message.get('type')
+    data = message.get('data') or {}
+
+    if message_type == 'control_action':
+        action = message.get('action')
+        if action == 'spin':
+            fields.update(current_prize_id=data.get('prize_id'), display_count=data.get('display_count'), is_spinning=True)
+        elif action == 'select_prize':
+            fields['current_prize_id'] = data.get('prize_id')
+        elif action == 'set_display_count':
+            fields['display_count'] = data.get('display_count')
+        elif action == 'spin_state':
+            fields['is_spinning'] = bool(data.get('isSpinning'))
+        elif action == 'save':
+            fields['is_spinning'] = False
+    elif message_type == 'raffle_result':
+        fields['last_result'] = {
+            'type': 'raffle_result',
+            'prize_id': message.get('prize_id'),
+            'winners': message.get('winners', []),
+            'seed': message.get('seed'),
+        }
+        fields['current_prize_id'] = message.get('prize_id')
+    elif message_type == 'round_result':
+        fields['last_result'] = {
+            'type': 'round_result',
+            'round_number': message.get('round_number'),
+            'results': message.get('results', []),
+        }
+
+    state_key = _key(raffle_event_id, 'state')
+    if message_type == 'winners_reset':
+        pipe.hdel(state_key, 'last_result')
+        pipe.delete(_key(raffle_event_id, 'recent_winners'))
+    if fields:
+        fields['updated_at'] = message.get('timestamp') or datetime.now().isoformat()
+        pipe.hset(state_key, mapping={name: json.dumps(value) for name, value in fields.items()})
+    if message_type == 'winners_update' and message.get('winners'):
+        winners_key = _key(raffle_event_id, 'recent_winners')
+        pipe.lpush(winners_key, *[json.dumps(w) for w in message['winners']])
+        pipe.ltrim(winners_key, 0, RECENT_WINNERS_LIMIT - 1)
+        pipe.expire(winners_key, STATE_TTL)
+    pipe.expire(state_key, STATE_TTL)
+
+
+def apply_messages(raffle_event_id, messages: List[Dict[str, Any]], connection=None) -> None:
+    """
+    อัปเดตสถานะปัจจุบันของการจับสลาก (live state) จากข้อความที่ broadcast (pipeline เดียวต่อ batch)
+
+    เก็บเป็น Redis hash (แต่ละ field เป็น JSON) และ list ของผู้ชนะล่าสุด
+    เขียนแยก field จึงไม่ทับกันเมื่อหลาย worker อัปเดตพร้อมกัน
+    """
+    conn = connection or get_connection()
+    pipe = conn.pipeline(transaction=True)
+    for message in messages:
+        _queue_message(pipe, raffle_event_id, message)
+    pipe.execute()
+
+
+def get_snapshot(raffle_event_id, connection=None) -> Dict[str, Any]:
+    """สถานะปัจจุบันทั้งหมด อ่านด้วย pipeline เดียว (HGETALL + LRANGE)"""
+    conn = connection or get_connection()
+    pipe = conn.pipeline(transaction=False)
+    pipe.hgetall(_key(raffle_event_id, 'state'))
+    pipe.lrange(_key(raffle_event_id, 'recent_winners'), 0, RECENT_WINNERS_LIMIT - 1)
+    state, recent_winners = pipe.execute()
+
+    snapshot = {
+        'current_prize_id': None,
+        'display_count': None,
+        'is_spinning': False,
+        'last_result': None,
+        'updated_at': None,
+    }
+    snapshot.update({
+        (name.decode() if isinstance(name, bytes) else name): json.loads(value)
+        for name, value in state.items()
+    })
+    snapshot['recent_winners'] = [json.loads(w) for w in recent_winners]
+    return snapshot
@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand, CommandError
+from raffle.models import RaffleEvent
+from raffle.eligibility_index import EligibilityIndex
+
+
+class Command(BaseCommand):
+    help = 'Rebuild or check the Redis raffle eligibility index against the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['rebuild', 'check'])
+        parser.add_argument(
+            '--raffle-event',
+            type=int,
+            action='append',
+            dest='raffle_event_ids',
+            help='RaffleEvent id (repeatable). Default: all raffle events'
+        )
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='check: rebuild raffle events whose index is inconsistent'
+        )
+
+    def handle(self, *args, **options):
+        raffle_events = RaffleEvent.objects.order_by('id')
+        if options['raffle_event_ids']:
+            raffle_events = raffle_events.filter(id__in=options['raffle_event_ids'])
+        raffle_event_ids = list(raffle_events.values_list('id', flat=True))
+        if not raffle_event_ids:
+            raise CommandError('No raffle events found')
+
+        inconsistent = 0
+        for raffle_event_id in raffle_event_ids:
+            index = EligibilityIndex(raffle_event_id)
+
+            if options['action'] == 'rebuild':
+                counts = index.rebuild()
+                self.stdout.write(f'Raffle event {raffle_event_id}: rebuilt {counts}')
+                continue
+
+            result = index.check()
+            if result['consistent']:
+                self.stdout.write(self.style.SUCCESS(f'Raffle event {raffle_event_id}: OK'))
+                continue
+
+            inconsistent += 1
+            self.stdout.write(self.style.WARNING(
+                f"Raffle event {raffle_event_id}: built={result['built']} "
+                f"missing_eligible={len(result['missing_eligible'])} "
+                f"extra_eligible={len(result['extra_eligible'])} "
+                f"missing_winners={len(result['missing_winners'])} "
+                f"extra_winners={len(result['extra_winners'])}"
+            ))
+            if options['fix']:
+                index.rebuild()
+                self.stdout.write(f'Raffle event {raffle_event_id}: rebuilt')
+
+        if inconsistent and not options['fix']:
+            raise CommandError(f'{inconsistent} raffle event(s) have an inconsistent eligibility index')
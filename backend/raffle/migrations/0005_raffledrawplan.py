@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('raffle', '0004_add_print_status_fields'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RaffleDrawPlan',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('seed', models.CharField(max_length=100, verbose_name='Seed value')),
+                ('permutation_hash', models.CharField(max_length=64, verbose_name='Hash ของลำดับ')),
+                ('entries', models.JSONField(default=list, help_text='[[participant_id, department_id, team_id], ...] ตามลำดับที่สุ่มแล้ว', verbose_name='ลำดับผู้มีสิทธิ์')),
+                ('pool_size', models.PositiveIntegerField(default=0, verbose_name='จำนวนผู้มีสิทธิ์')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('raffle_event', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='draw_plan', to='raffle.raffleevent', verbose_name='การจับสลาก')),
+            ],
+            options={
+                'verbose_name': 'ลำดับการจับสลาก',
+                'verbose_name_plural': 'ลำดับการจับสลาก',
+            },
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated migration to move winner exclusion from Participant.is_raffle_eligible to per-raffle rows
+
+from django.db import migrations, models
+
+
+def opt_out_existing_winners(apps, schema_editor):
+    """Opt out existing winners per raffle event and restore their event-wide eligibility"""
+    RaffleParticipant = apps.get_model('raffle', 'RaffleParticipant')
+    RaffleEligibleParticipant = apps.get_model('raffle', 'RaffleEligibleParticipant')
+    Participant = apps.get_model('teams', 'Participant')
+
+    winners = set(
+        RaffleParticipant.objects.values_list('prize__raffle_event_id', 'participant_id')
+    )
+    existing = set(
+        RaffleEligibleParticipant.objects.values_list('raffle_event_id', 'participant_id')
+    )
+    RaffleEligibleParticipant.objects.bulk_create(
+        [
+            RaffleEligibleParticipant(
+                raffle_event_id=raffle_event_id,
+                participant_id=participant_id,
+                is_opted_out=True,
+                opt_out_reason='won'
+            )
+            for raffle_event_id, participant_id in winners - existing
+        ],
+        batch_size=1000
+    )
+
+    # Winning no longer disables eligibility for the whole event
+    winner_ids = {participant_id for _, participant_id in winners}
+    Participant.objects.filter(id__in=winner_ids, is_raffle_eligible=False).update(is_raffle_eligible=True)
+
+
+def reverse_opt_out_existing_winners(apps, schema_editor):
+    """Reverse: Disable raffle eligibility for participants who have already won prizes"""
+    Participant = apps.get_model('teams', 'Participant')
+    RaffleParticipant = apps.get_model('raffle', 'RaffleParticipant')
+
+    winner_ids = RaffleParticipant.objects.values_list('participant_id', flat=True).distinct()
+    Participant.objects.filter(id__in=winner_ids).update(is_raffle_eligible=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('raffle', '0005_raffledrawplan'),
+        ('teams', '0005_change_hospital_id_to_integer'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='raffleeligibleparticipant',
+            name='is_opted_out',
+            field=models.BooleanField(default=True, help_text='ถ้าเปิด ผู้เข้าร่วมจะไม่ถูกจับในการจับสลากนี้อีก', verbose_name='ได้รางวัลแล้ว'),
+        ),
+        migrations.RunPython(
+            opt_out_existing_winners,
+            reverse_opt_out_existing_winners,
+        ),
+    ]
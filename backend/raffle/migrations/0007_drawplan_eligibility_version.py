@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('raffle', '0006_raffle_eligibility_per_event'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='raffledrawplan',
+            name='eligibility_version',
+            field=models.CharField(blank=True, help_text='eligibility_index.get_version ล่าสุดที่ตรวจแล้วว่าผู้มีสิทธิ์ทุกคนอยู่ในลำดับ', max_length=32, verbose_name='Version ของผู้มีสิทธิ์'),
+        ),
+    ]
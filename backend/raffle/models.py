@@ -97,6 +97,52 @@ class RaffleParticipant(models.Model):
         return f"{self.prize.name} - {self.participant.name}"
 
 
+class RaffleEligibleParticipant(models.Model):
+    """
+    การตัดสิทธิ์ผู้เข้าร่วมรายการจับสลาก (ต่อ RaffleEvent)
+
+    Participant.is_raffle_eligible เป็นสิทธิ์ระดับกิจกรรม (เปิด/ปิดโดยเจ้าหน้าที่)
+    ส่วนการได้รางวัลแล้วจะบันทึกเป็นแถวในตารางนี้เฉพาะการจับสลากนั้น
+    การจับสลากอื่นใน event เดียวกันจึงไม่ได้รับผลกระทบ และ reset ลบเฉพาะแถวของการจับสลากนั้น
+    """
+    raffle_event = models.ForeignKey(
+        RaffleEvent,
+        on_delete=models.CASCADE,
+        related_name='eligible_participants',
+        verbose_name="การจับสลาก"
+    )
+    participant = models.ForeignKey(
+        Participant,
+        on_delete=models.CASCADE,
+        related_name='raffle_eligibilities',
+        verbose_name="ผู้เข้าร่วม"
+    )
+    is_opted_out = models.BooleanField(
+        default=True,
+        verbose_name="ได้รางวัลแล้ว",
+        help_text="ถ้าเปิด ผู้เข้าร่วมจะไม่ถูกจับในการจับสลากนี้อีก"
+    )
+    opt_out_reason = models.TextField(blank=True, verbose_name="เหตุผลในการตัดสิทธิ")
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='created_raffle_eligibilities',
+        verbose_name="เพิ่มโดย"
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="วันที่เพิ่ม")
+
+    class Meta:
+        verbose_name = "ผู้มีสิทธิ์รับรางวัล"
+        verbose_name_plural = "ผู้มีสิทธิ์รับรางวัล"
+        unique_together = [['raffle_event', 'participant']]
+        ordering = ['created_at']
+
+    def __str__(self):
+        return f"{self.raffle_event.name} - {self.participant.name}"
+
+
 class RaffleLog(models.Model):
     """Log การจับสลาก"""
     raffle_event = models.ForeignKey(
@@ -124,3 +170,35 @@ class RaffleLog(models.Model):
     def __str__(self):
         return f"{self.raffle_event.name} - {self.prize.name} - {self.timestamp}"
 
+
+
+class RaffleDrawPlan(models.Model):
+    """ลำดับการจับสลากที่สุ่มไว้ล่วงหน้า (permutation ของผู้มีสิทธิ์ทั้งหมด)"""
+    raffle_event = models.OneToOneField(
+        RaffleEvent,
+        on_delete=models.CASCADE,
+        related_name='draw_plan',
+        verbose_name="การจับสลาก"
+    )
+    seed = models.CharField(max_length=100, verbose_name="Seed value")
+    permutation_hash = models.CharField(max_length=64, verbose_name="Hash ของลำดับ")
+    entries = models.JSONField(
+        default=list,
+        verbose_name="ลำดับผู้มีสิทธิ์",
+        help_text="[[participant_id, department_id, team_id], ...] ตามลำดับที่สุ่มแล้ว"
+    )
+    pool_size = models.PositiveIntegerField(default=0, verbose_name="จำนวนผู้มีสิทธิ์")
+    eligibility_version = models.CharField(
+        max_length=32,
+        blank=True,
+        verbose_name="Version ของผู้มีสิทธิ์",
+        help_text="eligibility_index.get_version ล่าสุดที่ตรวจแล้วว่าผู้มีสิทธิ์ทุกคนอยู่ในลำดับ"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "ลำดับการจับสลาก"
+        verbose_name_plural = "ลำดับการจับสลาก"
+
+    def __str__(self):
+        return f"{self.raffle_event.name} - {self.permutation_hash[:12]}"
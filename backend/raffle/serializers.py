@@ -72,6 +72,36 @@ class PrizeSerializer(serializers.ModelSerializer):
             'quantity', 'rules', 'selected_count', 'created_at', 'updated_at'
         ]
         read_only_fields = ['created_at', 'updated_at', 'selected_count']
+    
+    def validate_rules(self, value):
+        """Validate weighted (weight_by / default_weight) and stratified (stratify / max_per_department) settings"""
+        if not value:
+            return value
+        
+        if value.get('weight_by'):
+            if not isinstance(value['weight_by'], str):
+                raise serializers.ValidationError('weight_by must be a Participant.metadata key')
+            try:
+                default_weight = float(value.get('default_weight', 1))
+            except (TypeError, ValueError):
+                raise serializers.ValidationError('default_weight must be a number')
+            if default_weight < 0:
+                raise serializers.ValidationError('default_weight must not be negative')
+        
+        if value.get('stratify'):
+            if value['stratify'] not in ('proportional', 'max_per_department'):
+                raise serializers.ValidationError("stratify must be 'proportional' or 'max_per_department'")
+            if value.get('weight_by'):
+                raise serializers.ValidationError('stratify cannot be combined with weight_by')
+        
+        if value.get('max_per_department') is not None:
+            try:
+                max_per_department = int(value['max_per_department'])
+            except (TypeError, ValueError):
+                raise serializers.ValidationError('max_per_department must be an integer')
+            if max_per_department < 1:
+                raise serializers.ValidationError('max_per_department must be at least 1')
+        return value
 
 
 class RaffleParticipantSerializer(serializers.ModelSerializer):
@@ -0,0 +1,375 @@
+import logging
+import random
+from collections import Counter
+from typing import Callable, Dict, Any, Iterator, List, Optional
+from django.core.cache import cache
+from django.db import transaction
+from .models import Prize, RaffleEvent, RaffleParticipant, RaffleLog, RaffleEligibleParticipant
+from teams.models import Participant
+from core.utils import create_audit_log
+from .eligibility import EligibilityQueryBuilder
+from .eligibility_index import sync_winners, invalidate_raffle_event
+from . import eligibility_index
+from . import winners_feed
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = 'HTTP_IDEMPOTENCY_KEY'
+IDEMPOTENCY_TTL = 60 * 60 * 24
+
+# Report columns: (output key, lookup on RaffleParticipant)
+REPORT_COLUMNS = (
+    ('round', 'prize__round_number'),
+    ('prize', 'prize__name'),
+    ('participant', 'participant__name'),
+    ('department', 'participant__department__name'),
+    ('selected_at', 'selected_at'),
+    ('seed', 'seed_value'),
+)
+CANDIDATES_KEY = 'raffle_candidates'
+CANDIDATES_TTL = 60 * 60
+CANDIDATES_MAX = 500
+
+REPORT_FIELDS = ('raffle_event',) + tuple(key for key, _ in REPORT_COLUMNS)
+
+
+def commit_draws(
+    raffle_event: RaffleEvent,
+    draws: List[Dict[str, Any]],
+    audit_changes: Optional[Dict] = None,
+    user=None,
+    request=None
+) -> Dict[str, Any]:
+    """
+    บันทึกผู้ชนะของหลายรางวัลใน transaction เดียว
+
+    draws: [{'prize': Prize, 'participant_ids': [int], 'seed': str,
+             'rule_snapshot': dict (optional), 'result': dict (optional)}]
+
+    - RaffleParticipant: bulk_create ครั้งเดียว (ignore_conflicts กันซ้ำกับ unique prize/participant)
+    - ตัดสิทธิ์ผู้ชนะใหม่เฉพาะการจับสลากนี้ (RaffleEligibleParticipant) ด้วย bulk insert ครั้งเดียว
+    - RaffleLog: bulk_create ครั้งเดียวสำหรับ draw ที่ระบุ result
+    - AuditLog: สร้างเมื่อระบุ audit_changes (เติม selected_count ให้)
+
+    Returns: {'created': {prize_id: [participant_id]}, 'created_count': int}
+    """
+    for draw in draws:
+        draw['participant_ids'] = list(dict.fromkeys(draw['participant_ids']))
+
+    all_ids = {pid for draw in draws for pid in draw['participant_ids']}
+
+    with transaction.atomic():
+        existing = set(
+            RaffleParticipant.objects.filter(
+                prize_id__in=[draw['prize'].id for draw in draws],
+                participant_id__in=all_ids
+            ).values_list('prize_id', 'participant_id')
+        )
+
+        created = {}
+        rows = []
+        for draw in draws:
+            prize = draw['prize']
+            created[prize.id] = [
+                pid for pid in draw['participant_ids'] if (prize.id, pid) not in existing
+            ]
+            rows.extend(
+                RaffleParticipant(prize=prize, participant_id=pid, seed_value=draw['seed'])
+                for pid in created[prize.id]
+            )
+
+        created_ids = {row.participant_id for row in rows}
+        if rows:
+            RaffleParticipant.objects.bulk_create(rows, ignore_conflicts=True)
+            # Opt winners out of this raffle only; other raffles of the event are untouched
+            RaffleEligibleParticipant.objects.bulk_create(
+                [
+                    RaffleEligibleParticipant(
+                        raffle_event=raffle_event,
+                        participant_id=pid,
+                        is_opted_out=True,
+                        opt_out_reason='won',
+                        created_by=user if user and user.is_authenticated else None
+                    )
+                    for pid in created_ids
+                ],
+                update_conflicts=True,
+                unique_fields=['raffle_event', 'participant'],
+                update_fields=['is_opted_out', 'opt_out_reason']
+            )
+            sync_winners(raffle_event, list(created_ids))
+            winners_feed.bump_version(raffle_event.id)
+
+        logs = [
+            RaffleLog(
+                raffle_event=raffle_event,
+                prize=draw['prize'],
+                seed=draw['seed'],
+                rule_snapshot=draw.get('rule_snapshot') or {},
+                result={
+                    **draw['result'],
+                    'selected_participants': draw['participant_ids']
+                }
+            )
+            for draw in draws if draw.get('result') is not None
+        ]
+        if logs:
+            RaffleLog.objects.bulk_create(logs)
+
+        if audit_changes is not None:
+            create_audit_log(
+                user=user,
+                org=raffle_event.org,
+                action='create',
+                model='RaffleParticipant',
+                changes={**audit_changes, 'selected_count': len(rows)},
+                request=request
+            )
+
+    return {'created': created, 'created_count': len(rows)}
+
+
+def commit_winners(
+    prize: Prize,
+    participant_ids: List[int],
+    seed: str,
+    rule_snapshot: Optional[Dict] = None,
+    result: Optional[Dict] = None,
+    audit_changes: Optional[Dict] = None,
+    user=None,
+    request=None
+) -> Dict[str, Any]:
+    """
+    บันทึกผู้ชนะของรางวัลเดียวใน transaction เดียว (ดู commit_draws)
+
+    Returns: {'created_ids': [int], 'created_count': int}
+    """
+    commit = commit_draws(
+        prize.raffle_event,
+        [{
+            'prize': prize,
+            'participant_ids': participant_ids,
+            'seed': seed,
+            'rule_snapshot': rule_snapshot,
+            'result': result
+        }],
+        audit_changes=audit_changes,
+        user=user,
+        request=request
+    )
+    return {'created_ids': commit['created'][prize.id], 'created_count': commit['created_count']}
+
+
+def restore_eligibility(raffle_event: RaffleEvent, participant_ids: List[int]) -> int:
+    """
+    คืนสิทธิ์จับรางวัลในการจับสลากนี้ให้ผู้เข้าร่วมที่ถูกลบผลรางวัล
+    ลบเฉพาะแถวของการจับสลากนี้ และข้ามคนที่ยังได้รางวัลอื่นในการจับสลากนี้อยู่
+
+    Returns: จำนวนแถวที่ลบ
+    """
+    if not participant_ids:
+        return 0
+
+    deleted, _ = RaffleEligibleParticipant.objects.filter(
+        raffle_event_id=raffle_event.id,
+        participant_id__in=participant_ids
+    ).exclude(
+        participant_id__in=RaffleParticipant.objects.filter(
+            prize__raffle_event_id=raffle_event.id
+        ).values('participant_id')
+    ).delete()
+    invalidate_raffle_event(raffle_event.id)
+    return deleted
+
+
+def reset_winners(raffle_event: RaffleEvent, prize: Optional[Prize] = None) -> Dict[str, Any]:
+    """
+    ลบผู้ชนะทั้งการจับสลาก (หรือเฉพาะ prize) และคืนสิทธิ์ใน transaction เดียว
+    ใช้จำนวน statement คงที่ไม่ขึ้นกับจำนวนรางวัล:
+    1 SELECT (ผู้ชนะ + ชื่อรางวัล), 1 DELETE (join prize__raffle_event), 1 DELETE แถว opt-out
+
+    Returns: {'deleted_count', 'prizes': [{'prize_id', 'prize_name', 'deleted_count'}],
+              'winners': [(raffle_participant_id, participant_id, prize_id), ...]}
+    """
+    winners_qs = RaffleParticipant.objects.filter(prize__raffle_event_id=raffle_event.id)
+    if prize is not None:
+        winners_qs = winners_qs.filter(prize_id=prize.id)
+
+    with transaction.atomic():
+        rows = list(winners_qs.order_by().values_list('id', 'participant_id', 'prize_id', 'prize__name'))
+        if rows:
+            # No cascades or delete signals on RaffleParticipant: Django issues a single DELETE
+            winners_qs.delete()
+            restore_eligibility(raffle_event, list({participant_id for _, participant_id, _, _ in rows}))
+
+    counts = Counter(prize_id for _, _, prize_id, _ in rows)
+    prize_names = {prize_id: prize_name for _, _, prize_id, prize_name in rows}
+    return {
+        'deleted_count': len(rows),
+        'prizes': [
+            {'prize_id': prize_id, 'prize_name': prize_names[prize_id], 'deleted_count': count}
+            for prize_id, count in sorted(counts.items())
+        ],
+        'winners': [(winner_id, participant_id, prize_id) for winner_id, participant_id, prize_id, _ in rows],
+    }
+
+
+def sample_candidate_names(raffle_event: RaffleEvent, size: int) -> Dict[str, Any]:
+    """
+    สุ่มชื่อ (และหน่วยงาน) ของผู้มีสิทธิ์ในการจับสลากนี้ สำหรับแอนิเมชันวงล้อบนหน้าจอแสดงผล
+    cache ต่อ RaffleEvent + version ของผู้มีสิทธิ์ + จำนวน: ทุกจอได้ชุดเดียวกันจนกว่าสิทธิ์จะเปลี่ยน
+
+    Returns: {'version', 'eligible_count', 'candidates': [[name, department], ...]}
+    """
+    size = max(1, min(size, CANDIDATES_MAX))
+    version = eligibility_index.get_version(raffle_event.id)
+    key = f'{CANDIDATES_KEY}:{raffle_event.id}:{version}:{size}'
+    try:
+        cached = cache.get(key)
+    except Exception as e:
+        logger.warning(f'Candidate names cache read failed: {e}')
+        cached = None
+    if cached is not None:
+        return cached
+
+    # Eligibility without prize rules (every prize's pool is a subset); only ids are loaded for the full set
+    eligible_ids = list(EligibilityQueryBuilder(raffle_event, {}).queryset().values_list('id', flat=True))
+    sample_ids = random.Random().sample(eligible_ids, min(size, len(eligible_ids)))
+    rows = dict(
+        (pid, [name, department_name or ''])
+        for pid, name, department_name in Participant.objects.filter(id__in=sample_ids).values_list(
+            'id', 'name', 'department__name'
+        )
+    )
+
+    data = {
+        'version': version,
+        'eligible_count': len(eligible_ids),
+        'candidates': [rows[pid] for pid in sample_ids if pid in rows],
+    }
+    try:
+        cache.set(key, data, CANDIDATES_TTL)
+    except Exception as e:
+        logger.warning(f'Candidate names cache write failed: {e}')
+    return data
+
+
+def report_rows(raffle_event: RaffleEvent) -> Iterator[Dict[str, Any]]:
+    """
+    แถวรายงานผู้ได้รับรางวัลทั้งหมดของการจับสลาก (ตามลำดับ REPORT_FIELDS)
+    ดึงด้วย query เดียว (join prize / participant / department) และอ่านทีละ chunk
+    """
+    keys = [key for key, _ in REPORT_COLUMNS]
+    queryset = RaffleParticipant.objects.filter(
+        prize__raffle_event_id=raffle_event.id
+    ).order_by(
+        'prize__round_number', 'prize__name', 'prize_id', 'selected_at'
+    ).values_list(*[lookup for _, lookup in REPORT_COLUMNS])
+
+    for values in queryset.iterator(chunk_size=2000):
+        row = {'raffle_event': raffle_event.name, **dict(zip(keys, values))}
+        row['department'] = row['department'] or ''
+        row['selected_at'] = row['selected_at'].isoformat()
+        yield row
+
+
+def lock_prizes(prize_ids: List[int]) -> Dict[int, Prize]:
+    """
+    ล็อกแถว Prize (SELECT ... FOR UPDATE) เพื่อให้การจับรางวัลเดียวกันทำทีละคำขอ
+    ต้องเรียกใน transaction.atomic() และควรเป็น query แรกของ transaction
+    (MySQL REPEATABLE READ จะสร้าง snapshot หลังได้ล็อก จึงเห็นผู้ชนะที่เพิ่งบันทึกโดยคำขอก่อนหน้า)
+    ล็อกเรียงตาม id เสมอเพื่อกัน deadlock ระหว่าง draw-round กับการจับทีละรางวัล
+    """
+    return {
+        prize.id: prize
+        for prize in Prize.objects.select_for_update().select_related(
+            'raffle_event', 'raffle_event__event'
+        ).filter(id__in=prize_ids).order_by('id')
+    }
+
+
+def get_idempotency_key(request) -> Optional[str]:
+    """
+    Idempotency-Key header (หรือ idempotency_key ใน body) นำหน้าด้วย org และผู้ใช้
+    ผู้ใช้สองคนที่ส่ง key เดียวกันจึงไม่ได้ผลลัพธ์ของกันและกัน
+    """
+    key = request.META.get(IDEMPOTENCY_HEADER) or request.data.get('idempotency_key')
+    if not key:
+        return None
+    key = str(key).strip()[:200]
+    if not key:
+        return None
+    user = getattr(request, 'user', None)
+    user_id = user.id if user is not None and user.is_authenticated else 'anonymous'
+    return f"{getattr(request, 'org_id', None) or '-'}:{user_id}:{key}"
+
+
+def _idempotency_cache_key(scope: str, key: str) -> str:
+    return f'raffle_idempotency:{scope}:{key}'
+
+
+def get_stored_response(scope: str, key: Optional[str]) -> Optional[Dict[str, Any]]:
+    """ผลลัพธ์ที่บันทึกไว้ของคำขอเดิม (อ่าน cache ครั้งเดียว) หรือ None"""
+    if not key:
+        return None
+    try:
+        return cache.get(_idempotency_cache_key(scope, key))
+    except Exception as e:
+        logger.warning(f'Idempotency cache read failed: {e}')
+        return None
+
+
+def store_response(scope: str, key: Optional[str], data: Dict[str, Any]) -> None:
+    """เก็บผลลัพธ์ที่สำเร็จไว้ตอบคำขอซ้ำ (เรียกภายในล็อก ก่อน transaction commit)"""
+    if not key:
+        return
+    try:
+        cache.set(_idempotency_cache_key(scope, key), data, IDEMPOTENCY_TTL)
+    except Exception as e:
+        logger.warning(f'Idempotency cache write failed: {e}')
+
+
+def discard_response(scope: str, key: Optional[str]) -> None:
+    if not key:
+        return
+    try:
+        cache.delete(_idempotency_cache_key(scope, key))
+    except Exception as e:
+        logger.warning(f'Idempotency cache delete failed: {e}')
+
+
+def locked_draw(
+    prize_ids: List[int],
+    scope: str,
+    idempotency_key: Optional[str],
+    draw: Callable[[Dict[int, Prize]], Dict[str, Any]]
+) -> Dict[str, Any]:
+    """
+    รัน draw(prizes) ภายใต้ล็อกของรางวัลใน transaction เดียว พร้อม idempotency key
+
+    - คำขอซ้ำที่มีผลลัพธ์แล้ว: อ่าน cache ครั้งเดียว ไม่ต้องจับใหม่
+    - คำขอซ้ำที่มาพร้อมกัน: รอล็อก แล้วได้ผลลัพธ์ของคำขอแรก
+    - เก็บเฉพาะผลลัพธ์ที่ success เป็นจริง (คำขอที่ล้มเหลวลองใหม่ได้)
+
+    Returns: {'data': dict, 'replayed': bool}
+    """
+    stored = get_stored_response(scope, idempotency_key)
+    if stored is not None:
+        return {'data': stored, 'replayed': True}
+
+    try:
+        with transaction.atomic():
+            prizes = lock_prizes(prize_ids)
+            # A request with the same key may have finished while we waited for the lock
+            stored = get_stored_response(scope, idempotency_key)
+            if stored is not None:
+                return {'data': stored, 'replayed': True}
+
+            data = draw(prizes)
+            if data.get('success'):
+                store_response(scope, idempotency_key, data)
+    except Exception:
+        discard_response(scope, idempotency_key)
+        raise
+
+    return {'data': data, 'replayed': False}
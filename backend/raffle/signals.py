@@ -0,0 +1,46 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from core.models import Department
+from teams.models import Participant, TeamMember
+from .eligibility_index import invalidate_event
+from . import eligibility_index
+from .models import RaffleEvent
+from . import winners_feed
+
+
+# Signal เพื่อทิ้งดัชนีผู้มีสิทธิ์ใน Redis เมื่อรายชื่อ/หน่วยงาน/ทีมเปลี่ยน
+# (การเปิด/ปิดสิทธิ์และการบันทึกผู้ชนะ sync ดัชนีเองโดยตรง)
+@receiver(post_save, sender=Participant)
+def invalidate_index_on_participant_save(sender, instance, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) == {'is_raffle_eligible'}:
+        return
+    invalidate_event(instance.event_id)
+    bump_winners_feed(instance.event_id)
+
+
+@receiver(post_delete, sender=Participant)
+def invalidate_index_on_participant_delete(sender, instance, **kwargs):
+    invalidate_event(instance.event_id)
+    bump_winners_feed(instance.event_id)
+
+
+@receiver(post_save, sender=TeamMember)
+@receiver(post_delete, sender=TeamMember)
+def invalidate_index_on_team_member_change(sender, instance, **kwargs):
+    invalidate_event(instance.event_id)
+
+
+@receiver(post_save, sender=Department)
+@receiver(post_delete, sender=Department)
+def bump_winners_feed_on_department_change(sender, instance, **kwargs):
+    """ชื่อหน่วยงานแสดงในรายชื่อผู้ชนะ หน้าพิมพ์ และรายชื่อสำหรับแอนิเมชัน"""
+    raffle_event_ids = list(RaffleEvent.objects.filter(org_id=instance.org_id).values_list('id', flat=True))
+    for raffle_event_id in raffle_event_ids:
+        winners_feed.bump_version(raffle_event_id)
+    eligibility_index.bump_version(raffle_event_ids)
+
+
+def bump_winners_feed(event_id):
+    """ชื่อ/หน่วยงานของผู้เข้าร่วมแสดงในรายชื่อผู้ชนะสาธารณะ"""
+    for raffle_event_id in RaffleEvent.objects.filter(event_id=event_id).values_list('id', flat=True):
+        winners_feed.bump_version(raffle_event_id)
@@ -0,0 +1,305 @@
+import random
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from core.models import Organization, Event, Department
+from teams.models import Participant
+from .algorithms import RaffleSampler, RaffleSelector, RoundSelector, StratifiedSampler, WeightedSampler, create_draw_plan, parse_weight
+from .eligibility import EligibilityQueryBuilder
+from .models import RaffleEvent, Prize, RaffleParticipant, RaffleEligibleParticipant, RaffleDrawPlan
+
+
+class RaffleFixtureMixin:
+    """หน่วยงาน, กิจกรรม, ผู้เข้าร่วม 40 คนใน 4 หน่วยงาน (คนที่ 0, 10, 20, 30 ไม่มีหน่วยงาน) และการจับสลาก 1 รายการ"""
+
+    participant_count = 40
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        cls.org = Organization.objects.create(name='โรงพยาบาลทดสอบ', code='test')
+        cls.event = Event.objects.create(org=cls.org, name='กีฬาสี', start_date=now, end_date=now)
+        cls.departments = [
+            Department.objects.create(org=cls.org, name=f'หน่วยงาน {i}', code=f'd{i}') for i in range(4)
+        ]
+        cls.participants = [
+            Participant.objects.create(
+                org=cls.org,
+                event=cls.event,
+                name=f'ผู้เข้าร่วม {i:02d}',
+                department=cls.departments[i % 4] if i % 10 else None,
+            )
+            for i in range(cls.participant_count)
+        ]
+        cls.raffle_event = RaffleEvent.objects.create(org=cls.org, event=cls.event, name='จับสลาก')
+        cls.prizes = [
+            Prize.objects.create(raffle_event=cls.raffle_event, round_number=1, name=f'รางวัล {i}', quantity=5)
+            for i in range(3)
+        ]
+
+    def eligible_ids(self, rules=None):
+        return set(EligibilityQueryBuilder(self.raffle_event, rules or {}).ids())
+
+
+class EligibilityQueryBuilderTests(RaffleFixtureMixin, TestCase):
+
+    def test_excludes_ineligible_and_opted_out(self):
+        disabled, opted_out = self.participants[1], self.participants[2]
+        Participant.objects.filter(id=disabled.id).update(is_raffle_eligible=False)
+        RaffleEligibleParticipant.objects.create(
+            raffle_event=self.raffle_event, participant=opted_out, is_opted_out=True
+        )
+
+        eligible = self.eligible_ids()
+
+        self.assertNotIn(disabled.id, eligible)
+        self.assertNotIn(opted_out.id, eligible)
+        self.assertEqual(len(eligible), self.participant_count - 2)
+
+    def test_previous_winners_only_excluded_when_rules_ask(self):
+        winner = self.participants[3]
+        RaffleParticipant.objects.create(prize=self.prizes[0], participant=winner)
+
+        self.assertIn(winner.id, self.eligible_ids())
+        self.assertNotIn(winner.id, self.eligible_ids({'no_repeat_prize': True}))
+
+    def test_no_duplicate_department_keeps_participants_without_department(self):
+        winner = self.participants[1]
+        RaffleParticipant.objects.create(prize=self.prizes[0], participant=winner)
+
+        eligible = self.eligible_ids({'no_duplicate_department': True})
+
+        self.assertFalse(
+            Participant.objects.filter(id__in=eligible, department_id=winner.department_id).exists()
+        )
+        self.assertIn(self.participants[0].id, eligible)
+
+    def test_filter_entries_matches_queryset(self):
+        RaffleParticipant.objects.create(prize=self.prizes[0], participant=self.participants[5])
+        rules = {
+            'no_repeat_prize': True,
+            'filter_by_department': True,
+            'department_ids': [self.departments[1].id],
+        }
+        builder = EligibilityQueryBuilder(self.raffle_event, rules)
+        entries = [[p.id, p.department_id, None] for p in self.participants]
+
+        in_memory = builder.filter_entries(entries, builder.selected_rows(), prize_id=self.prizes[1].id)
+
+        self.assertEqual(set(in_memory), set(builder.ids()))
+
+
+class RaffleSamplerTests(RaffleFixtureMixin, TestCase):
+
+    def sample(self, seed, quantity=5, rules=None, **overrides):
+        sampler = RaffleSampler(EligibilityQueryBuilder(self.raffle_event, rules or {}).ordered_ids(), seed)
+        for name, value in overrides.items():
+            setattr(sampler, name, value)
+        return sampler.sample(quantity)
+
+    def test_same_seed_same_winners(self):
+        first = self.sample('seed-1')
+        self.assertTrue(first['success'])
+        self.assertEqual(first['ids'], self.sample('seed-1')['ids'])
+        self.assertNotEqual(first['ids'], self.sample('seed-2')['ids'])
+
+    def test_matches_random_sample_over_the_ordered_pool(self):
+        pool = EligibilityQueryBuilder(self.raffle_event, {}).ids()
+        self.assertEqual(self.sample('audit')['ids'], random.Random('audit').sample(pool, 5))
+
+    def test_offset_and_full_fetch_draw_the_same_ids(self):
+        full = self.sample('seed', quantity=3)
+        offset = self.sample('seed', quantity=3, MIN_POOL_FOR_OFFSET=0, MAX_OFFSET_RATIO=1)
+        self.assertEqual(full['ids'], offset['ids'])
+
+    def test_no_duplicates_and_exclusions_respected(self):
+        winner = self.participants[0]
+        RaffleParticipant.objects.create(prize=self.prizes[0], participant=winner)
+        RaffleEligibleParticipant.objects.create(
+            raffle_event=self.raffle_event, participant=self.participants[1], is_opted_out=True
+        )
+
+        result = self.sample('seed', quantity=self.participant_count - 2, rules={'no_repeat_prize': True})
+
+        self.assertTrue(result['success'])
+        self.assertEqual(len(result['ids']), len(set(result['ids'])))
+        self.assertNotIn(winner.id, result['ids'])
+        self.assertNotIn(self.participants[1].id, result['ids'])
+
+    def test_not_enough_participants(self):
+        result = self.sample('seed', quantity=self.participant_count + 1)
+        self.assertFalse(result['success'])
+        self.assertEqual(result['pool_size'], self.participant_count)
+
+
+class DrawPlanTests(RaffleFixtureMixin, TestCase):
+
+    def setUp(self):
+        self.plan = create_draw_plan(self.raffle_event, seed='plan-seed')
+
+    def test_draws_follow_the_plan_order(self):
+        result = RaffleSelector(self.prizes[0], {}).select(3)
+
+        self.assertTrue(result['success'])
+        self.assertEqual(result['seed'], 'plan-seed')
+        self.assertEqual([p.id for p in result['winners']], [entry[0] for entry in self.plan.entries[:3]])
+        self.assertEqual(result['result']['sampling_mode'], 'draw_plan')
+
+    def test_same_seed_same_plan(self):
+        again = create_draw_plan(self.raffle_event, seed='plan-seed')
+        self.assertEqual(again.permutation_hash, self.plan.permutation_hash)
+        self.assertEqual(RaffleDrawPlan.objects.count(), 1)
+
+    def test_participant_added_after_the_plan_makes_it_stale(self):
+        # Participant signals bump the eligibility version on commit
+        with self.captureOnCommitCallbacks(execute=True):
+            Participant.objects.create(org=self.org, event=self.event, name='มาสาย')
+
+        result = RaffleSelector(self.prizes[0], {}).select(3)
+
+        self.assertFalse(result['success'])
+        self.assertTrue(result['draw_plan_stale'])
+        self.assertEqual(result['missing_count'], 1)
+
+    def test_version_change_without_new_participants_keeps_the_plan(self):
+        planned_version = self.plan.eligibility_version
+        with self.captureOnCommitCallbacks(execute=True):
+            Participant.objects.filter(id=self.participants[0].id).update(is_raffle_eligible=False)
+            Participant.objects.get(id=self.participants[1].id).save()
+
+        result = RaffleSelector(self.prizes[0], {}).select(3)
+
+        self.assertTrue(result['success'])
+        self.assertNotIn(self.participants[0].id, [p.id for p in result['winners']])
+        self.assertEqual(result['result']['eligible_count'], self.participant_count - 1)
+        # The plan was checked against the new version and keeps it, so the next draw skips the check
+        self.plan.refresh_from_db()
+        self.assertNotEqual(self.plan.eligibility_version, planned_version)
+
+
+    def test_round_draw_uses_current_departments_not_the_plan_snapshot(self):
+        department, other = self.departments[0].id, self.departments[1].id
+        Prize.objects.filter(id=self.prizes[0].id).update(
+            rules={'filter_by_department': True, 'department_ids': [department]}
+        )
+        # Moved out of the prize's department after the plan recorded it there
+        mover = next(entry[0] for entry in self.plan.entries if entry[1] == department)
+        with self.captureOnCommitCallbacks(execute=True):
+            Participant.objects.filter(id=mover).update(department_id=other)
+
+        result = RoundSelector(self.raffle_event, 1).select()
+
+        self.assertTrue(result['success'])
+        draw = next(draw for draw in result['draws'] if draw['prize'].id == self.prizes[0].id)
+        winner_ids = [p.id for p in draw['winners']]
+        self.assertNotIn(mover, winner_ids)
+        self.assertEqual(
+            set(Participant.objects.filter(id__in=winner_ids).values_list('department_id', flat=True)),
+            {department}
+        )
+
+class WeightedSamplerTests(SimpleTestCase):
+
+    entries = [(pid, weight) for pid, weight in zip(range(1, 41), [1, 2, 3, 0, 5] * 8)]
+
+    def test_alias_table_reproduces_the_weights(self):
+        weights = [1, 2, 3, 4, 10]
+        prob, alias = WeightedSampler.build_alias_table(weights)
+
+        # Each column i keeps prob[i] for itself and gives the rest to alias[i]
+        mass = [0.0] * len(weights)
+        for i, p in enumerate(prob):
+            mass[i] += p
+            mass[alias[i]] += 1 - p
+        total = sum(weights)
+        for i, weight in enumerate(weights):
+            self.assertAlmostEqual(mass[i] / len(weights), weight / total)
+
+    def test_same_seed_same_winners(self):
+        first = WeightedSampler(self.entries, 'seed-1').sample(10)
+        self.assertEqual(first['ids'], WeightedSampler(self.entries, 'seed-1').sample(10)['ids'])
+        self.assertNotEqual(first['ids'], WeightedSampler(self.entries, 'seed-2').sample(10)['ids'])
+
+    def test_no_duplicates_and_zero_weights_never_drawn(self):
+        positive = [pid for pid, weight in self.entries if weight > 0]
+
+        result = WeightedSampler(self.entries, 'seed').sample(len(positive))
+
+        self.assertTrue(result['success'])
+        self.assertEqual(sorted(result['ids']), positive)
+
+    def test_not_enough_positive_weights(self):
+        result = WeightedSampler(self.entries, 'seed').sample(33)
+        self.assertFalse(result['success'])
+        self.assertEqual(result['pool_size'], 32)
+
+    def test_heavier_participants_win_more_often(self):
+        entries = [(1, 1), (2, 9)]
+        wins = sum(WeightedSampler(entries, f'seed-{i}').sample(1)['ids'] == [2] for i in range(2000))
+        self.assertGreater(wins, 1700)
+        self.assertLess(wins, 1900)
+
+    def test_parse_weight_falls_back_to_default(self):
+        self.assertEqual(parse_weight('2.5', 1), 2.5)
+        for value in (None, 'abc', -1, float('nan'), float('inf')):
+            self.assertEqual(parse_weight(value, 1), 1)
+
+
+class StratifiedSamplerTests(SimpleTestCase):
+
+    # 50 / 30 / 20 participants, plus 7 without a department
+    strata = {
+        1: list(range(100, 150)),
+        2: list(range(200, 230)),
+        3: list(range(300, 320)),
+        None: list(range(900, 907)),
+    }
+
+    def department_of(self, pid):
+        return next(key for key, ids in self.strata.items() if pid in ids)
+
+    def test_proportional_quotas_by_largest_remainder(self):
+        sampler = StratifiedSampler(self.strata, {'stratify': 'proportional'}, 'seed')
+
+        result = sampler.sample(10)
+
+        # Exact shares 4.67 / 2.80 / 1.87 / 0.65: floors 4 + 2 + 1 + 0, then +1 for the three
+        # largest remainders (0.87, 0.80, 0.67), so the 7 without a department get none
+        self.assertTrue(result['success'])
+        self.assertEqual(sampler.allocation, {None: 0, 1: 5, 2: 3, 3: 2})
+        for key, quota in sampler.allocation.items():
+            self.assertEqual(sum(1 for pid in result['ids'] if self.department_of(pid) == key), quota)
+
+    def test_quotas_always_add_up_and_stay_within_one_of_the_exact_share(self):
+        pool_size = sum(len(ids) for ids in self.strata.values())
+        for quantity in range(1, pool_size + 1):
+            sampler = StratifiedSampler(self.strata, {'stratify': 'proportional'}, 'seed')
+            sampler.sample(quantity)
+            self.assertEqual(sum(sampler.allocation.values()), quantity)
+            for key, ids in self.strata.items():
+                self.assertLess(abs(sampler.allocation[key] - quantity * len(ids) / pool_size), 1)
+
+    def test_cap_per_department(self):
+        sampler = StratifiedSampler(self.strata, {'stratify': 'max_per_department', 'max_per_department': 2}, 'seed')
+
+        result = sampler.sample(8)
+
+        self.assertTrue(result['success'])
+        self.assertTrue(all(quota <= 2 for quota in sampler.allocation.values()))
+        self.assertFalse(sampler.sample(9)['success'])
+
+    def test_proportional_with_cap_moves_the_rest_to_other_departments(self):
+        sampler = StratifiedSampler(self.strata, {'stratify': 'proportional', 'max_per_department': 3}, 'seed')
+        sampler.sample(12)
+        self.assertEqual(sampler.allocation, {None: 3, 1: 3, 2: 3, 3: 3})
+
+    def test_same_seed_same_winners_without_duplicates(self):
+        rules = {'stratify': 'proportional'}
+        first = StratifiedSampler(self.strata, rules, 'seed-1').sample(30)['ids']
+
+        self.assertEqual(first, StratifiedSampler(self.strata, rules, 'seed-1').sample(30)['ids'])
+        self.assertNotEqual(first, StratifiedSampler(self.strata, rules, 'seed-2').sample(30)['ids'])
+        self.assertEqual(len(first), len(set(first)))
+
+    def test_group_rows_by_department(self):
+        rows = [(None, 1), (None, 2), (5, 3), (7, 4), (7, 5)]
+        self.assertEqual(StratifiedSampler.group(rows), {None: [1, 2], 5: [3], 7: [4, 5]})
@@ -15,6 +15,8 @@ Available endpoints:
    - GET    /api/raffle/events/{id}/               - Get raffle event detail
    - PUT    /api/raffle/events/{id}/               - Update raffle event
    - DELETE /api/raffle/events/{id}/               - Delete raffle event
+   - GET/POST/DELETE /api/raffle/events/{id}/draw-plan/ - Precomputed draw order (seed + permutation hash)
+   - POST   /api/raffle/events/{id}/draw-round/     - Draw every prize in a round ({round_number}) or the whole event
 
 2. Prizes (PrizeViewSet)
    - GET    /api/raffle/prizes/                     - List all prizes
@@ -34,7 +36,7 @@ Available endpoints:
    - GET    /api/raffle/events/{id}/list-eligible-participants/
             List all eligible participants for a raffle event
             Returns: {success: true, count: number, results: Participant[]}
-            Note: Uses Participant model directly with is_raffle_eligible field
+            Note: Participant.is_raffle_eligible minus RaffleEligibleParticipant opt-outs of this raffle
 
 5. Logs (RaffleLogViewSet)
    - GET    /api/raffle/logs/                       - List all raffle logs
@@ -1,21 +1,30 @@
 from rest_framework import viewsets, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 from django_filters.rest_framework import DjangoFilterBackend
-from django.http import HttpResponse
 from django.conf import settings
+from django.db import transaction
 from django.template.loader import render_to_string
 from datetime import datetime
 from pathlib import Path
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment
-from .models import RaffleEvent, Prize, RaffleParticipant, RaffleLog
+from .models import RaffleEvent, Prize, RaffleParticipant, RaffleLog, RaffleDrawPlan
 from .serializers import (
     RaffleEventSerializer, PrizeSerializer, RaffleParticipantSerializer, RaffleLogSerializer
 )
-from .algorithms import RaffleSelector
+from .algorithms import RaffleSelector, RoundSelector, create_draw_plan, check_draw_plan, DrawPlanStale
+from .services import (
+    commit_winners, commit_draws, locked_draw, get_idempotency_key,
+    report_rows, REPORT_FIELDS, reset_winners, sample_candidate_names
+)
+from .eligibility_index import invalidate_raffle_event
+from . import winners_feed, broadcast
 from core.permissions import IsOrgAdminOrReadOnly, IsStaffOrReadOnly, IsRaffleOperator
-from core.utils import create_audit_log, ImportProcessor
+from core.utils import create_audit_log, create_audit_logs, ImportProcessor
+from core.render_cache import PrintSheetCache
+from core.exports import (
+    ExcelExporter, XlsxFormatRenderer, CsvFormatRenderer, NdjsonFormatRenderer, stream_csv, stream_ndjson
+)
 from core.models import Organization, Event, Department
 from teams.models import Participant
 from rest_framework.permissions import IsAuthenticated
@@ -24,6 +33,10 @@ import pandas as pd
 import io
 
 
+ELIGIBLE_PAGE_SIZE = 1000
+ELIGIBLE_PAGE_SIZE_MAX = 5000
+
+
 class RaffleEventViewSet(viewsets.ModelViewSet):
     serializer_class = RaffleEventSerializer
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
@@ -123,6 +136,8 @@ class RaffleEventViewSet(viewsets.ModelViewSet):
             changes['description'] = {'old': old_raffle.description, 'new': raffle_event.description}
         if old_raffle.event_id != raffle_event.event_id:
             changes['event_id'] = {'old': old_raffle.event_id, 'new': raffle_event.event_id}
+        # Raffle name is shown on the printable winners sheet
+        winners_feed.bump_version(raffle_event.id)
         
         create_audit_log(
             user=self.request.user,
@@ -160,13 +175,17 @@ class RaffleEventViewSet(viewsets.ModelViewSet):
         
         # Delete the object
         self.perform_destroy(raffle_event)
+        winners_feed.bump_version(raffle_event.id)
         return Response(status=status.HTTP_204_NO_CONTENT)
     
     @action(detail=True, methods=['get'], url_path='list-eligible-participants')
     def list_eligible_participants(self, request, pk=None):
         """
         List all eligible participants for this raffle event.
-        Returns all participants in the event who have is_raffle_eligible=True.
+        Returns participants in the event who have is_raffle_eligible=True
+        and are not opted out of this raffle event (e.g. already won here).
+        
+        ?mode=columnar returns keyset-paginated column arrays instead (see _list_eligible_columnar)
         """
         # #region agent log
         import json
@@ -184,11 +203,18 @@ class RaffleEventViewSet(viewsets.ModelViewSet):
         # #endregion
         event = raffle_event.event
         
-        # Get all participants in the event who are eligible
-        participants = Participant.objects.filter(
+        # Get all participants in the event who are eligible for this raffle
+        eligible = Participant.objects.filter(
             event_id=event.id,
             is_raffle_eligible=True
-        ).select_related('department', 'org').prefetch_related('team_memberships__team')
+        ).exclude(
+            id__in=raffle_event.eligible_participants.filter(is_opted_out=True).values('participant_id')
+        )
+        
+        if request.query_params.get('mode') == 'columnar':
+            return self._list_eligible_columnar(request, eligible)
+        
+        participants = eligible.select_related('department', 'org').prefetch_related('team_memberships__team')
         
         # Serialize participants
         from teams.serializers import ParticipantSerializer
@@ -200,6 +226,60 @@ class RaffleEventViewSet(viewsets.ModelViewSet):
             'results': serializer.data
         })
     
+    def _list_eligible_columnar(self, request, eligible):
+        """
+        Column-oriented page of eligible participants, ordered by id
+        Params: after (last id of the previous page), limit (default 1000, max 5000)
+        Returns ids / names / department_ids arrays, a departments {id: name} table for this page,
+        next_after (None on the last page) and count (first page only)
+        """
+        try:
+            after = int(request.query_params.get('after', 0))
+            limit = int(request.query_params.get('limit', ELIGIBLE_PAGE_SIZE))
+        except (TypeError, ValueError):
+            return Response(
+                {'error': 'after and limit must be integers'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        limit = max(1, min(limit, ELIGIBLE_PAGE_SIZE_MAX))
+        
+        rows = list(
+            eligible.filter(id__gt=after).order_by('id').values_list(
+                'id', 'name', 'department_id', 'department__name'
+            )[:limit + 1]
+        )
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        
+        data = {
+            'success': True,
+            'ids': [row[0] for row in rows],
+            'names': [row[1] for row in rows],
+            'department_ids': [row[2] for row in rows],
+            'departments': {row[2]: row[3] for row in rows if row[2] is not None},
+            'next_after': rows[-1][0] if has_more else None,
+        }
+        if not after:
+            data['count'] = eligible.count()
+        return Response(data)
+    
+    @action(detail=True, methods=['get'], url_path='candidate-names')
+    def candidate_names(self, request, pk=None):
+        """
+        Random sample of eligible display names for the spin animation (?size=, default 100, max 500)
+        Cached per raffle event and eligibility version; candidates are [name, department] pairs
+        """
+        raffle_event = self.get_object()
+        try:
+            size = int(request.query_params.get('size', 100))
+        except (TypeError, ValueError):
+            return Response(
+                {'error': 'size must be an integer'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        return Response(sample_candidate_names(raffle_event, size))
+    
     @action(detail=True, methods=['post'], url_path='reset-all-prizes')
     def reset_all_prizes(self, request, pk=None):
         """Reset all prizes in this raffle event"""
@@ -212,53 +292,217 @@ class RaffleEventViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Get all prizes for this raffle event
-        prizes = raffle_event.prizes.all()
-        total_deleted = 0
-        prize_details = []
-        all_participant_ids = set()
-        
-        # Delete all RaffleParticipant records for all prizes and collect participant IDs
-        for prize in prizes:
-            deleted_count = prize.selected_participants.count()
-            if deleted_count > 0:
-                participant_ids = list(prize.selected_participants.values_list('participant_id', flat=True))
-                all_participant_ids.update(participant_ids)
-                prize.selected_participants.all().delete()
-                total_deleted += deleted_count
-                prize_details.append({
-                    'prize_id': prize.id,
-                    'prize_name': prize.name,
-                    'deleted_count': deleted_count
-                })
+        with transaction.atomic():
+            # Delete all winners of this raffle event and restore their eligibility in this raffle only
+            reset = reset_winners(raffle_event)
+            total_deleted = reset['deleted_count']
+            prize_details = reset['prizes']
+            winners_feed.bump_version(raffle_event.id)
+            broadcast.publish(raffle_event.id, {'type': 'winners_reset', 'raffle_event_id': raffle_event.id})
+            
+            # Create audit log: one row per deleted winner plus the summary
+            create_audit_logs(
+                user=request.user,
+                org=raffle_event.org,
+                action='delete',
+                model='RaffleParticipant',
+                entries=[
+                    (winner_id, {'participant_id': participant_id, 'prize_id': prize_id, 'reason': reason})
+                    for winner_id, participant_id, prize_id in reset['winners']
+                ],
+                summary={
+                    'raffle_event_id': raffle_event.id,
+                    'raffle_event_name': raffle_event.name,
+                    'total_deleted_count': total_deleted,
+                    'prizes': prize_details,
+                    'reason': reason,
+                    'reset_all': True
+                },
+                request=request
+            )
         
-        # Restore raffle eligibility for all participants who won any prize in this raffle event
-        if all_participant_ids:
-            Participant.objects.filter(id__in=all_participant_ids).update(is_raffle_eligible=True)
+        return Response({
+            'success': True,
+            'message': f'Reset {total_deleted} winner(s) across {len(prize_details)} prize(s)',
+            'total_deleted_count': total_deleted,
+            'prizes_affected': len(prize_details)
+        })
+    
+    @action(detail=True, methods=['post'], url_path='draw-round')
+    def draw_round(self, request, pk=None):
+        """
+        Draw every prize in a round (or the whole raffle event if round_number is omitted) in one pass.
+        Each prize draws its remaining quantity; all winners are saved in one transaction.
+        """
+        raffle_event = self.get_object()
+        round_number = request.data.get('round_number')
+        
+        if round_number is not None:
+            try:
+                round_number = int(round_number)
+            except (ValueError, TypeError):
+                return Response(
+                    {'error': 'round_number must be an integer'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        
+        prize_ids = raffle_event.prizes.all()
+        if round_number is not None:
+            prize_ids = prize_ids.filter(round_number=round_number)
+        prize_ids = list(prize_ids.values_list('id', flat=True))
+        
+        def run_draw(prizes):
+            result = RoundSelector(raffle_event, round_number).select()
+            if not result['success']:
+                return result
+            
+            draws = result['draws']
+            if not draws:
+                return {
+                    'success': True,
+                    'round_number': round_number,
+                    'created_count': 0,
+                    'prizes': []
+                }
+            
+            commit = commit_draws(
+                raffle_event,
+                [
+                    {
+                        'prize': draw['prize'],
+                        'participant_ids': [p.id for p in draw['winners']],
+                        'seed': draw['seed'],
+                        'rule_snapshot': draw['rule_snapshot'],
+                        'result': draw['result']
+                    }
+                    for draw in draws
+                ],
+                audit_changes={
+                    'raffle_event_id': raffle_event.id,
+                    'round_number': round_number,
+                    'prize_ids': [draw['prize'].id for draw in draws],
+                    'draw_round': True
+                },
+                user=request.user,
+                request=request
+            )
+            
+            return {
+                'success': True,
+                'round_number': round_number,
+                'created_count': commit['created_count'],
+                'prizes': [
+                    {
+                        'prize_id': draw['prize'].id,
+                        'prize_name': draw['prize'].name,
+                        'round_number': draw['prize'].round_number,
+                        'seed': draw['seed'],
+                        'winners': [
+                            {
+                                'id': p.id,
+                                'name': p.name,
+                                'department': p.department.name if p.department else None
+                            }
+                            for p in draw['winners']
+                        ]
+                    }
+                    for draw in draws
+                ]
+            }
+        
+        # Lock every prize of the round so single-prize draws cannot interleave
+        outcome = locked_draw(
+            prize_ids,
+            f'raffle_event:{raffle_event.id}:draw-round:{round_number}',
+            get_idempotency_key(request),
+            run_draw
+        )
+        data = outcome['data']
+        if outcome['replayed']:
+            return Response(data, headers={'Idempotent-Replayed': 'true'})
+        if not data['success']:
+            return Response(data, status=status.HTTP_400_BAD_REQUEST)
+        if not data['prizes']:
+            return Response(data)
+        
+        # Broadcast one aggregated message for the whole round
+        broadcast.publish(
+            raffle_event.id,
+            {
+                'type': 'round_result',
+                'round_number': round_number,
+                'results': data['prizes']
+            }
+        )
+        
+        return Response(data)
+    
+    @action(detail=True, methods=['get', 'post', 'delete'], url_path='draw-plan')
+    def draw_plan(self, request, pk=None):
+        """
+        Precomputed draw order for this raffle event
+        GET: plan info, POST: create/regenerate (optional seed), DELETE: remove (back to per-draw sampling)
+        """
+        raffle_event = self.get_object()
+        
+        if request.method == 'GET':
+            plan = RaffleDrawPlan.objects.filter(raffle_event=raffle_event).first()
+            if not plan:
+                return Response({'success': True, 'draw_plan': None})
+            # Participants added or re-enabled after the plan was built make it stale
+            try:
+                check_draw_plan(plan)
+                missing_count = 0
+            except DrawPlanStale as e:
+                missing_count = e.missing_count
+            return Response({
+                'success': True,
+                'draw_plan': {
+                    'seed': plan.seed,
+                    'permutation_hash': plan.permutation_hash,
+                    'pool_size': plan.pool_size,
+                    'created_at': plan.created_at.isoformat(),
+                    'is_stale': bool(missing_count),
+                    'missing_count': missing_count,
+                }
+            })
+        
+        if request.method == 'DELETE':
+            deleted_count, _ = RaffleDrawPlan.objects.filter(raffle_event=raffle_event).delete()
+            create_audit_log(
+                user=request.user,
+                org=raffle_event.org,
+                action='delete',
+                model='RaffleDrawPlan',
+                changes={'raffle_event_id': raffle_event.id},
+                request=request
+            )
+            return Response({'success': True, 'deleted': bool(deleted_count)})
         
-        # Create audit log
+        plan = create_draw_plan(raffle_event, seed=request.data.get('seed'))
         create_audit_log(
             user=request.user,
             org=raffle_event.org,
-            action='delete',
-            model='RaffleParticipant',
+            action='create',
+            model='RaffleDrawPlan',
+            object_id=plan.id,
             changes={
                 'raffle_event_id': raffle_event.id,
-                'raffle_event_name': raffle_event.name,
-                'total_deleted_count': total_deleted,
-                'prizes': prize_details,
-                'reason': reason,
-                'reset_all': True
+                'seed': plan.seed,
+                'permutation_hash': plan.permutation_hash,
+                'pool_size': plan.pool_size
             },
             request=request
         )
-        
         return Response({
             'success': True,
-            'message': f'Reset {total_deleted} winner(s) across {len(prize_details)} prize(s)',
-            'total_deleted_count': total_deleted,
-            'prizes_affected': len(prize_details)
-        })
+            'draw_plan': {
+                'seed': plan.seed,
+                'permutation_hash': plan.permutation_hash,
+                'pool_size': plan.pool_size,
+                'created_at': plan.created_at.isoformat(),
+            }
+        }, status=status.HTTP_201_CREATED)
     
     @action(detail=True, methods=['get'], url_path='public-info', permission_classes=[])
     def public_info(self, request, pk=None):
@@ -313,6 +557,10 @@ class PrizeViewSet(viewsets.ModelViewSet):
         old_prize = self.get_object()
         prize = serializer.save()
         prize.refresh_from_db()
+        # Prize name/round are shown in the public winners feed
+        winners_feed.bump_version(prize.raffle_event_id)
+        if old_prize.raffle_event_id != prize.raffle_event_id:
+            winners_feed.bump_version(old_prize.raffle_event_id)
         org = prize.raffle_event.org if prize.raffle_event else None
         
         # Track changes
@@ -359,7 +607,9 @@ class PrizeViewSet(viewsets.ModelViewSet):
         )
         
         # Delete the object
+        raffle_event_id = prize.raffle_event_id
         self.perform_destroy(prize)
+        winners_feed.bump_version(raffle_event_id)
         return Response(status=status.HTTP_204_NO_CONTENT)
     
     @action(detail=True, methods=['post'], url_path='reset')
@@ -374,32 +624,32 @@ class PrizeViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Get count and participant IDs before deletion for audit log
-        deleted_count = prize.selected_participants.count()
-        participant_ids = list(prize.selected_participants.values_list('participant_id', flat=True))
-        
-        # Delete all RaffleParticipant records for this prize
-        prize.selected_participants.all().delete()
-        
-        # Restore raffle eligibility for all participants who won this prize
-        if participant_ids:
-            Participant.objects.filter(id__in=participant_ids).update(is_raffle_eligible=True)
-        
-        # Create audit log
-        create_audit_log(
-            user=request.user,
-            org=prize.raffle_event.org if prize.raffle_event else None,
-            action='delete',
-            model='RaffleParticipant',
-            changes={
-                'prize_id': prize.id,
-                'prize_name': prize.name,
-                'deleted_count': deleted_count,
-                'reason': reason,
-                'reset': True
-            },
-            request=request
-        )
+        with transaction.atomic():
+            # Delete winners of this prize; restore eligibility in this raffle event (unless they still hold another prize here)
+            reset = reset_winners(prize.raffle_event, prize=prize)
+            deleted_count = reset['deleted_count']
+            winners_feed.bump_version(prize.raffle_event_id)
+            broadcast.publish(prize.raffle_event_id, {'type': 'winners_reset', 'raffle_event_id': prize.raffle_event_id})
+            
+            # Create audit log: one row per deleted winner plus the summary
+            create_audit_logs(
+                user=request.user,
+                org=prize.raffle_event.org if prize.raffle_event else None,
+                action='delete',
+                model='RaffleParticipant',
+                entries=[
+                    (winner_id, {'participant_id': participant_id, 'prize_id': prize_id, 'reason': reason})
+                    for winner_id, participant_id, prize_id in reset['winners']
+                ],
+                summary={
+                    'prize_id': prize.id,
+                    'prize_name': prize.name,
+                    'deleted_count': deleted_count,
+                    'reason': reason,
+                    'reset': True
+                },
+                request=request
+            )
         
         return Response({
             'success': True,
@@ -409,106 +659,87 @@ class PrizeViewSet(viewsets.ModelViewSet):
     
     @action(detail=True, methods=['post'], url_path='select')
     def select_winners(self, request, pk=None):
-        """Select winners for this prize"""
+        """
+        Select winners for this prize
+        Draws are serialized per prize; send an Idempotency-Key header so retries return the stored result
+        """
         prize = self.get_object()
-        quantity = request.data.get('quantity', prize.quantity)
+        requested_quantity = request.data.get('quantity', prize.quantity)
         rules = request.data.get('rules', prize.rules)
         
-        # Merge with prize rules and add no_repeat_prize from raffle_event
-        merged_rules = {**prize.rules, **rules}
-        merged_rules['no_repeat_prize'] = prize.raffle_event.no_repeat_prize
-        
-        # Create selector
-        selector = RaffleSelector(prize, merged_rules)
-        
-        # Select winners
-        result = selector.select(quantity=quantity)
-        
-        if not result['success']:
-            return Response(result, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            requested_quantity = int(requested_quantity)
+        except (ValueError, TypeError):
+            return Response(
+                {'error': 'quantity must be an integer'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        # Create RaffleParticipant records and disable eligibility
-        created_count = 0
-        participants_to_disable = []
-        for winner in result['winners']:
-            raffle_participant, created = RaffleParticipant.objects.get_or_create(
-                prize=prize,
-                participant=winner,
-                defaults={'seed_value': result['seed']}
+        def run_draw(prizes):
+            locked_prize = prizes[prize.id]
+            remaining = locked_prize.quantity - locked_prize.selected_participants.count()
+            if remaining <= 0:
+                return {
+                    'success': False,
+                    'error': f'Prize "{locked_prize.name}" already has {locked_prize.quantity} winners'
+                }
+            
+            # Merge with prize rules and add no_repeat_prize from raffle_event
+            merged_rules = {**locked_prize.rules, **rules}
+            merged_rules['no_repeat_prize'] = locked_prize.raffle_event.no_repeat_prize
+            
+            # Select winners (never more than the prize has left)
+            result = RaffleSelector(locked_prize, merged_rules).select(quantity=min(requested_quantity, remaining))
+            if not result['success']:
+                return result
+            
+            # Save winners, opt them out, raffle log and audit log in the same transaction
+            commit = commit_winners(
+                locked_prize,
+                [p.id for p in result['winners']],
+                result['seed'],
+                rule_snapshot=result['rule_snapshot'],
+                result=result['result'],
+                audit_changes={
+                    'prize_id': locked_prize.id,
+                    'seed': result['seed']
+                },
+                user=request.user,
+                request=request
             )
-            if created:
-                created_count += 1
-                # Mark participant for eligibility disable
-                participants_to_disable.append(winner)
-        
-        # Disable raffle eligibility for all participants who won
-        if participants_to_disable:
-            Participant.objects.filter(
-                id__in=[p.id for p in participants_to_disable]
-            ).update(is_raffle_eligible=False)
-        
-        # Create log
-        RaffleLog.objects.create(
-            raffle_event=prize.raffle_event,
-            prize=prize,
-            seed=result['seed'],
-            rule_snapshot=result['rule_snapshot'],
-            result={
-                **result['result'],
-                'selected_participants': [p.id for p in result['winners']]
+            return {
+                'success': True,
+                'winners': [
+                    {
+                        'id': p.id,
+                        'name': p.name,
+                        'department': p.department.name if p.department else None
+                    }
+                    for p in result['winners']
+                ],
+                'seed': result['seed'],
+                'created_count': commit['created_count']
             }
-        )
         
-        # Audit log
-        create_audit_log(
-            user=request.user,
-            org=prize.raffle_event.org,
-            action='create',
-            model='RaffleParticipant',
-            changes={
-                'prize_id': prize.id,
-                'selected_count': created_count,
-                'seed': result['seed']
-            },
-            request=request
-        )
+        outcome = locked_draw([prize.id], f'prize:{prize.id}:select', get_idempotency_key(request), run_draw)
+        data = outcome['data']
+        if outcome['replayed']:
+            return Response(data, headers={'Idempotent-Replayed': 'true'})
+        if not data['success']:
+            return Response(data, status=status.HTTP_400_BAD_REQUEST)
         
         # Broadcast via WebSocket (will be implemented)
-        from channels.layers import get_channel_layer
-        from asgiref.sync import async_to_sync
-        
-        channel_layer = get_channel_layer()
-        if channel_layer:
-            async_to_sync(channel_layer.group_send)(
-                f'raffle_{prize.raffle_event.id}',
-                {
-                    'type': 'raffle_result',
-                    'prize_id': prize.id,
-                    'winners': [
-                        {
-                            'id': p.id,
-                            'name': p.name,
-                            'department': p.department.name if p.department else None
-                        }
-                        for p in result['winners']
-                    ],
-                    'seed': result['seed']
-                }
-            )
+        broadcast.publish(
+            prize.raffle_event.id,
+            {
+                'type': 'raffle_result',
+                'prize_id': prize.id,
+                'winners': data['winners'],
+                'seed': data['seed']
+            }
+        )
         
-        return Response({
-            'success': True,
-            'winners': [
-                {
-                    'id': p.id,
-                    'name': p.name,
-                    'department': p.department.name if p.department else None
-                }
-                for p in result['winners']
-            ],
-            'seed': result['seed'],
-            'created_count': created_count
-        })
+        return Response(data)
     
     @action(detail=True, methods=['post'], url_path='add-participants')
     def add_participants(self, request, pk=None):
@@ -541,57 +772,45 @@ class PrizeViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Create RaffleParticipant records and disable eligibility
-        created_count = 0
-        participants_to_disable = []
         import hashlib
         from datetime import datetime
         seed = hashlib.sha256(f"{datetime.now().isoformat()}_{prize.id}_manual".encode()).hexdigest()
         
-        for participant in participants:
-            raffle_participant, created = RaffleParticipant.objects.get_or_create(
-                prize=prize,
-                participant=participant,
-                defaults={'seed_value': seed}
+        # Save winners, opt them out and audit log under the prize lock
+        participants = list(participants.select_related('department'))
+        
+        def run_draw(prizes):
+            commit = commit_winners(
+                prizes[prize.id],
+                [p.id for p in participants],
+                seed,
+                audit_changes={
+                    'prize_id': prize.id,
+                    'participant_ids': participant_ids,
+                    'manual': True
+                },
+                user=request.user,
+                request=request
             )
-            if created:
-                created_count += 1
-                # Mark participant for eligibility disable
-                participants_to_disable.append(participant)
-        
-        # Disable raffle eligibility for all participants who won
-        if participants_to_disable:
-            Participant.objects.filter(
-                id__in=[p.id for p in participants_to_disable]
-            ).update(is_raffle_eligible=False)
-        
-        # Audit log
-        create_audit_log(
-            user=request.user,
-            org=prize.raffle_event.org,
-            action='create',
-            model='RaffleParticipant',
-            changes={
-                'prize_id': prize.id,
-                'selected_count': created_count,
-                'participant_ids': participant_ids,
-                'manual': True
-            },
-            request=request
-        )
+            return {
+                'success': True,
+                'created_count': commit['created_count'],
+                'participants': [
+                    {
+                        'id': p.id,
+                        'name': p.name,
+                        'department': p.department.name if p.department else None
+                    }
+                    for p in participants
+                ]
+            }
         
-        return Response({
-            'success': True,
-            'created_count': created_count,
-            'participants': [
-                {
-                    'id': p.id,
-                    'name': p.name,
-                    'department': p.department.name if p.department else None
-                }
-                for p in participants
-            ]
-        })
+        outcome = locked_draw(
+            [prize.id], f'prize:{prize.id}:add-participants', get_idempotency_key(request), run_draw
+        )
+        if outcome['replayed']:
+            return Response(outcome['data'], headers={'Idempotent-Replayed': 'true'})
+        return Response(outcome['data'])
     
     @action(detail=False, methods=['get'], url_path='public-list', permission_classes=[])
     def public_list(self, request):
@@ -727,94 +946,96 @@ class PrizeViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Create RaffleParticipant records and disable eligibility
-        created_count = 0
-        participants_to_disable = []
-        for participant in participants:
-            raffle_participant, created = RaffleParticipant.objects.get_or_create(
-                prize=prize,
-                participant=participant,
-                defaults={'seed_value': seed}
+        # Save winners, opt them out and raffle log under the prize lock (no user for public endpoint)
+        participants = list(participants.select_related('department'))
+        participant_ids = [int(pid) for pid in participant_ids]
+        
+        def run_draw(prizes):
+            locked_prize = prizes[prize.id]
+            already_selected = set(
+                locked_prize.selected_participants.values_list('participant_id', flat=True)
             )
-            if created:
-                created_count += 1
-                # Mark participant for eligibility disable
-                participants_to_disable.append(participant)
-        
-        # Disable raffle eligibility for all participants who won
-        if participants_to_disable:
-            Participant.objects.filter(
-                id__in=[p.id for p in participants_to_disable]
-            ).update(is_raffle_eligible=False)
-        
-        # Create log (without user for public endpoint)
-        RaffleLog.objects.create(
-            raffle_event=prize.raffle_event,
-            prize=prize,
-            seed=seed,
-            rule_snapshot=rule_snapshot,
-            result={
-                **result_data,
-                'selected_participants': participant_ids
+            new_count = len(set(participant_ids) - already_selected)
+            if len(already_selected) + new_count > locked_prize.quantity:
+                return {
+                    'success': False,
+                    'error': (
+                        f'Prize "{locked_prize.name}" has {locked_prize.quantity - len(already_selected)} '
+                        f'slots left, cannot save {new_count} winners'
+                    )
+                }
+            
+            commit = commit_winners(
+                locked_prize,
+                participant_ids,
+                seed,
+                rule_snapshot=rule_snapshot,
+                result=result_data
+            )
+            return {
+                'success': True,
+                'created_count': commit['created_count'],
+                'participants': [
+                    {
+                        'id': p.id,
+                        'name': p.name,
+                        'department': p.department.name if p.department else None
+                    }
+                    for p in participants
+                ]
             }
+        
+        outcome = locked_draw(
+            [prize.id], f'prize:{prize.id}:public-save-winners', get_idempotency_key(request), run_draw
         )
+        data = outcome['data']
+        if outcome['replayed']:
+            return Response(data, headers={'Idempotent-Replayed': 'true'})
+        if not data['success']:
+            return Response(data, status=status.HTTP_409_CONFLICT)
         
         # Broadcast via WebSocket
-        from channels.layers import get_channel_layer
-        from asgiref.sync import async_to_sync
         from datetime import datetime
         
-        channel_layer = get_channel_layer()
-        if channel_layer:
-            # Broadcast raffle_result
-            async_to_sync(channel_layer.group_send)(
-                f'raffle_{prize.raffle_event.id}',
-                {
-                    'type': 'raffle_result',
-                    'prize_id': prize.id,
-                    'winners': [
-                        {
-                            'id': p.id,
-                            'name': p.name,
-                            'department': p.department.name if p.department else None
-                        }
-                        for p in participants
-                    ],
-                    'seed': seed
-                }
-            )
-            
-            # Broadcast winners_update for WinnersList
-            async_to_sync(channel_layer.group_send)(
-                f'raffle_{prize.raffle_event.id}',
-                {
-                    'type': 'winners_update',
-                    'raffle_event_id': prize.raffle_event.id,
-                    'winners': [
-                        {
-                            'id': p.id,
-                            'participant_name': p.name,
-                            'participant': p.hospital_id,
-                            'selected_at': datetime.now().isoformat()
-                        }
-                        for p in participants
-                    ],
-                    'timestamp': datetime.now().isoformat()
-                }
-            )
+        outbox = broadcast.Outbox(prize.raffle_event.id)
         
-        return Response({
-            'success': True,
-            'created_count': created_count,
-            'participants': [
-                {
-                    'id': p.id,
-                    'name': p.name,
-                    'department': p.department.name if p.department else None
-                }
-                for p in participants
-            ]
-        })
+        # Broadcast raffle_result
+        outbox.add(
+            {
+                'type': 'raffle_result',
+                'prize_id': prize.id,
+                'winners': [
+                    {
+                        'id': p.id,
+                        'name': p.name,
+                        'department': p.department.name if p.department else None
+                    }
+                    for p in participants
+                ],
+                'seed': seed
+            }
+        )
+        
+        # Broadcast winners_update for WinnersList
+        outbox.add(
+            {
+                'type': 'winners_update',
+                'raffle_event_id': prize.raffle_event.id,
+                'winners': [
+                    {
+                        'id': p.id,
+                        'participant_name': p.name,
+                        'participant': p.hospital_id,
+                        'selected_at': datetime.now().isoformat()
+                    }
+                    for p in participants
+                ],
+                'timestamp': datetime.now().isoformat()
+            }
+        )
+        outbox.send()
+        
+        return Response(data)
 
 
 class RaffleParticipantViewSet(viewsets.ModelViewSet):
@@ -893,26 +1114,27 @@ class RaffleParticipantViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Update print status
+        # Update print status and write all audit rows in one transaction
         from django.utils import timezone
-        updated_count = queryset.update(
-            is_printed=True,
-            printed_at=timezone.now()
-        )
-        
-        # Create audit log
-        for winner in queryset:
-            org = winner.prize.raffle_event.org if winner.prize and winner.prize.raffle_event else None
-            create_audit_log(
+        printed_at = timezone.now()
+        with transaction.atomic():
+            updated_count = queryset.update(
+                is_printed=True,
+                printed_at=printed_at
+            )
+            for raffle_event_id in set(queryset.values_list('prize__raffle_event_id', flat=True)):
+                winners_feed.bump_version(raffle_event_id)
+            
+            # Create audit log (one row per winner, org resolved once)
+            create_audit_logs(
                 user=request.user,
-                org=org,
+                org=Organization.objects.filter(id=org_id).first(),
                 action='update',
                 model='RaffleParticipant',
-                object_id=winner.id,
-                changes={
-                    'is_printed': True,
-                    'printed_at': timezone.now().isoformat()
-                },
+                entries=[
+                    (int(winner_id), {'is_printed': True, 'printed_at': printed_at.isoformat()})
+                    for winner_id in winner_ids
+                ],
                 request=request
             )
         
@@ -950,25 +1172,25 @@ class RaffleParticipantViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Update print status
-        updated_count = queryset.update(
-            is_printed=False,
-            printed_at=None
-        )
-        
-        # Create audit log
-        for winner in queryset:
-            org = winner.prize.raffle_event.org if winner.prize and winner.prize.raffle_event else None
-            create_audit_log(
+        # Update print status and write all audit rows in one transaction
+        with transaction.atomic():
+            updated_count = queryset.update(
+                is_printed=False,
+                printed_at=None
+            )
+            for raffle_event_id in set(queryset.values_list('prize__raffle_event_id', flat=True)):
+                winners_feed.bump_version(raffle_event_id)
+            
+            # Create audit log (one row per winner, org resolved once)
+            create_audit_logs(
                 user=request.user,
-                org=org,
+                org=Organization.objects.filter(id=org_id).first(),
                 action='update',
                 model='RaffleParticipant',
-                object_id=winner.id,
-                changes={
-                    'is_printed': False,
-                    'printed_at': None
-                },
+                entries=[
+                    (int(winner_id), {'is_printed': False, 'printed_at': None})
+                    for winner_id in winner_ids
+                ],
                 request=request
             )
         
@@ -982,6 +1204,9 @@ class RaffleParticipantViewSet(viewsets.ModelViewSet):
         old_participant = self.get_object()
         raffle_participant = serializer.save()
         raffle_participant.refresh_from_db()
+        winners_feed.bump_version(raffle_participant.prize.raffle_event_id)
+        if old_participant.prize.raffle_event_id != raffle_participant.prize.raffle_event_id:
+            winners_feed.bump_version(old_participant.prize.raffle_event_id)
         org = raffle_participant.prize.raffle_event.org if raffle_participant.prize and raffle_participant.prize.raffle_event else None
         
         # Track changes
@@ -1031,12 +1256,19 @@ class RaffleParticipantViewSet(viewsets.ModelViewSet):
         )
         
         # Delete the object
+        raffle_event_id = raffle_participant.prize.raffle_event_id
         self.perform_destroy(raffle_participant)
+        invalidate_raffle_event(raffle_event_id)
+        winners_feed.bump_version(raffle_event_id)
         return Response(status=status.HTTP_204_NO_CONTENT)
     
     @action(detail=False, methods=['get'], url_path='export-pdf')
     def export_winners_pdf(self, request):
-        """Export winners to PDF for printing"""
+        """
+        Export winners to PDF for printing
+        Only row chunks are cached per winners version (shared across page ranges);
+        the page itself is rendered and gzipped on every request
+        """
         org_id = getattr(request, 'org_id', None)
         if not org_id:
             return Response(
@@ -1058,6 +1290,11 @@ class RaffleParticipantViewSet(viewsets.ModelViewSet):
         start_index = request.query_params.get('start_index')
         end_index = request.query_params.get('end_index')
         
+        sheet = PrintSheetCache(
+            request, 'winners', winners_feed.get_version(raffle_event_id),
+            [raffle_event_id, search, prize_id, only_unprinted]
+        )
+        
         # Get queryset (same logic as list, but without pagination)
         queryset = RaffleParticipant.objects.select_related(
             'prize', 'prize__raffle_event', 'participant', 'participant__department'
@@ -1074,13 +1311,11 @@ class RaffleParticipantViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(is_printed=False)
         
         # Order by selected_at descending (newest first = rank 1)
-        queryset = queryset.order_by('-selected_at')
+        queryset = queryset.order_by('-selected_at', '-id')
         
-        # Apply range selection if provided
-        if start_index or end_index:
-            start = int(start_index) - 1 if start_index else 0  # Convert to 0-based index
-            end = int(end_index) if end_index else None  # end_index is inclusive, so use as-is for slicing
-            queryset = queryset[start:end]
+        # Range selection (start_index/end_index are 1-based, inclusive)
+        start = max(int(start_index) - 1, 0) if start_index else 0
+        end = int(end_index) if end_index else None
         
         # Get raffle event and org info
         try:
@@ -1115,33 +1350,36 @@ class RaffleParticipantViewSet(viewsets.ModelViewSet):
             except Prize.DoesNotExist:
                 pass
         
-        # Prepare data for template with rank (ลำดับรางวัล)
-        winners_data = []
-        for rank, winner in enumerate(queryset, start=1):
-            winners_data.append({
-                'rank': rank,  # ลำดับรางวัล (1-based)
-                'id': winner.id,  # Keep ID for reference
-                'participant_name': winner.participant.name if winner.participant else '',
-                'hospital_id': winner.participant.hospital_id if winner.participant and winner.participant.hospital_id else '',
-                'prize_name': winner.prize.name if winner.prize else '',
-                'department': winner.participant.department.name if winner.participant and winner.participant.department else '',
-            })
+        def fetch_rows(offset, limit):
+            return [
+                {
+                    'participant_name': participant_name or '',
+                    'hospital_id': hospital_id if hospital_id else '',
+                    'prize_name': prize_label or '',
+                    'department': department_name or '',
+                }
+                for participant_name, hospital_id, prize_label, department_name in queryset[offset:limit].values_list(
+                    'participant__name', 'participant__hospital_id', 'prize__name', 'participant__department__name'
+                )
+            ]
+        
+        # Rows with rank (ลำดับรางวัล, 1-based within the selected range)
+        rows_html, total_count = sheet.render_rows('raffle/winners_print_rows.html', 'winners', fetch_rows, start, end)
         
         # Render HTML template
         html_content = render_to_string('raffle/winners_print.html', {
-            'winners': winners_data,
+            'rows_html': rows_html,
             'raffle_name': display_name,  # Use display_name to avoid duplication
             'event_name': '',  # Don't show event_name separately
             'org_name': org.name if org else '',
             'search_query': search,
             'prize_filter': prize_name,
             'print_date': datetime.now().strftime('%d/%m/%Y %H:%M:%S'),
-            'total_count': len(winners_data),
+            'total_count': total_count,
         })
         
         # Return HTML response (frontend will handle printing)
-        response = HttpResponse(html_content, content_type='text/html; charset=utf-8')
-        return response
+        return sheet.response(html_content)
     
     @action(detail=False, methods=['get'], url_path='export-excel')
     def export_winners_excel(self, request):
@@ -1191,51 +1429,31 @@ class RaffleParticipantViewSet(viewsets.ModelViewSet):
             end = int(end_index) if end_index else None  # end_index is inclusive, so use as-is for slicing
             queryset = queryset[start:end]
         
-        # Create workbook
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "รายชื่อผู้ได้รับรางวัล"
-        
-        # Set header row
-        headers = ['ลำดับรางวัล', 'ID โรงพยาบาล', 'ชื่อผู้ได้รับรางวัล', 'รางวัล', 'หน่วยงาน', 'ลงชื่อ']
-        for col_idx, header in enumerate(headers, start=1):
-            cell = ws.cell(row=1, column=col_idx, value=header)
-            cell.font = Font(bold=True)
-            cell.fill = PatternFill(start_color="E8E8E8", end_color="E8E8E8", fill_type="solid")
-            cell.alignment = Alignment(horizontal="center", vertical="center")
-        
-        # Write data with rank (ลำดับรางวัล)
-        for rank, winner in enumerate(queryset, start=1):
-            row_idx = rank + 1  # +1 for header row
-            ws.cell(row=row_idx, column=1, value=rank)  # ลำดับรางวัล
-            ws.cell(row=row_idx, column=2, value=winner.participant.hospital_id if winner.participant and winner.participant.hospital_id else '')  # ID โรงพยาบาล
-            ws.cell(row=row_idx, column=3, value=winner.participant.name if winner.participant else '')  # ชื่อผู้ได้รับรางวัล
-            ws.cell(row=row_idx, column=4, value=winner.prize.name if winner.prize else '')  # รางวัล
-            ws.cell(row=row_idx, column=5, value=winner.participant.department.name if winner.participant and winner.participant.department else '')  # หน่วยงาน
-            ws.cell(row=row_idx, column=6, value='')  # ลงชื่อ - ว่างไว้ให้เซ็น
-        
-        # Auto-adjust column widths
-        column_widths = [12, 15, 35, 25, 20, 15]  # ลำดับรางวัล, ID โรงพยาบาล, Name, Prize, Department, ลงชื่อ
-        for col_idx, width in enumerate(column_widths, start=1):
-            ws.column_dimensions[ws.cell(row=1, column=col_idx).column_letter].width = width
-        
-        # Create HTTP response
-        response = HttpResponse(
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        # Stream rows straight from the database into a write-only workbook
+        rows = (
+            (rank, hospital_id or '', name or '', prize_name or '', department_name or '', '')  # ลงชื่อ - ว่างไว้ให้เซ็น
+            for rank, (hospital_id, name, prize_name, department_name) in enumerate(
+                queryset.values_list(
+                    'participant__hospital_id', 'participant__name', 'prize__name', 'participant__department__name'
+                ).iterator(chunk_size=2000),
+                start=1
+            )
+        )
+        exporter = ExcelExporter(
+            ['ลำดับรางวัล', 'ID โรงพยาบาล', 'ชื่อผู้ได้รับรางวัล', 'รางวัล', 'หน่วยงาน', 'ลงชื่อ'],
+            sheet_title="รายชื่อผู้ได้รับรางวัล",
+            column_widths=[12, 15, 35, 25, 20, 15]  # ลำดับรางวัล, ID โรงพยาบาล, Name, Prize, Department, ลงชื่อ
         )
         
-        # Generate filename
         filename = f'winners_{raffle_event_id}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        
-        # Save workbook to response
-        wb.save(response)
-        
-        return response
+        return exporter.response(rows, filename)
     
     @action(detail=False, methods=['get'], url_path='public-list', permission_classes=[])
     def public_list(self, request):
-        """List winners with pagination, filtering, and search (public, no auth required)"""
+        """
+        List winners with pagination, filtering, and search (public, no auth required)
+        Pages are cached per winners version; send If-None-Match to get 304 until winners change
+        """
         from config.pagination import StandardResultsSetPagination
         
         # Get filter parameters
@@ -1243,6 +1461,16 @@ class RaffleParticipantViewSet(viewsets.ModelViewSet):
         prize_id = request.query_params.get('prize')
         search = request.query_params.get('search', '').strip()
         
+        # Polling screens: answer from the versioned cache without touching the database
+        version = winners_feed.get_version(raffle_event_id)
+        etag = winners_feed.etag_for(version, request)
+        cache_headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+        if etag in [tag.strip() for tag in request.headers.get('If-None-Match', '').split(',')]:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=cache_headers)
+        cached = winners_feed.get_page(version, request)
+        if cached is not None:
+            return Response(cached, headers=cache_headers)
+        
         # Build queryset
         queryset = RaffleParticipant.objects.select_related(
             'prize', 'prize__raffle_event', 'participant', 'participant__department'
@@ -1281,14 +1509,17 @@ class RaffleParticipantViewSet(viewsets.ModelViewSet):
         
         if page is not None:
             serializer = self.get_serializer(page, many=True)
-            return paginator.get_paginated_response(serializer.data)
+            data = paginator.get_paginated_response(serializer.data).data
+        else:
+            # If no pagination, return all results
+            serializer = self.get_serializer(queryset, many=True)
+            data = {
+                'count': queryset.count(),
+                'results': serializer.data
+            }
         
-        # If no pagination, return all results
-        serializer = self.get_serializer(queryset, many=True)
-        return Response({
-            'count': queryset.count(),
-            'results': serializer.data
-        })
+        winners_feed.set_page(version, request, data)
+        return Response(data, headers=cache_headers)
 
 
 def get_or_create_participant(org_id, event_id, name, department_id=None, team_id=None):
@@ -1340,49 +1571,45 @@ class RaffleControlViewSet(viewsets.ViewSet):
             )
         
         # Broadcast control action via WebSocket
-        from channels.layers import get_channel_layer
-        from asgiref.sync import async_to_sync
         from datetime import datetime
         
-        channel_layer = get_channel_layer()
-        if channel_layer:
-            # Send spin command
-            async_to_sync(channel_layer.group_send)(
-                f'raffle_{raffle_event_id}',
-                {
-                    'type': 'control_action',
-                    'action': 'spin',
-                    'data': {
-                        'prize_id': prize_id,
-                        'display_count': display_count
-                    },
-                    'timestamp': datetime.now().isoformat()
-                }
-            )
-            # Send play sound command to display device
-            async_to_sync(channel_layer.group_send)(
-                f'raffle_{raffle_event_id}',
-                {
-                    'type': 'control_action',
-                    'action': 'play_sound',
-                    'data': {
-                        'sound_file': 'wheel.mp3'
-                    },
-                    'timestamp': datetime.now().isoformat()
-                }
-            )
-            # Send spin state to disable other devices
-            async_to_sync(channel_layer.group_send)(
-                f'raffle_{raffle_event_id}',
-                {
-                    'type': 'control_action',
-                    'action': 'spin_state',
-                    'data': {
-                        'isSpinning': True
-                    },
-                    'timestamp': datetime.now().isoformat()
-                }
-            )
+        outbox = broadcast.Outbox(raffle_event_id)
+        
+        # Send spin command
+        outbox.add(
+            {
+                'type': 'control_action',
+                'action': 'spin',
+                'data': {
+                    'prize_id': prize_id,
+                    'display_count': display_count
+                },
+                'timestamp': datetime.now().isoformat()
+            }
+        )
+        # Send play sound command to display device
+        outbox.add(
+            {
+                'type': 'control_action',
+                'action': 'play_sound',
+                'data': {
+                    'sound_file': 'wheel.mp3'
+                },
+                'timestamp': datetime.now().isoformat()
+            }
+        )
+        # Send spin state to disable other devices
+        outbox.add(
+            {
+                'type': 'control_action',
+                'action': 'spin_state',
+                'data': {
+                    'isSpinning': True
+                },
+                'timestamp': datetime.now().isoformat()
+            }
+        )
+        outbox.send()
         
         return Response({'success': True, 'message': 'Spin command sent'})
     
@@ -1398,34 +1625,31 @@ class RaffleControlViewSet(viewsets.ViewSet):
             )
         
         # Broadcast control action via WebSocket
-        from channels.layers import get_channel_layer
-        from asgiref.sync import async_to_sync
         from datetime import datetime
         
-        channel_layer = get_channel_layer()
-        if channel_layer:
-            # Send save command
-            async_to_sync(channel_layer.group_send)(
-                f'raffle_{raffle_event_id}',
-                {
-                    'type': 'control_action',
-                    'action': 'save',
-                    'data': {},
-                    'timestamp': datetime.now().isoformat()
-                }
-            )
-            # Send spin state to re-enable other devices
-            async_to_sync(channel_layer.group_send)(
-                f'raffle_{raffle_event_id}',
-                {
-                    'type': 'control_action',
-                    'action': 'spin_state',
-                    'data': {
-                        'isSpinning': False
-                    },
-                    'timestamp': datetime.now().isoformat()
-                }
-            )
+        outbox = broadcast.Outbox(raffle_event_id)
+        
+        # Send save command
+        outbox.add(
+            {
+                'type': 'control_action',
+                'action': 'save',
+                'data': {},
+                'timestamp': datetime.now().isoformat()
+            }
+        )
+        # Send spin state to re-enable other devices
+        outbox.add(
+            {
+                'type': 'control_action',
+                'action': 'spin_state',
+                'data': {
+                    'isSpinning': False
+                },
+                'timestamp': datetime.now().isoformat()
+            }
+        )
+        outbox.send()
         
         return Response({'success': True, 'message': 'Save command sent'})
     
@@ -1442,23 +1666,19 @@ class RaffleControlViewSet(viewsets.ViewSet):
             )
         
         # Broadcast control action via WebSocket
-        from channels.layers import get_channel_layer
-        from asgiref.sync import async_to_sync
         from datetime import datetime
         
-        channel_layer = get_channel_layer()
-        if channel_layer:
-            async_to_sync(channel_layer.group_send)(
-                f'raffle_{raffle_event_id}',
-                {
-                    'type': 'control_action',
-                    'action': 'select_prize',
-                    'data': {
-                        'prize_id': prize_id
-                    },
-                    'timestamp': datetime.now().isoformat()
-                }
-            )
+        broadcast.publish(
+            raffle_event_id,
+            {
+                'type': 'control_action',
+                'action': 'select_prize',
+                'data': {
+                    'prize_id': prize_id
+                },
+                'timestamp': datetime.now().isoformat()
+            }
+        )
         
         return Response({'success': True, 'message': 'Select prize command sent'})
     
@@ -1475,23 +1695,19 @@ class RaffleControlViewSet(viewsets.ViewSet):
             )
         
         # Broadcast control action via WebSocket
-        from channels.layers import get_channel_layer
-        from asgiref.sync import async_to_sync
         from datetime import datetime
         
-        channel_layer = get_channel_layer()
-        if channel_layer:
-            async_to_sync(channel_layer.group_send)(
-                f'raffle_{raffle_event_id}',
-                {
-                    'type': 'control_action',
-                    'action': 'set_display_count',
-                    'data': {
-                        'display_count': display_count
-                    },
-                    'timestamp': datetime.now().isoformat()
-                }
-            )
+        broadcast.publish(
+            raffle_event_id,
+            {
+                'type': 'control_action',
+                'action': 'set_display_count',
+                'data': {
+                    'display_count': display_count
+                },
+                'timestamp': datetime.now().isoformat()
+            }
+        )
         
         return Response({'success': True, 'message': 'Set display count command sent'})
     
@@ -1533,9 +1749,14 @@ class RaffleLogViewSet(viewsets.ReadOnlyModelViewSet):
             return RaffleLog.objects.all()
         return RaffleLog.objects.none()
     
-    @action(detail=False, methods=['get'], url_path='export')
+    @action(
+        detail=False, methods=['get'], url_path='export',
+        renderer_classes=api_settings.DEFAULT_RENDERER_CLASSES + [
+            XlsxFormatRenderer, CsvFormatRenderer, NdjsonFormatRenderer
+        ]
+    )
     def export_report(self, request):
-        """Export raffle report"""
+        """Export raffle report (JSON, or a streamed file with ?format=xlsx|csv|ndjson; gzip with Accept-Encoding)"""
         raffle_event_id = request.query_params.get('raffle_event_id')
         if not raffle_event_id:
             return Response(
@@ -1558,19 +1779,24 @@ class RaffleLogViewSet(viewsets.ReadOnlyModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        export_data = []
-        for prize in raffle_event.prizes.all():
-            for participant in prize.selected_participants.all():
-                export_data.append({
-                    'raffle_event': raffle_event.name,
-                    'round': prize.round_number,
-                    'prize': prize.name,
-                    'participant': participant.participant.name,
-                    'department': participant.participant.department.name if participant.participant.department else '',
-                    'selected_at': participant.selected_at.isoformat(),
-                    'seed': participant.seed_value
-                })
+        # One joined query; file formats are streamed row by row
+        rows = report_rows(raffle_event)
+        export_format = request.accepted_renderer.format
+        filename = f'raffle_report_{raffle_event.id}_{datetime.now().strftime("%Y%m%d_%H%M%S")}'
+        
+        if export_format == 'xlsx':
+            exporter = ExcelExporter(
+                ['การจับสลาก', 'รอบ', 'รางวัล', 'ผู้ได้รับรางวัล', 'หน่วยงาน', 'เวลาที่จับได้', 'Seed'],
+                sheet_title='รายงานการจับสลาก',
+                column_widths=[25, 8, 25, 35, 20, 28, 20]
+            )
+            return exporter.response((row.values() for row in rows), f'{filename}.xlsx')
+        if export_format == 'csv':
+            return stream_csv((row.values() for row in rows), REPORT_FIELDS, f'{filename}.csv', request)
+        if export_format == 'ndjson':
+            return stream_ndjson(rows, f'{filename}.ndjson', request)
         
+        export_data = list(rows)
         return Response({
             'success': True,
             'data': export_data,
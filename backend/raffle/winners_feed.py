@@ -0,0 +1,58 @@
+import hashlib
+import logging
+from typing import Dict, Any, Optional
+from django.core.cache import cache
+from core import render_cache
+
+logger = logging.getLogger(__name__)
+
+VERSION_NAMESPACE = 'raffle_winners'
+PAGE_KEY = 'raffle_winners_feed'
+PAGE_TTL = 60 * 60
+FEED_PARAMS = ('raffle_event', 'prize', 'search', 'page', 'page_size')
+
+
+def _scope(raffle_event_id: Optional[Any]) -> Any:
+    try:
+        return int(raffle_event_id)
+    except (TypeError, ValueError):
+        return 'all'
+
+
+def get_version(raffle_event_id: Optional[Any] = None) -> str:
+    """
+    version ปัจจุบันของรายชื่อผู้ชนะ (ต่อ RaffleEvent หรือ 'all' เมื่อไม่ระบุ)
+    version เปลี่ยนทุกครั้งที่บันทึก/ลบ/แก้ไขผู้ชนะ ผลลัพธ์ใน cache ของ version เก่าจึงไม่ถูกใช้อีก
+    """
+    return render_cache.get_version(VERSION_NAMESPACE, _scope(raffle_event_id))
+
+
+def bump_version(raffle_event_id: int) -> None:
+    """เปลี่ยน version ของ RaffleEvent (และ 'all') หลัง transaction commit"""
+    render_cache.bump_version(VERSION_NAMESPACE, _scope(raffle_event_id), _scope(None))
+
+
+def _params_hash(request) -> str:
+    params = [(name, request.query_params.get(name, '').strip()) for name in FEED_PARAMS]
+    # Pagination links are absolute, so the host is part of the key
+    params.append(('host', request.get_host()))
+    return hashlib.sha1(repr(params).encode()).hexdigest()
+
+
+def etag_for(version: str, request) -> str:
+    return f'"{version}-{_params_hash(request)[:16]}"'
+
+
+def get_page(version: str, request) -> Optional[Dict[str, Any]]:
+    try:
+        return cache.get(f'{PAGE_KEY}:{version}:{_params_hash(request)}')
+    except Exception as e:
+        logger.warning(f'Winners feed cache read failed: {e}')
+        return None
+
+
+def set_page(version: str, request, data: Dict[str, Any]) -> None:
+    try:
+        cache.set(f'{PAGE_KEY}:{version}:{_params_hash(request)}', data, PAGE_TTL)
+    except Exception as e:
+        logger.warning(f'Winners feed cache write failed: {e}')
@@ -5,3 +5,5 @@ class TeamsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'teams'
 
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,277 @@
+import hashlib
+import json
+from typing import Any, Dict, List, Optional, Set, Tuple
+import pandas as pd
+from django.db import connection, transaction
+from core import render_cache
+from core.models import Department, Event
+from raffle.eligibility_index import invalidate_event
+from raffle.signals import bump_winners_feed
+from .models import Participant
+
+# Default column mapping for hospital Excel/CSV format
+DEFAULT_COLUMN_MAPPING = {
+    'hospital_id': 'ID',
+    'first_name': 'ชื่อ',
+    'last_name': 'นามสกุล',
+    'department': 'หน่วยงาน'
+}
+# Mapped fields handled by the importer; every other mapped field goes to metadata
+PARTICIPANT_FIELDS = ('hospital_id', 'first_name', 'last_name', 'department')
+UPSERT_BATCH_SIZE = 1000
+MISSING_NAME_ERROR = 'ต้องระบุชื่อหรือนามสกุลอย่างน้อย 1 อย่าง'
+# Names of participants missing from the file kept in the diff summary (the count is always exact)
+MISSING_NAMES_SAMPLE = 100
+HASH_SEPARATOR = '\x1f'
+
+
+def _text(frame: pd.DataFrame, field: str) -> pd.Series:
+    """คอลัมน์เป็นข้อความที่ตัดช่องว่างแล้ว (ค่าว่าง/NaN เป็น '')"""
+    if field not in frame:
+        return pd.Series('', index=frame.index, dtype=object)
+    column = frame[field]
+    return column.where(column.notna(), '').astype(str).str.strip()
+
+
+def _integers(frame: pd.DataFrame, field: str) -> pd.Series:
+    """คอลัมน์เป็นจำนวนเต็ม ค่าที่แปลงไม่ได้ (หรือไม่ใช่จำนวนเต็ม) เป็น None"""
+    if field not in frame:
+        return pd.Series(None, index=frame.index, dtype=object)
+    numbers = pd.to_numeric(_text(frame, field), errors='coerce')
+    numbers = numbers.where(numbers % 1 == 0).astype('Int64')
+    return numbers.astype(object).where(numbers.notna(), None)
+
+
+def _values(column: pd.Series) -> List[Any]:
+    # tolist() turns numpy scalars into Python values (JSON-serializable metadata)
+    return column.astype(object).where(column.notna(), None).tolist()
+
+
+def _row_hashes(frame: pd.DataFrame) -> List[str]:
+    """sha1 ของค่าที่ import ในแต่ละแถว (ชื่อ, ID โรงพยาบาล, หน่วยงาน, metadata) ของ DataFrame ที่ normalize แล้ว"""
+    metadata = pd.Series(
+        [json.dumps(value, sort_keys=True, ensure_ascii=False, default=str) for value in frame['metadata']],
+        index=frame.index,
+        dtype=object
+    )
+    keys = (
+        frame['name']
+        + HASH_SEPARATOR + frame['hospital_id'].map(lambda value: '' if value is None else str(value))
+        + HASH_SEPARATOR + frame['department'].fillna('')
+        + HASH_SEPARATOR + metadata
+    )
+    return [hashlib.sha1(key.encode('utf-8')).hexdigest() for key in keys]
+
+
+class ParticipantImporter:
+    """
+    นำเข้าผู้เข้าร่วมจาก DataFrame (คอลัมน์เป็นชื่อ field ตาม column_mapping แล้ว) ทีละ batch
+
+    - จัดรูปชื่อ, ID โรงพยาบาล และหน่วยงาน ด้วย operation ระดับคอลัมน์ของ pandas (ไม่วนทีละแถว)
+    - หน่วยงาน: ดึงที่มีอยู่ครั้งเดียว แล้วสร้างที่ยังไม่มีด้วย bulk_create ครั้งเดียว
+    - ผู้เข้าร่วม: upsert ด้วย bulk_create(update_conflicts=True) บน (org, event, name) ทีละ batch
+      ใน transaction เดียว ชื่อซ้ำในไฟล์ใช้แถวสุดท้าย (เหมือน update_or_create ทีละแถว)
+    - ทุกแถวที่บันทึกเก็บ import_hash (sha1 ของแถวในไฟล์) ไว้ใน Participant
+
+    incremental=True: เทียบ import_hash ของแถวในไฟล์กับที่เก็บไว้ (อ่านของทั้ง event ครั้งเดียว)
+    แล้วบันทึกเฉพาะแถวใหม่และแถวที่เปลี่ยน แถวที่ไม่เปลี่ยนไม่ถูกเขียน (updated_at คงเดิม)
+    import ไฟล์เดิมซ้ำจึงเป็นการอ่านอย่างเดียว ผู้เข้าร่วมที่ไม่มีในไฟล์ถูกรายงานใน diff_summary() แต่ไม่ถูกลบ
+
+    bulk_create ไม่ส่ง signal จึงเปลี่ยน version ของ cache / ดัชนีผู้มีสิทธิ์เองหลัง commit
+
+    ตัวอย่าง:
+        importer = ParticipantImporter(org_id, event)
+        summary = processor.validate_rows(column_mapping, importer.normalize)
+        if not summary['error_rows']:
+            counts = processor.write_rows(column_mapping, importer.normalize, importer.save)
+    """
+
+    model_name = 'Participant'
+    default_column_mapping = DEFAULT_COLUMN_MAPPING
+
+    def __init__(
+        self,
+        org_id: int,
+        event: Event,
+        batch_size: int = UPSERT_BATCH_SIZE,
+        incremental: bool = False
+    ):
+        self.org_id = org_id
+        self.event = event
+        self.batch_size = batch_size
+        self.incremental = incremental
+        # Filled on first use and kept up to date across save() calls (one read per import, not per batch)
+        self._hashes: Optional[Dict[str, str]] = None
+        self._department_ids: Dict[str, int] = {}
+        # Every valid name in the file, collected by normalize() so rows skipped by a resumed job still count
+        self._seen_names: Set[str] = set()
+
+    @classmethod
+    def from_job(cls, job) -> 'ParticipantImporter':
+        """สร้างจาก ImportJob (ใช้โดย core.import_jobs)"""
+        return cls(job.org_id, job.event, incremental=job.mode == 'incremental')
+
+    def normalize(self, frame: pd.DataFrame) -> Tuple[pd.DataFrame, List[Dict[str, Any]]]:
+        """
+        แปลง DataFrame ที่ map คอลัมน์แล้วเป็นคอลัมน์ name, hospital_id, department, metadata
+
+        (และคอลัมน์ import_hash)
+
+        Returns: (DataFrame ของแถวที่ถูกต้อง, รายการ error ในรูปแบบเดียวกับ errors ของ ImportProcessor.validate_rows)
+        """
+        names = (_text(frame, 'first_name') + ' ' + _text(frame, 'last_name')).str.strip()
+        invalid = names == ''
+
+        errors = [
+            {'row': idx + 1, 'errors': [MISSING_NAME_ERROR], 'data': row_data}
+            for idx, row_data in zip(
+                frame.index[invalid],
+                frame[invalid].astype(object).where(frame[invalid].notna(), None).to_dict('records')
+            )
+        ]
+
+        valid = ~invalid
+        extra_fields = [field for field in frame.columns if field not in PARTICIPANT_FIELDS]
+        if extra_fields:
+            extra = frame.loc[valid, extra_fields]
+            metadata = extra.astype(object).where(extra.notna(), None).to_dict('records')
+        else:
+            metadata = [{} for _ in range(int(valid.sum()))]
+
+        departments = _text(frame, 'department')[valid]
+        normalized = pd.DataFrame({
+            'name': names[valid],
+            'hospital_id': _integers(frame, 'hospital_id')[valid],
+            'department': departments.where(departments != '', None),
+            'metadata': pd.Series(metadata, index=names[valid].index, dtype=object),
+        })
+        normalized['import_hash'] = _row_hashes(normalized)
+        self._seen_names.update(normalized['name'])
+        return normalized, errors
+
+    def resolve_departments(self, names: List[str]) -> Dict[str, int]:
+        """ชื่อหน่วยงาน -> id (สร้างหน่วยงานที่ยังไม่มีในครั้งเดียว; จำไว้ใช้กับ batch ถัดไป)"""
+        department_ids = self._department_ids
+        names = [name for name in names if name not in department_ids]
+        if not names:
+            return department_ids
+
+        # Lowest id wins when an org has duplicate department names (like get_or_create's first match)
+        department_ids.update(
+            Department.objects.filter(org_id=self.org_id, name__in=names)
+            .order_by('-id')
+            .values_list('name', 'id')
+        )
+        missing = [name for name in names if name not in department_ids]
+        if missing:
+            created = Department.objects.bulk_create([
+                Department(org_id=self.org_id, name=name, is_active=True) for name in missing
+            ])
+            if all(department.pk for department in created):
+                department_ids.update((department.name, department.pk) for department in created)
+            else:
+                # Backends without RETURNING (MySQL) need one more read for the new ids
+                department_ids.update(
+                    Department.objects.filter(org_id=self.org_id, name__in=missing)
+                    .order_by('-id')
+                    .values_list('name', 'id')
+                )
+        return department_ids
+
+    def existing_hashes(self) -> Dict[str, str]:
+        """ชื่อผู้เข้าร่วมที่มีอยู่แล้วใน event -> import_hash (อ่านครั้งเดียว แล้วปรับตามแถวที่บันทึกใน save)"""
+        if self._hashes is None:
+            self._hashes = dict(
+                Participant.objects.filter(org_id=self.org_id, event=self.event)
+                .values_list('name', 'import_hash')
+            )
+        return self._hashes
+
+    def classify(self, rows: pd.DataFrame) -> pd.Series:
+        """สถานะของแต่ละแถวเทียบกับที่มีอยู่: 'new', 'changed' หรือ 'unchanged' (ชื่อไม่ซ้ำกันใน rows)"""
+        stored = rows['name'].map(self.existing_hashes())
+        status = pd.Series('changed', index=rows.index, dtype=object)
+        status[stored == rows['import_hash']] = 'unchanged'
+        status[stored.isna()] = 'new'
+        return status
+
+    def diff_summary(self) -> Dict[str, Any]:
+        """
+        สรุปหลัง import ทุก batch แล้ว: ผู้เข้าร่วมใน event ที่ไม่มีในไฟล์ (ไม่ลบ แค่รายงาน)
+
+        Returns: {'mode', 'missing_count', 'missing_names' (ไม่เกิน MISSING_NAMES_SAMPLE ชื่อ)}
+        """
+        missing = sorted(self.existing_hashes().keys() - self._seen_names)
+        return {
+            'mode': 'incremental' if self.incremental else 'full',
+            'missing_count': len(missing),
+            'missing_names': missing[:MISSING_NAMES_SAMPLE],
+        }
+
+    def _bulk_upsert(self, participants: List[Participant]) -> None:
+        options = {
+            'update_conflicts': True,
+            'update_fields': ['hospital_id', 'department', 'metadata', 'import_hash', 'updated_at'],
+        }
+        # MySQL upserts on any unique key and rejects an explicit conflict target
+        if connection.features.supports_update_conflicts_with_target:
+            options['unique_fields'] = ['org', 'event', 'name']
+        for start in range(0, len(participants), self.batch_size):
+            Participant.objects.bulk_create(participants[start:start + self.batch_size], **options)
+
+    def save(self, frame: pd.DataFrame) -> Dict[str, int]:
+        """
+        upsert แถวที่ normalize แล้ว (incremental: เฉพาะแถวใหม่และแถวที่เปลี่ยน)
+
+        Returns: {'created_count', 'updated_count'} และ 'unchanged_count' เมื่อ incremental
+        """
+        if frame.empty:
+            return {'created_count': 0, 'updated_count': 0}
+
+        rows = frame.drop_duplicates(subset='name', keep='last')
+        status = self.classify(rows)
+        created_count = int((status == 'new').sum())
+        if self.incremental:
+            rows = rows[status != 'unchanged']
+
+        if not rows.empty:
+            department_names = rows['department'].dropna().unique().tolist()
+            with transaction.atomic():
+                department_ids = self.resolve_departments(department_names)
+                participants = [
+                    Participant(
+                        org_id=self.org_id,
+                        event=self.event,
+                        name=name,
+                        hospital_id=hospital_id,
+                        department_id=department_ids.get(department) if department else None,
+                        metadata=metadata,
+                        import_hash=import_hash,
+                    )
+                    for name, hospital_id, department, metadata, import_hash in zip(
+                        rows['name'].tolist(),
+                        _values(rows['hospital_id']),
+                        rows['department'].tolist(),
+                        rows['metadata'].tolist(),
+                        rows['import_hash'].tolist(),
+                    )
+                ]
+                self._bulk_upsert(participants)
+
+                invalidate_event(self.event.id)
+                render_cache.bump_version('participants', self.event.id)
+                bump_winners_feed(self.event.id)
+
+            self.existing_hashes().update(zip(rows['name'], rows['import_hash']))
+
+        if self.incremental:
+            return {
+                'created_count': created_count,
+                'updated_count': len(rows) - created_count,
+                'unchanged_count': int((status == 'unchanged').sum()),
+            }
+        # Repeated names in the file count as updates, as with one update_or_create per row
+        return {
+            'created_count': created_count,
+            'updated_count': len(frame) - created_count,
+        }
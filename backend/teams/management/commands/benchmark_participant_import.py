@@ -0,0 +1,123 @@
+import time
+import pandas as pd
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+from core.models import Department, Event, Organization
+from teams.importers import ParticipantImporter
+from teams.models import Participant
+
+
+class Rollback(Exception):
+    pass
+
+
+class QueryCounter:
+    """นับจำนวน query (CaptureQueriesContext เก็บได้แค่ 9000 รายการล่าสุด)"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def make_frame(rows_count, departments_count):
+    """DataFrame ที่ map คอลัมน์แล้ว (เหมือนไฟล์ HR หลัง column mapping)"""
+    index = pd.RangeIndex(rows_count)
+    return pd.DataFrame({
+        'hospital_id': (index + 100000).astype(str),
+        'first_name': 'ผู้เข้าร่วม' + index.astype(str),
+        'last_name': 'ทดสอบ',
+        'department': 'หน่วยงาน ' + (index % departments_count).astype(str),
+        'position': 'พยาบาล',
+    })
+
+
+def legacy_import(org_id, event, frame):
+    """วิธีเดิม: get_or_create หน่วยงาน + update_or_create ผู้เข้าร่วมทีละแถว"""
+    for _, row in frame.iterrows():
+        department, _ = Department.objects.get_or_create(
+            org_id=org_id, name=row['department'], defaults={'is_active': True}
+        )
+        Participant.objects.update_or_create(
+            org_id=org_id,
+            event=event,
+            name=f"{row['first_name']} {row['last_name']}",
+            defaults={
+                'hospital_id': int(row['hospital_id']),
+                'department': department,
+                'metadata': {'position': row['position']}
+            }
+        )
+
+
+class Command(BaseCommand):
+    help = 'Measure time and query count of the participant import (first import and re-import), rolled back afterwards'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            nargs='+',
+            default=[1000, 10000, 50000],
+            help='Row counts to import (default: 1000 10000 50000)'
+        )
+        parser.add_argument(
+            '--departments',
+            type=int,
+            default=200,
+            help='Number of distinct departments in the file (default: 200)'
+        )
+        parser.add_argument(
+            '--compare',
+            action='store_true',
+            help='Also run the previous per-row update_or_create import for comparison'
+        )
+        parser.add_argument(
+            '--incremental',
+            action='store_true',
+            help='Also run the incremental import (the re-import of an unchanged file writes nothing)'
+        )
+
+    def measure(self, mode, frame):
+        """import สองรอบ (สร้างใหม่ แล้ว import ซ้ำ) ใน transaction ที่ rollback ทิ้ง"""
+        results = []
+        try:
+            with transaction.atomic():
+                org = Organization.objects.create(name='benchmark', code=f'benchmark-{time.time_ns()}')
+                now = timezone.now()
+                event = Event.objects.create(org=org, name='benchmark', start_date=now, end_date=now)
+                for _ in range(2):
+                    counter = QueryCounter()
+                    with connection.execute_wrapper(counter):
+                        started = time.perf_counter()
+                        if mode in ('bulk', 'incremental'):
+                            importer = ParticipantImporter(org.id, event, incremental=mode == 'incremental')
+                            normalized, _ = importer.normalize(frame)
+                            importer.save(normalized)
+                        else:
+                            legacy_import(org.id, event, frame)
+                        results.append((time.perf_counter() - started, counter.count))
+                raise Rollback
+        except Rollback:
+            pass
+        return results
+
+    def handle(self, *args, **options):
+        modes = ['bulk']
+        if options['incremental']:
+            modes.append('incremental')
+        if options['compare']:
+            modes.append('per-row')
+
+        self.stdout.write(f"{'mode':<11} {'rows':>8} {'import s':>9} {'queries':>8} {'re-import s':>12} {'queries':>8}")
+        for mode in modes:
+            for rows_count in options['rows']:
+                frame = make_frame(rows_count, options['departments'])
+                (first_seconds, first_queries), (again_seconds, again_queries) = self.measure(mode, frame)
+                self.stdout.write(
+                    f"{mode:<11} {rows_count:>8} {first_seconds:>9.2f} {first_queries:>8} "
+                    f"{again_seconds:>12.2f} {again_queries:>8}"
+                )
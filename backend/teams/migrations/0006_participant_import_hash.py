@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('teams', '0005_change_hospital_id_to_integer'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='participant',
+            name='import_hash',
+            field=models.CharField(blank=True, editable=False, help_text='sha1 ของแถวในไฟล์ที่ import ล่าสุด (ว่างถ้าแก้ไขเองหลัง import)', max_length=40, verbose_name='Hash ข้อมูลนำเข้า'),
+        ),
+    ]
@@ -37,6 +37,13 @@ class Participant(models.Model):
         help_text="ถ้าเปิด หมายความว่ามีสิทธิ์จับรางวัล (ค่ามาตรฐาน: เปิด)"
     )
     metadata = models.JSONField(default=dict, blank=True, verbose_name="ข้อมูลเพิ่มเติม")
+    import_hash = models.CharField(
+        max_length=40,
+        blank=True,
+        editable=False,
+        verbose_name="Hash ข้อมูลนำเข้า",
+        help_text="sha1 ของแถวในไฟล์ที่ import ล่าสุด (ว่างถ้าแก้ไขเองหลัง import)"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -0,0 +1,30 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from core import render_cache
+from core.models import Department, Event
+from .models import Participant
+
+
+# Signal เพื่อเปลี่ยน version ของหน้าพิมพ์รายชื่อผู้เข้าร่วม (cache ของ version เก่าจะไม่ถูกใช้อีก)
+@receiver(post_save, sender=Participant)
+def bump_participants_print_on_save(sender, instance, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) == {'is_raffle_eligible'}:
+        return
+    render_cache.bump_version('participants', instance.event_id)
+
+
+@receiver(post_delete, sender=Participant)
+def bump_participants_print_on_delete(sender, instance, **kwargs):
+    render_cache.bump_version('participants', instance.event_id)
+
+
+@receiver(post_save, sender=Event)
+def bump_participants_print_on_event_change(sender, instance, **kwargs):
+    render_cache.bump_version('participants', instance.id)
+
+
+@receiver(post_save, sender=Department)
+@receiver(post_delete, sender=Department)
+def bump_participants_print_on_department_change(sender, instance, **kwargs):
+    for event_id in Event.objects.filter(org_id=instance.org_id).values_list('id', flat=True):
+        render_cache.bump_version('participants', event_id)
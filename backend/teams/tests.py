@@ -0,0 +1,130 @@
+import pandas as pd
+from django.test import TestCase
+from django.utils import timezone
+from core.models import Department, Event, Organization
+from .importers import MISSING_NAME_ERROR, ParticipantImporter
+from .models import Participant
+
+
+def mapped_frame(rows, start=0):
+    """DataFrame ที่ map คอลัมน์แล้ว (เหมือน batch จาก ImportProcessor.iter_batches)"""
+    return pd.DataFrame(
+        rows,
+        columns=['hospital_id', 'first_name', 'last_name', 'department'],
+        index=range(start, start + len(rows))
+    )
+
+
+ROSTER = [
+    (1001, 'สมชาย', 'ใจดี', 'อายุรกรรม'),
+    (1002, 'สมหญิง', 'รักงาน', 'ศัลยกรรม'),
+    (1003, 'มานะ', 'อดทน', 'อายุรกรรม'),
+]
+
+
+class ParticipantImporterTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        cls.org = Organization.objects.create(name='โรงพยาบาลทดสอบ', code='test')
+        cls.event = Event.objects.create(org=cls.org, name='กีฬาสี', start_date=now, end_date=now)
+
+    def import_rows(self, rows, incremental=False):
+        importer = ParticipantImporter(self.org.id, self.event, incremental=incremental)
+        frame, errors = importer.normalize(mapped_frame(rows))
+        with self.captureOnCommitCallbacks(execute=True):
+            counts = importer.save(frame)
+        return importer, counts, errors
+
+    def participants(self):
+        return Participant.objects.filter(event=self.event)
+
+    def test_normalize_reports_rows_without_a_name(self):
+        importer = ParticipantImporter(self.org.id, self.event)
+
+        frame, errors = importer.normalize(mapped_frame([
+            (1001, ' สมชาย ', 'ใจดี', ' อายุรกรรม '),
+            ('abc', None, '', None),
+            ('1003.0', 'มานะ', None, ''),
+        ]))
+
+        self.assertEqual(frame['name'].tolist(), ['สมชาย ใจดี', 'มานะ'])
+        self.assertEqual(frame['hospital_id'].tolist(), [1001, 1003])
+        self.assertEqual(frame['department'].tolist(), ['อายุรกรรม', None])
+        self.assertEqual([(error['row'], error['errors']) for error in errors], [(2, [MISSING_NAME_ERROR])])
+
+    def test_save_creates_participants_and_departments(self):
+        _, counts, _ = self.import_rows(ROSTER)
+
+        self.assertEqual(counts, {'created_count': 3, 'updated_count': 0})
+        self.assertEqual(self.participants().count(), 3)
+        self.assertEqual(Department.objects.filter(org=self.org).count(), 2)
+        self.assertFalse(self.participants().filter(import_hash='').exists())
+
+    def test_full_mode_counts_existing_and_repeated_names_as_updates(self):
+        self.import_rows(ROSTER)
+
+        _, counts, _ = self.import_rows([*ROSTER, (1009, 'สมชาย', 'ใจดี', 'ศัลยกรรม')])
+
+        self.assertEqual(counts, {'created_count': 0, 'updated_count': 4})
+        # The last row for a repeated name wins
+        self.assertEqual(self.participants().get(name='สมชาย ใจดี').hospital_id, 1009)
+
+    def test_classify_new_changed_unchanged(self):
+        self.import_rows(ROSTER[:2])
+        importer = ParticipantImporter(self.org.id, self.event, incremental=True)
+        frame, _ = importer.normalize(mapped_frame([
+            ROSTER[0],
+            (1002, 'สมหญิง', 'รักงาน', 'อายุรกรรม'),
+            ROSTER[2],
+        ]))
+
+        self.assertEqual(importer.classify(frame).tolist(), ['unchanged', 'changed', 'new'])
+
+    def test_incremental_reimport_of_the_same_file_writes_nothing(self):
+        self.import_rows(ROSTER)
+        updated_at = dict(self.participants().values_list('name', 'updated_at'))
+        importer = ParticipantImporter(self.org.id, self.event, incremental=True)
+        frame, _ = importer.normalize(mapped_frame(ROSTER))
+
+        # One read of the stored hashes and nothing else
+        with self.assertNumQueries(1):
+            counts = importer.save(frame)
+
+        self.assertEqual(counts, {'created_count': 0, 'updated_count': 0, 'unchanged_count': 3})
+        self.assertEqual(dict(self.participants().values_list('name', 'updated_at')), updated_at)
+
+    def test_incremental_writes_only_new_and_changed_rows(self):
+        self.import_rows(ROSTER[:2])
+        untouched = self.participants().get(name='สมชาย ใจดี').updated_at
+
+        _, counts, _ = self.import_rows(
+            [ROSTER[0], (1002, 'สมหญิง', 'รักงาน', 'อายุรกรรม'), ROSTER[2]], incremental=True
+        )
+
+        self.assertEqual(counts, {'created_count': 1, 'updated_count': 1, 'unchanged_count': 1})
+        self.assertEqual(self.participants().get(name='สมหญิง รักงาน').department.name, 'อายุรกรรม')
+        self.assertEqual(self.participants().get(name='สมชาย ใจดี').updated_at, untouched)
+
+    def test_incremental_rewrites_rows_edited_after_import(self):
+        self.import_rows(ROSTER)
+        self.participants().filter(name='มานะ อดทน').update(hospital_id=9999, import_hash='')
+
+        _, counts, _ = self.import_rows(ROSTER, incremental=True)
+
+        self.assertEqual(counts['unchanged_count'], 2)
+        self.assertEqual(counts['updated_count'], 1)
+        self.assertEqual(self.participants().get(name='มานะ อดทน').hospital_id, 1003)
+
+    def test_diff_summary_reports_participants_missing_from_the_file(self):
+        self.import_rows(ROSTER)
+
+        importer, _, _ = self.import_rows(ROSTER[1:], incremental=True)
+
+        self.assertEqual(
+            importer.diff_summary(),
+            {'mode': 'incremental', 'missing_count': 1, 'missing_names': ['สมชาย ใจดี']}
+        )
+        # Missing participants are reported, not deleted
+        self.assertEqual(self.participants().count(), 3)
@@ -2,20 +2,24 @@ from rest_framework import viewsets, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
-from django.http import HttpResponse
+from django.db import transaction
 from django.template.loader import render_to_string
 from pathlib import Path
-from openpyxl import load_workbook
-from openpyxl.styles import Font, PatternFill, Alignment
 from datetime import datetime
 from .models import Participant, Team, TeamMember
 from .serializers import (
     ParticipantSerializer, TeamSerializer, TeamDetailSerializer, TeamMemberSerializer
 )
 from .algorithms import RandomAssignment, BalancedByDepartmentAssignment, RuleBasedAssignment
+from .importers import ParticipantImporter, DEFAULT_COLUMN_MAPPING
 from core.permissions import IsOrgAdminOrReadOnly, IsStaffOrReadOnly
-from core.utils import ImportProcessor, create_audit_log
-from core.models import Organization
+from core.utils import ImportProcessor, create_audit_log, parse_column_mapping
+from core import import_jobs
+from core.serializers import ImportJobSerializer
+from core.exports import ExcelExporter
+from core import render_cache
+from core.models import Organization, ImportJob
+from raffle.eligibility_index import sync_eligibility, invalidate_event
 from rest_framework.permissions import IsAuthenticated
 from config.pagination import StandardResultsSetPagination
 
@@ -56,6 +60,7 @@ class ParticipantViewSet(viewsets.ModelViewSet):
         
         participant.is_raffle_eligible = is_eligible
         participant.save(update_fields=['is_raffle_eligible'])
+        sync_eligibility(participant.event_id, [participant.id], bool(is_eligible))
         
         serializer = self.get_serializer(participant)
         return Response(serializer.data)
@@ -126,6 +131,7 @@ class ParticipantViewSet(viewsets.ModelViewSet):
             org_id=org_id,
             event_id=event_id
         ).update(is_raffle_eligible=True)
+        invalidate_event(event_id)
         
         # Audit log
         from core.models import Organization
@@ -150,6 +156,10 @@ class ParticipantViewSet(viewsets.ModelViewSet):
             'message': f'Reset eligibility for {updated_count} participants'
         })
     
+    def perform_update(self, serializer):
+        """Override to clear import_hash: the next incremental import rewrites the edited row from the file"""
+        serializer.save(import_hash='')
+    
     def destroy(self, request, *args, **kwargs):
         """Override to handle delete with reason and audit log"""
         participant = self.get_object()
@@ -222,39 +232,33 @@ class ParticipantViewSet(viewsets.ModelViewSet):
         
         file = request.FILES['file']
         
-        # Default column mapping for hospital Excel/CSV format
-        default_mapping = {
-            'hospital_id': 'ID',
-            'first_name': 'ชื่อ',
-            'last_name': 'นามสกุล',
-            'department': 'หน่วยงาน'
-        }
+        column_mapping = parse_column_mapping(request.data.get('column_mapping'), DEFAULT_COLUMN_MAPPING)
         
-        # Get and parse column_mapping
-        import json
-        column_mapping_raw = request.data.get('column_mapping')
-        
-        if column_mapping_raw is None:
-            column_mapping = default_mapping
-        elif isinstance(column_mapping_raw, str):
-            try:
-                column_mapping = json.loads(column_mapping_raw)
-                # Ensure it's a dict
-                if not isinstance(column_mapping, dict):
-                    column_mapping = default_mapping
-            except (json.JSONDecodeError, TypeError):
-                column_mapping = default_mapping
-        elif isinstance(column_mapping_raw, dict):
-            column_mapping = column_mapping_raw
-        else:
-            column_mapping = default_mapping
+        # full: write every row; incremental: write only new rows and rows whose import_hash changed
+        mode = request.data.get('mode') or 'full'
+        if mode not in dict(ImportJob.MODE_CHOICES):
+            return Response(
+                {'error': f'Unknown import mode: {mode}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        from core.models import Event
+        
+        try:
+            event = Event.objects.get(id=event_id, org_id=org_id)
+        except Event.DoesNotExist:
+            return Response(
+                {'error': 'Event not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
         
-        # Ensure column_mapping is a dict
-        if not isinstance(column_mapping, dict):
-            column_mapping = default_mapping
+        # Large files: run as a background job and report progress over WebSocket
+        if str(request.data.get('background', '')).lower() in ('1', 'true', 'yes'):
+            job = import_jobs.create_job(request, 'participants', file, column_mapping, event=event, mode=mode)
+            return Response(ImportJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
         
         processor = ImportProcessor(file)
-        read_result = processor.read_file()
+        read_result = processor.read_header()
         
         if not read_result.get('success', False):
             return Response(read_result, status=status.HTTP_400_BAD_REQUEST)
@@ -271,95 +275,31 @@ class ParticipantViewSet(viewsets.ModelViewSet):
             }
             return Response(error_response, status=status.HTTP_400_BAD_REQUEST)
         
-        # Process data
-        def validate_row(row_data):
-            errors = []
-            # At least first_name or last_name must be provided
-            first_name = (row_data.get('first_name') or '').strip()
-            last_name = (row_data.get('last_name') or '').strip()
-            if not first_name and not last_name:
-                errors.append('ต้องระบุชื่อหรือนามสกุลอย่างน้อย 1 อย่าง')
-            # If hospital_id is provided, it must not be empty
-            if 'hospital_id' in row_data and row_data.get('hospital_id') == '':
-                errors.append('hospital_id cannot be empty if provided')
-            return len(errors) == 0, errors
-        
-        result = processor.process_data(column_mapping, validate_row)
-        
-        if not result['success']:
+        # First pass: normalize the file batch by batch (at least first_name or last_name must be provided)
+        importer = ParticipantImporter(org_id, event, incremental=mode == 'incremental')
+        summary = processor.validate_rows(column_mapping, importer.normalize)
+        total_rows = summary['total_rows']
+        
+        if summary['error_rows']:
             error_response = {
                 'success': False,
                 'error': 'Data validation failed',
-                'errors': result.get('errors', []),
-                'total_rows': result.get('total_rows', 0),
-                'valid_rows': result.get('valid_rows', 0),
-                'error_rows': result.get('error_rows', 0),
+                'errors': summary['errors'],
+                'total_rows': total_rows,
+                'valid_rows': summary['valid_rows'],
+                'error_rows': summary['error_rows'],
             }
             return Response(error_response, status=status.HTTP_400_BAD_REQUEST)
         
-        # Create/Update participants
-        created_count = 0
-        updated_count = 0
-        from core.models import Event, Department
-        
-        try:
-            event = Event.objects.get(id=event_id, org_id=org_id)
-        except Event.DoesNotExist:
-            return Response(
-                {'error': 'Event not found'},
-                status=status.HTTP_404_NOT_FOUND
-            )
-        
-        for row_data in result['data']:
-            # Combine first_name and last_name
-            first_name = (row_data.get('first_name') or '').strip()
-            last_name = (row_data.get('last_name') or '').strip()
-            full_name = f"{first_name} {last_name}".strip()
-            
-            if not full_name:
-                continue  # Skip if no name
-            
-            # Auto-create or find department
-            department = None
-            if row_data.get('department'):
-                department_name = str(row_data['department']).strip()
-                if department_name:
-                    department, _ = Department.objects.get_or_create(
-                        org_id=org_id,
-                        name=department_name,
-                        defaults={'is_active': True}
-                    )
-            
-            # Get hospital_id if provided and convert to integer
-            hospital_id = None
-            hospital_id_raw = row_data.get('hospital_id')
-            if hospital_id_raw:
-                hospital_id_str = str(hospital_id_raw).strip()
-                if hospital_id_str:
-                    try:
-                        hospital_id = int(hospital_id_str)
-                    except (ValueError, TypeError):
-                        # Skip invalid hospital_id, but don't fail the import
-                        hospital_id = None
-            
-            # Store other fields in metadata
-            metadata = {k: v for k, v in row_data.items() if k not in ['first_name', 'last_name', 'department', 'hospital_id']}
-            
-            # Update or create participant
-            participant, created = Participant.objects.update_or_create(
-                org_id=org_id,
-                event=event,
-                name=full_name,
-                defaults={
-                    'hospital_id': hospital_id,
-                    'department': department,
-                    'metadata': metadata
-                }
-            )
-            if created:
-                created_count += 1
-            else:
-                updated_count += 1
+        # Second pass: create/update participants (bulk upsert per batch, all or nothing)
+        with transaction.atomic():
+            counts = processor.write_rows(column_mapping, importer.normalize, importer.save)
+        created_count = counts.get('created_count', 0)
+        updated_count = counts.get('updated_count', 0)
+        diff = {
+            'unchanged_count': counts.get('unchanged_count', 0),
+            **importer.diff_summary()
+        }
         
         # Audit log
         from core.models import Organization
@@ -373,7 +313,8 @@ class ParticipantViewSet(viewsets.ModelViewSet):
                 'event_id': event_id,
                 'created_count': created_count,
                 'updated_count': updated_count,
-                'total_rows': result['total_rows']
+                'total_rows': total_rows,
+                **diff
             },
             request=request
         )
@@ -382,7 +323,8 @@ class ParticipantViewSet(viewsets.ModelViewSet):
             'success': True,
             'created_count': created_count,
             'updated_count': updated_count,
-            'total_rows': result['total_rows']
+            'total_rows': total_rows,
+            **diff
         })
     
     @action(detail=False, methods=['get'], url_path='export-excel')
@@ -416,7 +358,7 @@ class ParticipantViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(department__name=department_name)
         
         # Order by hospital_id, then name
-        queryset = queryset.order_by('hospital_id', 'name').select_related('department')
+        queryset = queryset.order_by('hospital_id', 'name')
         
         # Load template
         # Template path: backend/excel_templates/template1.xlsx
@@ -429,78 +371,31 @@ class ParticipantViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
         
-        # Load workbook from template
-        wb = load_workbook(template_path)
-        ws = wb.active
-        
-        # Check existing headers in row 1
-        existing_headers = []
-        for col in range(1, 10):  # Check up to 10 columns
-            header_value = ws.cell(row=1, column=col).value
-            if header_value:
-                existing_headers.append(str(header_value))
-            else:
-                break
-        
-        # Determine signature column
-        signature_col = 4  # Default to column D
-        
-        # If no headers exist, create them
-        if not existing_headers:
-            headers = ['ID โรงพยาบาล', 'ชื่อ-นามสกุล', 'หน่วยงาน', 'ลงชื่อ']
-            for col_idx, header in enumerate(headers, start=1):
-                cell = ws.cell(row=1, column=col_idx, value=header)
-                cell.font = Font(bold=True)
-                cell.fill = PatternFill(start_color="E8E8E8", end_color="E8E8E8", fill_type="solid")
-                cell.alignment = Alignment(horizontal="center", vertical="center")
-            signature_col = 4
-        # If headers exist but "ลงชื่อ" column is missing, add it
-        elif 'ลงชื่อ' not in existing_headers:
-            # Find the last column with header
-            last_col = len(existing_headers) + 1
-            cell = ws.cell(row=1, column=last_col, value='ลงชื่อ')
-            cell.font = Font(bold=True)
-            cell.fill = PatternFill(start_color="E8E8E8", end_color="E8E8E8", fill_type="solid")
-            cell.alignment = Alignment(horizontal="center", vertical="center")
-            signature_col = last_col
-        else:
-            # Find the column index of "ลงชื่อ"
-            for idx, header in enumerate(existing_headers, start=1):
-                if 'ลงชื่อ' in str(header):
-                    signature_col = idx
-                    break
-        
-        # Data starts from row 2 (row 1 is header)
-        start_row = 2
-        
-        # Write data
-        # Column A = hospital_id
-        # Column B = name
-        # Column C = department
-        # signature_col = ลงชื่อ (empty for signature)
-        for idx, participant in enumerate(queryset, start=start_row):
-            ws.cell(row=idx, column=1, value=participant.hospital_id if participant.hospital_id else '')
-            ws.cell(row=idx, column=2, value=participant.name)
-            ws.cell(row=idx, column=3, value=participant.department.name if participant.department else '')
-            ws.cell(row=idx, column=signature_col, value='')  # ลงชื่อ - ว่างไว้ให้เซ็น
-        
-        # Create HTTP response
-        response = HttpResponse(
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        # Header and column widths come from the template; rows are streamed (write-only workbook)
+        exporter = ExcelExporter.from_template(
+            template_path,
+            extra_headers=['ลงชื่อ'],
+            default_headers=['ID โรงพยาบาล', 'ชื่อ-นามสกุล', 'หน่วยงาน', 'ลงชื่อ']
         )
         
-        # Generate filename
-        filename = f'participants_{event_id}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        
-        # Save workbook to response
-        wb.save(response)
+        # Column A = hospital_id, B = name, C = department; ลงชื่อ is left empty for signature
+        rows = (
+            (hospital_id or '', name, department_name or '')
+            for hospital_id, name, department_name in queryset.values_list(
+                'hospital_id', 'name', 'department__name'
+            ).iterator(chunk_size=2000)
+        )
         
-        return response
+        filename = f'participants_{event_id}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
+        return exporter.response(rows, filename)
     
     @action(detail=False, methods=['get'], url_path='export-pdf')
     def export_participants_pdf(self, request):
-        """Export participants to PDF for printing"""
+        """
+        Export participants to PDF for printing
+        Only row chunks are cached per participants version of the event;
+        the page itself is rendered and gzipped on every request
+        """
         org_id = getattr(request, 'org_id', None)
         if not org_id:
             return Response(
@@ -519,6 +414,11 @@ class ParticipantViewSet(viewsets.ModelViewSet):
         search = request.query_params.get('search', '')
         department_name = request.query_params.get('department_name', '')
         
+        sheet = render_cache.PrintSheetCache(
+            request, 'participants', render_cache.get_version('participants', event_id),
+            [event_id, search, department_name]
+        )
+        
         # Get queryset (same logic as list, but without pagination)
         queryset = Participant.objects.filter(org_id=org_id, event_id=event_id)
         
@@ -529,7 +429,7 @@ class ParticipantViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(department__name=department_name)
         
         # Order by hospital_id, then name
-        queryset = queryset.order_by('hospital_id', 'name').select_related('department', 'event', 'org')
+        queryset = queryset.order_by('hospital_id', 'name', 'id').select_related('department', 'event', 'org')
         
         # Get event and org info
         from core.models import Event
@@ -546,29 +446,33 @@ class ParticipantViewSet(viewsets.ModelViewSet):
             event = first_participant.event
             org = first_participant.org
         
-        # Prepare data for template
-        participants_data = []
-        for participant in queryset:
-            participants_data.append({
-                'hospital_id': participant.hospital_id if participant.hospital_id else '',
-                'name': participant.name,
-                'department': participant.department.name if participant.department else '',
-            })
+        def fetch_rows(offset, limit):
+            return [
+                {
+                    'hospital_id': hospital_id if hospital_id else '',
+                    'name': name,
+                    'department': department or '',
+                }
+                for hospital_id, name, department in queryset[offset:limit].values_list(
+                    'hospital_id', 'name', 'department__name'
+                )
+            ]
+        
+        rows_html, total_count = sheet.render_rows('teams/participants_print_rows.html', 'participants', fetch_rows)
         
         # Render HTML template
         html_content = render_to_string('teams/participants_print.html', {
-            'participants': participants_data,
+            'rows_html': rows_html,
             'event_name': event.name if event else '',
             'org_name': org.name if org else '',
             'search_query': search,
             'department_filter': department_name,
             'print_date': datetime.now().strftime('%d/%m/%Y %H:%M:%S'),
-            'total_count': len(participants_data),
+            'total_count': total_count,
         })
         
         # Return HTML response (frontend will handle printing)
-        response = HttpResponse(html_content, content_type='text/html; charset=utf-8')
-        return response
+        return sheet.response(html_content)
 
 
 class TeamViewSet(viewsets.ModelViewSet):
@@ -433,6 +433,19 @@ export default function RaffleDisplayTestPage() {
             }
             break;
         }
+      } else if (message.type === 'state_snapshot') {
+        // First frame after (re)connect: restore prize, display count and spin state
+        const state = message.state || {};
+        if (state.current_prize_id) {
+          const prize = prizesRef.current.find(p => p.id === state.current_prize_id);
+          if (prize) {
+            handlePrizeChange(prize.id.toString());
+          }
+        }
+        if (state.display_count) {
+          handleDisplayCountChange(state.display_count.toString());
+        }
+        setRemoteIsSpinning(Boolean(state.is_spinning));
       }
     },
   });